@@ -1,5 +1,6 @@
 """Connector exports for omnichannel sync."""
 
+from .base_connector import set_max_inflight
 from .salla_connector import SallaConnector
 from .shopify_connector import ShopifyConnector
 from .woo_connector import WooConnector
@@ -1,13 +1,95 @@
 #!/usr/bin/env python3
-"""Shared connector behavior: retries, reporting, and dry-run support."""
+"""Shared connector behavior: async HTTP, retries, reporting, and dry-run support.
+
+Connectors are asyncio-native: every platform call goes through ``_request`` on an
+``httpx.AsyncClient``. The ``sync_*`` methods are blocking wrappers that run the
+``*_async`` coroutines on a private event loop; ``hub_sync`` drives the coroutines
+directly so all channels share one loop.
+"""
 
 from __future__ import annotations
 
+import asyncio
+import contextvars
+import json
+import os
+import random
+import re
 import time
-from dataclasses import dataclass
-from typing import Any, Dict, List, Optional
+import weakref
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover - reported when a connector first needs a client
+    httpx = None
+
+from .circuit_breaker import HALF_OPEN, breaker_for
+from .rate_limiter import limiter_for, parse_retry_after
+
+DEFAULT_WORKERS = 4
+# Full-jitter backoff for 5xx / transport errors: sleep U(0, min(cap, base * 2**attempt)).
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 30.0
+# Process-wide cap on in-flight platform requests across all connectors on a loop.
+DEFAULT_MAX_INFLIGHT = 256
+
+T = TypeVar("T")
+
+_max_inflight = int(os.environ.get("HUB_MAX_INFLIGHT") or DEFAULT_MAX_INFLIGHT)
+_inflight: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = weakref.WeakKeyDictionary()
+
+
+def set_max_inflight(limit: int) -> None:
+    """Set the global in-flight request cap for event loops started after this call."""
+    global _max_inflight
+    _max_inflight = max(int(limit), 1)
+
+
+def _inflight_slots() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    slots = _inflight.get(loop)
+    if slots is None:
+        slots = asyncio.Semaphore(_max_inflight)
+        _inflight[loop] = slots
+    return slots
+
+
+class _WorkerSlot:
+    """One task's place in a worker ``Semaphore``; released only while actually held."""
+
+    def __init__(self, slots: asyncio.Semaphore):
+        self.slots = slots
+        self.held = False
+
+    async def acquire(self) -> None:
+        await self.slots.acquire()
+        self.held = True
+
+    def release(self) -> None:
+        if self.held:
+            self.held = False
+            self.slots.release()
+
+    async def __aenter__(self) -> "_WorkerSlot":
+        await self.acquire()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        self.release()
+
+
+# Worker slot held by the current item/batch task, so a retrying request can hand it back while parked.
+_worker_slot: contextvars.ContextVar[Optional[_WorkerSlot]] = contextvars.ContextVar("worker_slot", default=None)
 
-import requests
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
 
 
 @dataclass
@@ -34,27 +116,252 @@ class ConnectorItemResult:
         }
 
 
+def _error_text(value: Any) -> str:
+    if isinstance(value, dict):
+        return "; ".join(f"{k}: {_error_text(v)}" for k, v in value.items())
+    if isinstance(value, list):
+        return "; ".join(_error_text(v) for v in value)
+    return str(value)
+
+
+def _indexed_errors(body: Any, list_key: Optional[str], size: int, rejected: bool) -> Dict[int, str]:
+    """Find validation errors addressed to entry positions anywhere in a response body.
+
+    A list aligned with the request only counts as errors when the request was rejected;
+    on success the same shape is the per-entry result.
+    """
+    if rejected and isinstance(body, list) and len(body) == size and all(isinstance(e, dict) for e in body):
+        return {i: _error_text(e) for i, e in enumerate(body) if e}
+    pattern = re.compile(rf"^{re.escape(list_key)}\.(\d+)(?:\.|$)" if list_key else r"^(\d+)(?:\.|$)")
+    found: Dict[int, str] = {}
+    stack = [body]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                match = pattern.match(str(key))
+                if match and int(match.group(1)) < size:
+                    pos = int(match.group(1))
+                    found[pos] = "; ".join(filter(None, [found.get(pos), f"{key}: {_error_text(value)}"]))
+                else:
+                    stack.append(value)
+        elif isinstance(node, list):
+            stack.extend(node)
+    return found
+
+
+@dataclass
+class RequestStats:
+    """Per-connector HTTP counters for the job report."""
+
+    requests: int = 0
+    retries: int = 0
+    throttled: int = 0
+    server_errors: int = 0
+    transport_errors: int = 0
+    short_circuited: int = 0
+    parked_sec: float = 0.0
+    limiter_wait_sec: float = 0.0
+    latencies_ms: List[float] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        lat = sorted(self.latencies_ms)
+
+        def pct(q: float) -> Optional[float]:
+            return round(lat[min(int(q * len(lat)), len(lat) - 1)], 1) if lat else None
+
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "throttled": self.throttled,
+            "server_errors": self.server_errors,
+            "transport_errors": self.transport_errors,
+            "short_circuited": self.short_circuited,
+            "parked_sec": round(self.parked_sec, 3),
+            "limiter_wait_sec": round(self.limiter_wait_sec, 3),
+            "latency_ms": {
+                "p50": pct(0.5),
+                "p95": pct(0.95),
+                "max": round(lat[-1], 1) if lat else None,
+                "mean": round(sum(lat) / len(lat), 1) if lat else None,
+            },
+        }
+
+
 class BaseConnector:
     name = "base"
+    # Client-side ceiling; observed rate-limit headers tune the bucket below it.
+    rate_per_sec = 5.0
+    rate_burst = 10
+    # Circuit breaker: open after this many consecutive failed calls or this failure
+    # rate over recent calls; probe again after breaker_open_sec.
+    breaker_failures = 5
+    breaker_error_rate = 0.5
+    breaker_open_sec = 30.0
+    # Products per request in _sync_bulk field updates.
+    bulk_size = 50
 
-    def __init__(self, dry_run: bool = False, max_retries: int = 3, timeout: int = 45):
+    def __init__(
+        self,
+        dry_run: bool = False,
+        max_retries: int = 3,
+        timeout: int = 45,
+        workers: Optional[int] = None,
+    ):
         self.dry_run = dry_run
         self.max_retries = max_retries
         self.timeout = timeout
-        self.session = requests.Session()
+        self.workers = max(workers or self._env_workers(), 1)
+        # HTTP/2 is negotiated via ALPN, so hosts without it fall back to HTTP/1.1.
+        self.http2 = os.environ.get("HUB_HTTP2", "1") != "0" and _http2_available()
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._client_loop: Optional[asyncio.AbstractEventLoop] = None
+        self.stats = RequestStats()
+        # Set by callers once items carry ids from a fresh fetch_id_index pass,
+        # so connectors can skip their own SKU lookups.
+        self.ids_resolved = False
+        # SKU -> (variant_id, inventory_item_id, location_id) learned during a sync,
+        # for callers to persist so later inventory pushes skip the lookups.
+        self.resolved_inventory_refs: Dict[str, Tuple[str, Optional[str], Optional[str]]] = {}
+        self.limiter = limiter_for(
+            self.name,
+            self._env_float("RATE_PER_SEC", self.rate_per_sec),
+            self._env_float("RATE_BURST", float(self.rate_burst)),
+        )
+        self.breaker = breaker_for(
+            self.name,
+            int(self._env_float("BREAKER_FAILURES", float(self.breaker_failures))),
+            self._env_float("BREAKER_ERROR_RATE", self.breaker_error_rate),
+            self._env_float("BREAKER_OPEN_SEC", self.breaker_open_sec),
+        )
+
+    def _env_float(self, suffix: str, default: float) -> float:
+        raw = os.environ.get(f"{self.name.upper()}_{suffix}") or ""
+        try:
+            return float(raw) if raw else default
+        except ValueError:
+            return default
+
+    def _env_workers(self) -> int:
+        raw = os.environ.get(f"{self.name.upper()}_SYNC_WORKERS") or os.environ.get("HUB_SYNC_WORKERS") or ""
+        try:
+            return int(raw) if raw else DEFAULT_WORKERS
+        except ValueError:
+            return DEFAULT_WORKERS
 
-    def _request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        """The AsyncClient for the running loop; clients are bound to the loop that opened them.
+
+        Built on first use, so dry runs never need httpx.
+        """
+        if httpx is None:
+            raise RuntimeError("httpx is required for channel connectors. Install with: pip install httpx[http2]")
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            # One pooled connection per worker so concurrent calls never queue on the pool.
+            self._client = httpx.AsyncClient(
+                http2=self.http2,
+                timeout=self.timeout,
+                limits=httpx.Limits(max_connections=max(self.workers, 10), max_keepalive_connections=max(self.workers, 10)),
+            )
+            self._client_loop = loop
+        return self._client
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            client, self._client, self._client_loop = self._client, None, None
+            await client.aclose()
+
+    def run(self, coro: Awaitable[T]) -> T:
+        """Run one connector coroutine to completion on a fresh event loop."""
+
+        async def runner() -> T:
+            try:
+                return await coro
+            finally:
+                await self.aclose()
+
+        return asyncio.run(runner())
+
+    async def _map_items(
+        self,
+        fn: Callable[[Dict[str, Any]], Awaitable[ConnectorItemResult]],
+        items: List[Dict[str, Any]],
+    ) -> List[ConnectorItemResult]:
+        """Await ``fn`` for every item with at most ``self.workers`` in flight, keeping input order."""
+        slots = asyncio.Semaphore(self.workers)
+
+        async def one(item: Dict[str, Any]) -> ConnectorItemResult:
+            async with _WorkerSlot(slots) as slot:
+                _worker_slot.set(slot)
+                return await fn(item)
+
+        return list(await asyncio.gather(*(one(item) for item in items)))
+
+    async def _park(self, delay: float) -> None:
+        """Wait ``delay`` seconds without holding a worker slot.
+
+        The slot goes back to the pool so other items keep flowing; once the
+        deadline passes the caller queues for a slot again before retrying.
+        """
+        self.stats.parked_sec += delay
+        slot = _worker_slot.get()
+        if slot is None:
+            await asyncio.sleep(delay)
+            return
+        slot.release()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            # If this is cancelled the slot stays released, and the caller's ``async with`` leaves it be.
+            await slot.acquire()
+
+    def _backoff(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return retry_after
+        return random.uniform(0.0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** attempt))
+
+    async def _request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
         if self.dry_run:
             return {"dry_run": True, "url": url, "method": method}
 
+        client = self.client
         error_messages: List[str] = []
         for attempt in range(self.max_retries):
+            if not self.breaker.allow():
+                # Platform looks down: fail now so the item lands in the DLQ without more calls.
+                self.stats.short_circuited += 1
+                error_messages.append(f"{self.name} circuit open, next probe in {self.breaker.retry_in():.0f}s")
+                return {"ok": False, "circuit_open": True, "error": " | ".join(error_messages)}
+            probing = self.breaker.state == HALF_OPEN
+            recorded = False
+            if attempt:
+                self.stats.retries += 1
             try:
-                response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+                self.stats.limiter_wait_sec += await self.limiter.acquire()
+                self.stats.requests += 1
+                started = time.perf_counter()
+                async with _inflight_slots():
+                    response = await client.request(method, url, **kwargs)
+                self.stats.latencies_ms.append((time.perf_counter() - started) * 1000.0)
                 status = response.status_code
-                if status == 429 or status >= 500:
+                self.breaker.record(status < 500)
+                recorded = True
+                self.limiter.observe(status, response.headers)
+                if status == 429:
+                    # The limiter has paused the whole channel for Retry-After and cut the rate;
+                    # park until that pause ends instead of sitting on a worker slot.
+                    self.stats.throttled += 1
                     error_messages.append(f"{status}:{response.text[:180]}")
-                    time.sleep(2 ** attempt)
+                    if attempt + 1 < self.max_retries:
+                        await self._park(max(self.limiter.paused_until - time.monotonic(), 0.0))
+                    continue
+                if status >= 500:
+                    self.stats.server_errors += 1
+                    error_messages.append(f"{status}:{response.text[:180]}")
+                    if attempt + 1 < self.max_retries:
+                        await self._park(self._backoff(attempt, parse_retry_after(response.headers.get("Retry-After"))))
                     continue
                 if status >= 400:
                     return {
@@ -66,12 +373,180 @@ class BaseConnector:
                 content_type = response.headers.get("Content-Type", "")
                 if "application/json" in content_type:
                     data = response.json()
-                return {"ok": True, "status_code": status, "data": data, "text": response.text}
-            except requests.RequestException as exc:
-                error_messages.append(str(exc))
-                time.sleep(2 ** attempt)
+                return {
+                    "ok": True,
+                    "status_code": status,
+                    "data": data,
+                    "text": response.text,
+                    "headers": response.headers,
+                }
+            except httpx.HTTPError as exc:
+                self.breaker.record(False)
+                recorded = True
+                self.stats.transport_errors += 1
+                error_messages.append(f"{type(exc).__name__}: {exc}")
+                if attempt + 1 < self.max_retries:
+                    await self._park(self._backoff(attempt))
+            finally:
+                # A cancelled or crashed probe has no outcome; without this the breaker stays half-open for good.
+                if probing and not recorded:
+                    self.breaker.abandon_probe()
         return {"ok": False, "error": " | ".join(error_messages)}
 
+    async def _map_batches(
+        self,
+        fn: Callable[[List[Any]], Awaitable[List[ConnectorItemResult]]],
+        entries: List[Any],
+        batch_size: int,
+    ) -> List[ConnectorItemResult]:
+        """Split ``entries`` into batches, await ``fn`` on each concurrently, and flatten in order.
+
+        ``fn`` must return exactly one result per entry in its batch.
+        """
+        batches = [entries[i : i + batch_size] for i in range(0, len(entries), max(batch_size, 1))]
+        slots = asyncio.Semaphore(self.workers)
+
+        async def one(batch: List[Any]) -> List[ConnectorItemResult]:
+            async with _WorkerSlot(slots) as slot:
+                _worker_slot.set(slot)
+                return await fn(batch)
+
+        outputs = await asyncio.gather(*(one(batch) for batch in batches))
+        return [result for output in outputs for result in output]
+
+    async def _push_bulk(
+        self,
+        entries: List[Dict[str, Any]],
+        send: Callable[[List[Dict[str, Any]]], Awaitable[Dict[str, Any]]],
+        list_key: Optional[str] = None,
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        """Send one bulk update and return ``(error, response)`` per entry, in order.
+
+        Per-entry validation errors are mapped back to positions (``<list_key>.<i>.field``
+        keys or a list aligned with the request). If the platform rejected the whole
+        request over some entries, the remaining entries are sent once more on their own.
+        """
+        outcome: Dict[int, Tuple[str, Dict[str, Any]]] = {}
+        remaining = list(range(len(entries)))
+        for _ in range(2):
+            result = await send([entries[i] for i in remaining])
+            body = result.get("data")
+            if body is None and result.get("error"):
+                try:
+                    body = json.loads(result["error"])
+                except (TypeError, ValueError):
+                    body = None
+            errors = _indexed_errors(body, list_key, len(remaining), not result.get("ok"))
+            for pos, message in errors.items():
+                outcome[remaining[pos]] = (message, result)
+            remaining = [idx for pos, idx in enumerate(remaining) if pos not in errors]
+            if result.get("ok") or not errors or not remaining:
+                break
+        if remaining:
+            error = "" if result.get("ok") else str(result.get("error") or f"{self.name} bulk update failed")
+            for idx in remaining:
+                outcome[idx] = (error, result)
+        return [outcome[i] for i in range(len(entries))]
+
+    async def _sync_bulk(
+        self,
+        items: List[Dict[str, Any]],
+        label: str,
+        build_payload: Callable[[Dict[str, Any]], Dict[str, Any]],
+        send: Callable[[List[Dict[str, Any]]], Awaitable[Dict[str, Any]]],
+        list_key: Optional[str] = None,
+    ) -> List[ConnectorItemResult]:
+        """Push one field for many products per request, ``bulk_size`` products at a time.
+
+        ``build_payload`` shapes one item's update and ``send`` posts a chunk of
+        ``{"id": external_product_id, **payload}`` entries; ``list_key`` is as in
+        ``_push_bulk``. Results come back in item order.
+        """
+        results: List[Optional[ConnectorItemResult]] = [None] * len(items)
+        pending: List[Tuple[int, Dict[str, Any]]] = []
+        for idx, item in enumerate(items):
+            payload = build_payload(item)
+            if self.dry_run:
+                results[idx] = self._field_result(item, payload, response={"dry_run": True})
+            elif not item.get("external_product_id"):
+                results[idx] = ConnectorItemResult(
+                    sku=str(item.get("sku") or ""),
+                    success=False,
+                    error=f"Missing {self.name.capitalize()} external_product_id for {label} update",
+                    payload=payload,
+                )
+            else:
+                pending.append((idx, payload))
+
+        async def push(batch: List[Tuple[int, Dict[str, Any]]]) -> List[ConnectorItemResult]:
+            entries = [{"id": items[idx]["external_product_id"], **payload} for idx, payload in batch]
+            outcomes = await self._push_bulk(entries, send, list_key)
+            return [
+                self._field_result(
+                    items[idx],
+                    payload,
+                    error or "",
+                    {"status_code": response.get("status_code"), "bulk": len(batch), "error": error or None},
+                )
+                for (idx, payload), (error, response) in zip(batch, outcomes)
+            ]
+
+        for (idx, _), result in zip(pending, await self._map_batches(push, pending, self.bulk_size)):
+            results[idx] = result
+        return [r for r in results if r is not None]
+
+    def _field_result(
+        self,
+        item: Dict[str, Any],
+        payload: Dict[str, Any],
+        error: str = "",
+        response: Optional[Dict[str, Any]] = None,
+    ) -> ConnectorItemResult:
+        return ConnectorItemResult(
+            sku=str(item.get("sku") or ""),
+            success=not error,
+            external_product_id=str(item.get("external_product_id") or item.get("sku") or ""),
+            publish_state=item.get("publish_state", "draft"),
+            error=error,
+            payload=payload,
+            response=response,
+        )
+
+    async def sync_catalog_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def sync_inventory_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    async def sync_pricing_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        raise NotImplementedError
+
+    def sync_catalog(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self.run(self.sync_catalog_async(items))
+
+    def sync_inventory(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self.run(self.sync_inventory_async(items))
+
+    def sync_pricing(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self.run(self.sync_pricing_async(items))
+
+    def fetch_id_index(self, modified_after: Optional[str] = None) -> Dict[str, Tuple[str, Optional[str]]]:
+        return self.run(self.fetch_id_index_async(modified_after))
+
+    async def fetch_id_index_async(self, modified_after: Optional[str] = None) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Page through the platform catalog and map SKU -> (product_id, variant_id).
+
+        ``modified_after`` is an ISO-8601 UTC timestamp; platforms that can filter
+        by modification time only return products changed since then. Raises
+        RuntimeError if a page cannot be fetched, so a partial index is never
+        mistaken for a complete one.
+        """
+        raise NotImplementedError(f"{self.name} connector does not support listing products")
+
+    def min_chunk_items(self, mode: str) -> int:
+        """Smallest slice of a sync worth pushing on its own; callers chunk no finer than this."""
+        return 1
+
     def _summarize(self, items: List[ConnectorItemResult]) -> Dict[str, Any]:
         processed = len(items)
         success = sum(1 for i in items if i.success)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Per-channel circuit breaker so a platform outage fails fast instead of retrying every SKU."""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures, or when the
+    failure rate over the last ``window`` calls (at least ``min_calls``) reaches
+    ``error_rate``. After ``open_seconds`` a single probe call is let through
+    (half-open): success closes the circuit, failure re-opens it for another period.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 5,
+        error_rate: float = 0.5,
+        window: int = 20,
+        min_calls: int = 10,
+        open_seconds: float = 30.0,
+    ):
+        self.failure_threshold = max(int(failure_threshold), 1)
+        self.error_rate = error_rate
+        self.min_calls = max(int(min_calls), 1)
+        self.open_seconds = open_seconds
+        self.state = CLOSED
+        self.opened_count = 0
+        self.consecutive_failures = 0
+        self._outcomes: Deque[bool] = deque(maxlen=max(int(window), 1))
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a call may go out now. In half-open state only one probe is allowed."""
+        with self._lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self._opened_at < self.open_seconds:
+                    return False
+                self.state = HALF_OPEN
+                self._probe_in_flight = False
+            if self._probe_in_flight:
+                return False
+            self._probe_in_flight = True
+            return True
+
+    def abandon_probe(self) -> None:
+        """Free the half-open probe when it ended without an outcome, e.g. it was cancelled."""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def retry_in(self) -> float:
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(self.open_seconds - (time.monotonic() - self._opened_at), 0.0)
+
+    def record(self, success: bool) -> None:
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                if success:
+                    self._reset()
+                else:
+                    self._trip()
+                return
+            self._outcomes.append(success)
+            self.consecutive_failures = 0 if success else self.consecutive_failures + 1
+            if self.state != CLOSED or success:
+                return
+            failures = self._outcomes.count(False)
+            if self.consecutive_failures >= self.failure_threshold or (
+                len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate
+            ):
+                self._trip()
+
+    def _trip(self) -> None:
+        self.state = OPEN
+        self.opened_count += 1
+        self._opened_at = time.monotonic()
+
+    def _reset(self) -> None:
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self._outcomes.clear()
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"state": self.state, "opened": self.opened_count, "retry_in_sec": round(self.retry_in(), 1)}
+
+
+_BREAKERS: Dict[str, CircuitBreaker] = {}
+_BREAKERS_LOCK = threading.Lock()
+
+
+def breaker_for(channel: str, failure_threshold: int, error_rate: float, open_seconds: float) -> CircuitBreaker:
+    """Return the process-wide breaker for a channel, creating it on first use."""
+    with _BREAKERS_LOCK:
+        breaker = _BREAKERS.get(channel)
+        if breaker is None:
+            breaker = CircuitBreaker(failure_threshold, error_rate, open_seconds=open_seconds)
+            _BREAKERS[channel] = breaker
+        return breaker
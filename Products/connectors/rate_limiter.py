@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""Per-channel token-bucket rate limiting tuned from platform rate-limit headers."""
+
+from __future__ import annotations
+
+import asyncio
+import email.utils
+import threading
+import time
+from typing import Dict, Mapping, Optional, Tuple
+
+# Fraction of the advertised platform budget we leave unused as headroom.
+HEADROOM = 0.1
+
+
+class TokenBucket:
+    """Thread-safe token bucket whose rate and fill level follow server feedback.
+
+    ``acquire`` waits until a request may be sent. ``observe`` feeds back each
+    response: call-limit and remaining-quota headers cap the local fill level,
+    ``Retry-After`` pauses the bucket, a 429 halves the rate, and successful
+    calls win the rate back additively up to the configured ceiling.
+    """
+
+    def __init__(self, rate_per_sec: float, capacity: float, min_rate_per_sec: float = 0.2):
+        self.max_rate = max(float(rate_per_sec), min_rate_per_sec)
+        self.min_rate = min_rate_per_sec
+        self.rate = self.max_rate
+        self.capacity = max(float(capacity), 1.0)
+        self.tokens = self.capacity
+        self.paused_until = 0.0
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now: float) -> None:
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self._updated = now
+
+    def _try_take(self) -> float:
+        """Take a token and return 0, or return how long to wait before trying again."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.paused_until:
+                return self.paused_until - now
+            if self.tokens >= 1.0:
+                self.tokens -= 1.0
+                return 0.0
+            return (1.0 - self.tokens) / self.rate
+
+    async def acquire(self) -> float:
+        """Take one token, waiting without blocking other tasks. Returns seconds waited."""
+        waited = 0.0
+        while True:
+            delay = self._try_take()
+            if delay <= 0:
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def pause(self, seconds: float) -> None:
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + max(seconds, 0.0))
+
+    def observe(self, status_code: int, headers: Mapping[str, str]) -> None:
+        retry_after = parse_retry_after(headers.get("Retry-After"))
+        call_limit = parse_call_limit(headers.get("X-Shopify-Shop-Api-Call-Limit"))
+        remaining = _to_float(headers.get("X-RateLimit-Remaining"))
+        limit = _to_float(headers.get("X-RateLimit-Limit"))
+        reset_in = parse_reset(headers.get("X-RateLimit-Reset"))
+
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if call_limit is not None:
+                used, size = call_limit
+                self.capacity = max(size * (1.0 - HEADROOM), 1.0)
+                self.tokens = min(self.tokens, max(size * (1.0 - HEADROOM) - used, 0.0))
+            if remaining is not None:
+                budget = remaining - (limit or remaining) * HEADROOM
+                self.tokens = min(self.tokens, max(budget, 0.0))
+                if remaining <= 0 and reset_in:
+                    self.paused_until = max(self.paused_until, now + reset_in)
+
+            if status_code == 429:
+                self.rate = max(self.rate / 2.0, self.min_rate)
+                self.tokens = 0.0
+                self.paused_until = max(self.paused_until, now + (retry_after if retry_after is not None else 1.0 / self.rate))
+            else:
+                if retry_after is not None:
+                    self.paused_until = max(self.paused_until, now + retry_after)
+                if status_code < 400 and self.rate < self.max_rate:
+                    self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+
+def _to_float(value: Optional[str]) -> Optional[float]:
+    if value in (None, ""):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_call_limit(value: Optional[str]) -> Optional[Tuple[float, float]]:
+    """Parse Shopify's ``used/size`` call-limit header."""
+    if not value or "/" not in value:
+        return None
+    used, _, size = value.partition("/")
+    used_f, size_f = _to_float(used.strip()), _to_float(size.strip())
+    if used_f is None or not size_f:
+        return None
+    return used_f, size_f
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Parse ``Retry-After`` as delta-seconds or an HTTP date."""
+    if not value:
+        return None
+    seconds = _to_float(value)
+    if seconds is not None:
+        return max(seconds, 0.0)
+    try:
+        when = email.utils.parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(when.timestamp() - time.time(), 0.0)
+
+
+def parse_reset(value: Optional[str]) -> Optional[float]:
+    """Parse ``X-RateLimit-Reset`` given either as seconds-from-now or a Unix timestamp."""
+    seconds = _to_float(value)
+    if seconds is None:
+        return None
+    if seconds > 1_000_000_000:
+        seconds -= time.time()
+    return max(seconds, 0.0)
+
+
+_LIMITERS: Dict[str, TokenBucket] = {}
+_LIMITERS_LOCK = threading.Lock()
+
+
+def limiter_for(channel: str, rate_per_sec: float, capacity: float) -> TokenBucket:
+    """Return the process-wide bucket for a channel, creating it on first use."""
+    with _LIMITERS_LOCK:
+        bucket = _LIMITERS.get(channel)
+        if bucket is None:
+            bucket = TokenBucket(rate_per_sec, capacity)
+            _LIMITERS[channel] = bucket
+        return bucket
@@ -4,13 +4,19 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 
 from .base_connector import BaseConnector, ConnectorItemResult
 
 
 class SallaConnector(BaseConnector):
     name = "salla"
+    rate_per_sec = 2.0
+    rate_burst = 10
+    # Bulk quantity/price endpoints accept at most 100 products per request.
+    bulk_size = 100
+    quantities_bulk_path = "/products/quantities/bulk"
+    prices_bulk_path = "/products/prices/bulk"
 
     def __init__(self, dry_run: bool = False):
         super().__init__(dry_run=dry_run)
@@ -26,6 +32,33 @@ class SallaConnector(BaseConnector):
             "Accept": "application/json",
         }
 
+    async def fetch_id_index_async(self, modified_after: Optional[str] = None) -> Dict[str, Tuple[str, Optional[str]]]:
+        # The products listing has no modification-time filter, so this is always a full pass.
+        if self.dry_run:
+            return {}
+        index: Dict[str, Tuple[str, Optional[str]]] = {}
+        page = 1
+        while True:
+            result = await self._request(
+                "GET",
+                f"{self.api_base}/products",
+                headers=self._headers(),
+                params={"per_page": 100, "page": page},
+            )
+            if not result.get("ok"):
+                raise RuntimeError(f"Salla product listing failed on page {page}: {result.get('error')}")
+            body = result.get("data") or {}
+            for product in body.get("data") or []:
+                if product.get("sku") and product.get("id"):
+                    index[str(product["sku"])] = (str(product["id"]), None)
+                for variant in product.get("skus") or []:
+                    if variant.get("sku") and variant.get("id"):
+                        index[str(variant["sku"])] = (str(product["id"]), str(variant["id"]))
+            pagination = body.get("pagination") or {}
+            if page >= int(pagination.get("totalPages") or page):
+                return index
+            page += 1
+
     def _catalog_payload(self, item: Dict[str, Any]) -> Dict[str, Any]:
         return {
             "name": item.get("name_ar") or item.get("name_en"),
@@ -40,182 +73,79 @@ class SallaConnector(BaseConnector):
             "images": item.get("images", []),
         }
 
-    def sync_catalog(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        results: List[ConnectorItemResult] = []
-        for item in items:
-            sku = str(item.get("sku") or "")
-            payload = self._catalog_payload(item)
-            if self.dry_run:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=item.get("external_product_id") or sku,
-                        publish_state="publish" if item.get("status") == "publish" else "draft",
-                        payload=payload,
-                        response={"dry_run": True},
-                    )
-                )
-                continue
-
-            ext_id = item.get("external_product_id")
-            if ext_id:
-                result = self._request(
-                    "PUT",
-                    f"{self.api_base}/products/{ext_id}",
-                    headers=self._headers(),
-                    json=payload,
-                )
-            else:
-                result = self._request(
-                    "POST",
-                    f"{self.api_base}/products",
-                    headers=self._headers(),
-                    json=payload,
-                )
-
-            if result.get("ok"):
-                data = result.get("data") or {}
-                pid = data.get("id") or ext_id or sku
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=str(pid),
-                        publish_state="publish" if item.get("status") == "publish" else "draft",
-                        payload=payload,
-                        response=data,
-                    )
-                )
-            else:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        error=str(result.get("error") or "Salla catalog sync failed"),
-                        payload=payload,
-                        response=result,
-                    )
-                )
-
-        return self._summarize(results)
-
-    def sync_inventory(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        results: List[ConnectorItemResult] = []
-        for item in items:
-            sku = str(item.get("sku") or "")
-            ext_id = item.get("external_product_id")
-            payload = {"quantity": int(item.get("sellable_qty", 0))}
-            if self.dry_run:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=ext_id or sku,
-                        publish_state=item.get("publish_state", "draft"),
-                        payload=payload,
-                        response={"dry_run": True},
-                    )
-                )
-                continue
-            if not ext_id:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        error="Missing Salla external_product_id for inventory update",
-                        payload=payload,
-                    )
-                )
-                continue
-
-            result = self._request(
+    async def sync_catalog_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self._summarize(await self._map_items(self._catalog_item, items))
+
+    async def _catalog_item(self, item: Dict[str, Any]) -> ConnectorItemResult:
+        sku = str(item.get("sku") or "")
+        payload = self._catalog_payload(item)
+        if self.dry_run:
+            return ConnectorItemResult(
+                sku=sku,
+                success=True,
+                external_product_id=item.get("external_product_id") or sku,
+                publish_state="publish" if item.get("status") == "publish" else "draft",
+                payload=payload,
+                response={"dry_run": True},
+            )
+
+        ext_id = item.get("external_product_id")
+        if ext_id:
+            result = await self._request(
                 "PUT",
-                f"{self.api_base}/products/{ext_id}/quantity",
+                f"{self.api_base}/products/{ext_id}",
                 headers=self._headers(),
                 json=payload,
             )
-            if result.get("ok"):
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=str(ext_id),
-                        publish_state=item.get("publish_state", "draft"),
-                        payload=payload,
-                        response=result.get("data") or {},
-                    )
-                )
-            else:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        external_product_id=str(ext_id),
-                        publish_state=item.get("publish_state", "draft"),
-                        error=str(result.get("error") or "Salla inventory sync failed"),
-                        payload=payload,
-                        response=result,
-                    )
-                )
-        return self._summarize(results)
-
-    def sync_pricing(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        results: List[ConnectorItemResult] = []
-        for item in items:
-            sku = str(item.get("sku") or "")
-            ext_id = item.get("external_product_id")
-            payload = {"price": float(item.get("price_sar", 0))}
-            if self.dry_run:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=ext_id or sku,
-                        publish_state=item.get("publish_state", "draft"),
-                        payload=payload,
-                        response={"dry_run": True},
-                    )
-                )
-                continue
-            if not ext_id:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        error="Missing Salla external_product_id for pricing update",
-                        payload=payload,
-                    )
-                )
-                continue
-
-            result = self._request(
-                "PUT",
-                f"{self.api_base}/products/{ext_id}/price",
+        else:
+            result = await self._request(
+                "POST",
+                f"{self.api_base}/products",
                 headers=self._headers(),
                 json=payload,
             )
-            if result.get("ok"):
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=str(ext_id),
-                        publish_state=item.get("publish_state", "draft"),
-                        payload=payload,
-                        response=result.get("data") or {},
-                    )
-                )
-            else:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        external_product_id=str(ext_id),
-                        publish_state=item.get("publish_state", "draft"),
-                        error=str(result.get("error") or "Salla pricing sync failed"),
-                        payload=payload,
-                        response=result,
-                    )
-                )
-        return self._summarize(results)
+
+        if result.get("ok"):
+            data = result.get("data") or {}
+            pid = data.get("id") or ext_id or sku
+            return ConnectorItemResult(
+                sku=sku,
+                success=True,
+                external_product_id=str(pid),
+                publish_state="publish" if item.get("status") == "publish" else "draft",
+                payload=payload,
+                response=data,
+            )
+        else:
+            return ConnectorItemResult(
+                sku=sku,
+                success=False,
+                error=str(result.get("error") or "Salla catalog sync failed"),
+                payload=payload,
+                response=result,
+            )
+
+    def _bulk_sender(self, path: str) -> Callable[[List[Dict[str, Any]]], Awaitable[Dict[str, Any]]]:
+        return lambda chunk: self._request("PUT", f"{self.api_base}{path}", headers=self._headers(), json={"products": chunk})
+
+    async def sync_inventory_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self._summarize(
+            await self._sync_bulk(
+                items,
+                "inventory",
+                lambda item: {"quantity": int(item.get("sellable_qty", 0))},
+                self._bulk_sender(self.quantities_bulk_path),
+                "products",
+            )
+        )
+
+    async def sync_pricing_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return self._summarize(
+            await self._sync_bulk(
+                items,
+                "pricing",
+                lambda item: {"price": float(item.get("price_sar", 0))},
+                self._bulk_sender(self.prices_bulk_path),
+                "products",
+            )
+        )
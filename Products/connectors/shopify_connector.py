@@ -3,14 +3,119 @@
 
 from __future__ import annotations
 
+import asyncio
+import json
 import os
-from typing import Any, Dict, List
+import re
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
-from .base_connector import BaseConnector, ConnectorItemResult
+from .base_connector import BaseConnector, ConnectorItemResult, httpx
+from .rate_limiter import HEADROOM
+
+
+# GraphQL Admin documents. Batched calls alias one mutation per entry (m0, m1, ...)
+# so a single request carries many products while userErrors stay per entry.
+PRODUCT_SET_SELECTION = (
+    "product { id variants(first: 1) { nodes { id sku inventoryItem { id } } } } userErrors { field message }"
+)
+PRODUCT_SET_BULK_MUTATION = (
+    "mutation call($input: ProductSetInput!) { productSet(input: $input) { " + PRODUCT_SET_SELECTION + " } }"
+)
+VARIANTS_BULK_UPDATE_SELECTION = "productVariants { id price } userErrors { field message }"
+INVENTORY_SET_MUTATION = """
+mutation InventorySet($input: InventorySetQuantitiesInput!) {
+  inventorySetQuantities(input: $input) { userErrors { field message } }
+}
+"""
+LOCATIONS_QUERY = "query { locations(first: 1) { nodes { id } } }"
+INVENTORY_ITEMS_QUERY = """
+query InventoryItems($ids: [ID!]!) {
+  nodes(ids: $ids) { ... on ProductVariant { id inventoryItem { id } } }
+}
+"""
+STAGED_UPLOAD_MUTATION = """
+mutation StagedUpload($input: [StagedUploadInput!]!) {
+  stagedUploadsCreate(input: $input) {
+    stagedTargets { url resourceUrl parameters { name value } }
+    userErrors { field message }
+  }
+}
+"""
+BULK_RUN_MUTATION = """
+mutation BulkRun($mutation: String!, $path: String!) {
+  bulkOperationRunMutation(mutation: $mutation, stagedUploadPath: $path) {
+    bulkOperation { id status }
+    userErrors { field message }
+  }
+}
+"""
+BULK_STATUS_QUERY = """
+query BulkStatus($id: ID!) {
+  node(id: $id) { ... on BulkOperation { id status errorCode objectCount url partialDataUrl } }
+}
+"""
+BULK_TERMINAL_STATES = {"COMPLETED", "FAILED", "CANCELED", "EXPIRED"}
+
+
+def _next_link(link_header: str) -> Optional[str]:
+    match = re.search(r'<([^>]+)>;\s*rel="next"', link_header or "")
+    return match.group(1) if match else None
+
+
+def _gid(kind: str, value: Any) -> str:
+    text = str(value)
+    return text if text.startswith("gid://") else f"gid://shopify/{kind}/{text}"
+
+
+def _legacy_id(gid: Optional[str]) -> Optional[str]:
+    """Numeric id from a GraphQL gid, matching what the REST API stores in channel_listing."""
+    if not gid:
+        return None
+    return str(gid).rsplit("/", 1)[-1]
+
+
+def _errors_by_index(
+    errors: List[Dict[str, Any]], list_field: str
+) -> Tuple[Dict[int, List[Dict[str, Any]]], List[Dict[str, Any]]]:
+    """Split userErrors into those pointing at ``list_field[i]`` and the rest."""
+    by_index: Dict[int, List[Dict[str, Any]]] = {}
+    general: List[Dict[str, Any]] = []
+    for error in errors:
+        field = [str(f) for f in (error.get("field") or [])]
+        if list_field in field:
+            pos = field.index(list_field) + 1
+            if pos < len(field) and field[pos].isdigit():
+                by_index.setdefault(int(field[pos]), []).append(error)
+                continue
+        general.append(error)
+    return by_index, general
+
+
+def _throttle_wait(cost: Dict[str, Any], needed: float) -> float:
+    """Seconds until the GraphQL cost bucket refills to ``needed`` points."""
+    status = cost.get("throttleStatus") or {}
+    available = float(status.get("currentlyAvailable") or 0)
+    restore = float(status.get("restoreRate") or 50)
+    return max((float(needed) - available) / restore, 1.0)
+
+
+def _user_error_text(errors: List[Dict[str, Any]]) -> str:
+    return "; ".join(
+        f"{'.'.join(str(f) for f in (e.get('field') or []))}: {e.get('message')}".lstrip(": ") for e in errors
+    )
 
 
 class ShopifyConnector(BaseConnector):
     name = "shopify"
+    # REST Admin leaky bucket: 40-call burst, refilling at 2 calls per second.
+    rate_per_sec = 2.0
+    rate_burst = 40
+    # Aliased mutations per GraphQL request; kept well under the 1000-point query cost cap.
+    graphql_catalog_batch = 10
+    graphql_pricing_batch = 25
+    # inventorySetQuantities accepts up to 250 quantities per call.
+    graphql_inventory_batch = 250
 
     def __init__(self, dry_run: bool = False):
         super().__init__(dry_run=dry_run)
@@ -23,7 +128,19 @@ class ShopifyConnector(BaseConnector):
             raise RuntimeError("Missing SHOPIFY_STORE for Shopify connector")
         if not dry_run and not self.token:
             raise RuntimeError("Missing SHOPIFY_ADMIN_TOKEN for Shopify connector")
-        self.base_url = f"https://{self.store}/admin/api/{self.version}"
+        # SHOPIFY_ADMIN_URL points the connector at another Admin endpoint (e.g. a local stub).
+        self.base_url = (
+            os.environ.get("SHOPIFY_ADMIN_URL") or f"https://{self.store}/admin/api/{self.version}"
+        ).rstrip("/")
+        self.graphql_url = f"{self.base_url}/graphql.json"
+        self.api_mode = (os.environ.get("SHOPIFY_API_MODE") or "rest").strip().lower()
+        if self.api_mode not in ("rest", "graphql"):
+            raise RuntimeError(f"Unsupported SHOPIFY_API_MODE: {self.api_mode}")
+        # Catalog pushes at least this large go through a bulk operation instead of aliased batches.
+        self.bulk_min_items = int(os.environ.get("SHOPIFY_BULK_MIN_ITEMS") or 250)
+        self.bulk_poll_seconds = float(os.environ.get("SHOPIFY_BULK_POLL_SECONDS") or 2.0)
+        self.bulk_timeout_seconds = float(os.environ.get("SHOPIFY_BULK_TIMEOUT_SECONDS") or 3600)
+        self._location_gid: Optional[str] = os.environ.get("SHOPIFY_LOCATION_ID") or None
 
     def _headers(self) -> Dict[str, str]:
         return {
@@ -32,6 +149,27 @@ class ShopifyConnector(BaseConnector):
             "Accept": "application/json",
         }
 
+    async def fetch_id_index_async(self, modified_after: Optional[str] = None) -> Dict[str, Tuple[str, Optional[str]]]:
+        if self.dry_run:
+            return {}
+        index: Dict[str, Tuple[str, Optional[str]]] = {}
+        url: Optional[str] = f"{self.base_url}/products.json"
+        params: Optional[Dict[str, Any]] = {"limit": 250, "fields": "id,variants"}
+        if modified_after:
+            params["updated_at_min"] = modified_after
+        while url:
+            result = await self._request("GET", url, headers=self._headers(), params=params)
+            if not result.get("ok"):
+                raise RuntimeError(f"Shopify product listing failed: {result.get('error')}")
+            for product in (result.get("data") or {}).get("products") or []:
+                for variant in product.get("variants") or []:
+                    if variant.get("sku"):
+                        index[str(variant["sku"])] = (str(product["id"]), str(variant["id"]))
+            # Cursor pagination: the next page URL already carries limit/fields/page_info.
+            url = _next_link((result.get("headers") or {}).get("Link", ""))
+            params = None
+        return index
+
     def _catalog_payload(self, item: Dict[str, Any]) -> Dict[str, Any]:
         status = "active" if item.get("status") == "publish" else "draft"
         return {
@@ -57,199 +195,552 @@ class ShopifyConnector(BaseConnector):
             }
         }
 
-    def sync_catalog(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        results: List[ConnectorItemResult] = []
-        for item in items:
-            sku = str(item.get("sku") or "")
-            payload = self._catalog_payload(item)
-            if self.dry_run:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=item.get("external_product_id") or sku,
-                        external_variant_id=item.get("external_variant_id"),
-                        publish_state="publish" if item.get("status") == "publish" else "draft",
-                        payload=payload,
-                        response={"dry_run": True},
-                    )
-                )
-                continue
+    def _use_graphql(self) -> bool:
+        return self.api_mode == "graphql" and not self.dry_run
 
-            ext_product_id = item.get("external_product_id")
-            if ext_product_id:
-                result = self._request(
-                    "PUT",
-                    f"{self.base_url}/products/{ext_product_id}.json",
-                    headers=self._headers(),
-                    json=payload,
-                )
-            else:
-                result = self._request(
-                    "POST",
-                    f"{self.base_url}/products.json",
-                    headers=self._headers(),
-                    json=payload,
-                )
+    def min_chunk_items(self, mode: str) -> int:
+        # A bulk operation is one platform job; slicing a catalog below its threshold only adds calls.
+        if self._use_graphql() and mode in ("catalog", "reconcile"):
+            return self.bulk_min_items
+        return 1
 
-            if result.get("ok"):
-                data = (result.get("data") or {}).get("product") or {}
-                pid = data.get("id") or ext_product_id or sku
-                vid = None
-                variants = data.get("variants") or []
-                if variants:
-                    vid = variants[0].get("id")
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=str(pid),
-                        external_variant_id=str(vid) if vid else None,
-                        publish_state="publish" if item.get("status") == "publish" else "draft",
-                        payload=payload,
-                        response=data,
-                    )
-                )
-            else:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        error=str(result.get("error") or "Shopify catalog sync failed"),
-                        payload=payload,
-                        response=result,
-                    )
-                )
-        return self._summarize(results)
-
-    def sync_inventory(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        # Inventory in Shopify often requires location + inventory_item_id.
-        # This implementation updates variant quantity where variant id is known.
-        results: List[ConnectorItemResult] = []
-        for item in items:
-            sku = str(item.get("sku") or "")
-            variant_id = item.get("external_variant_id")
-            payload = {"variant": {"id": variant_id, "inventory_quantity": int(item.get("sellable_qty", 0))}}
-            if self.dry_run:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=item.get("external_product_id") or sku,
-                        external_variant_id=str(variant_id) if variant_id else None,
-                        publish_state=item.get("publish_state", "draft"),
-                        payload=payload,
-                        response={"dry_run": True},
-                    )
-                )
-                continue
+    async def sync_catalog_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if self._use_graphql():
+            return self._summarize(await self._graphql_catalog(items))
+        return self._summarize(await self._map_items(self._catalog_item, items))
 
-            if not variant_id:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        error="Missing Shopify external_variant_id for inventory update",
-                        payload=payload,
-                    )
-                )
-                continue
+    async def _catalog_item(self, item: Dict[str, Any]) -> ConnectorItemResult:
+        sku = str(item.get("sku") or "")
+        payload = self._catalog_payload(item)
+        if self.dry_run:
+            return ConnectorItemResult(
+                sku=sku,
+                success=True,
+                external_product_id=item.get("external_product_id") or sku,
+                external_variant_id=item.get("external_variant_id"),
+                publish_state="publish" if item.get("status") == "publish" else "draft",
+                payload=payload,
+                response={"dry_run": True},
+            )
 
-            result = self._request(
+        ext_product_id = item.get("external_product_id")
+        if ext_product_id:
+            result = await self._request(
                 "PUT",
-                f"{self.base_url}/variants/{variant_id}.json",
+                f"{self.base_url}/products/{ext_product_id}.json",
+                headers=self._headers(),
+                json=payload,
+            )
+        else:
+            result = await self._request(
+                "POST",
+                f"{self.base_url}/products.json",
                 headers=self._headers(),
                 json=payload,
             )
-            if result.get("ok"):
-                data = (result.get("data") or {}).get("variant") or {}
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=str(item.get("external_product_id") or ""),
-                        external_variant_id=str(data.get("id") or variant_id),
-                        publish_state=item.get("publish_state", "draft"),
-                        payload=payload,
-                        response=data,
-                    )
-                )
-            else:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        external_product_id=str(item.get("external_product_id") or ""),
-                        external_variant_id=str(variant_id),
-                        publish_state=item.get("publish_state", "draft"),
-                        error=str(result.get("error") or "Shopify inventory sync failed"),
-                        payload=payload,
-                        response=result,
-                    )
-                )
-        return self._summarize(results)
 
-    def sync_pricing(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        results: List[ConnectorItemResult] = []
-        for item in items:
-            sku = str(item.get("sku") or "")
-            variant_id = item.get("external_variant_id")
-            payload = {"variant": {"id": variant_id, "price": str(item.get("price_sar", 0))}}
-            if self.dry_run:
-                results.append(
+        if result.get("ok"):
+            data = (result.get("data") or {}).get("product") or {}
+            pid = data.get("id") or ext_product_id or sku
+            vid = None
+            variants = data.get("variants") or []
+            if variants:
+                vid = variants[0].get("id")
+            return ConnectorItemResult(
+                sku=sku,
+                success=True,
+                external_product_id=str(pid),
+                external_variant_id=str(vid) if vid else None,
+                publish_state="publish" if item.get("status") == "publish" else "draft",
+                payload=payload,
+                response=data,
+            )
+        else:
+            return ConnectorItemResult(
+                sku=sku,
+                success=False,
+                error=str(result.get("error") or "Shopify catalog sync failed"),
+                payload=payload,
+                response=result,
+            )
+
+    async def sync_inventory_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Set available stock with batched ``inventorySetQuantities`` in either API mode.
+
+        Items may carry cached ``inventory_item_id`` / ``location_id``; anything
+        missing is resolved in bulk and reported in ``resolved_inventory_refs``.
+        """
+        if self.dry_run:
+            return self._summarize(
+                [
                     ConnectorItemResult(
-                        sku=sku,
+                        sku=str(item.get("sku") or ""),
                         success=True,
-                        external_product_id=item.get("external_product_id") or sku,
-                        external_variant_id=str(variant_id) if variant_id else None,
+                        external_product_id=item.get("external_product_id") or str(item.get("sku") or ""),
+                        external_variant_id=str(item["external_variant_id"]) if item.get("external_variant_id") else None,
                         publish_state=item.get("publish_state", "draft"),
-                        payload=payload,
+                        payload={"quantity": {"quantity": int(item.get("sellable_qty", 0))}},
                         response={"dry_run": True},
                     )
-                )
+                    for item in items
+                ]
+            )
+        return self._summarize(await self._graphql_inventory(items))
+
+    async def sync_pricing_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if self._use_graphql():
+            return self._summarize(await self._graphql_pricing(items))
+        return self._summarize(await self._map_items(self._pricing_item, items))
+
+    async def _pricing_item(self, item: Dict[str, Any]) -> ConnectorItemResult:
+        sku = str(item.get("sku") or "")
+        variant_id = item.get("external_variant_id")
+        payload = {"variant": {"id": variant_id, "price": str(item.get("price_sar", 0))}}
+        if self.dry_run:
+            return ConnectorItemResult(
+                sku=sku,
+                success=True,
+                external_product_id=item.get("external_product_id") or sku,
+                external_variant_id=str(variant_id) if variant_id else None,
+                publish_state=item.get("publish_state", "draft"),
+                payload=payload,
+                response={"dry_run": True},
+            )
+
+        if not variant_id:
+            return ConnectorItemResult(
+                sku=sku,
+                success=False,
+                error="Missing Shopify external_variant_id for pricing update",
+                payload=payload,
+            )
+
+        result = await self._request(
+            "PUT",
+            f"{self.base_url}/variants/{variant_id}.json",
+            headers=self._headers(),
+            json=payload,
+        )
+        if result.get("ok"):
+            data = (result.get("data") or {}).get("variant") or {}
+            return ConnectorItemResult(
+                sku=sku,
+                success=True,
+                external_product_id=str(item.get("external_product_id") or ""),
+                external_variant_id=str(data.get("id") or variant_id),
+                publish_state=item.get("publish_state", "draft"),
+                payload=payload,
+                response=data,
+            )
+        else:
+            return ConnectorItemResult(
+                sku=sku,
+                success=False,
+                external_product_id=str(item.get("external_product_id") or ""),
+                external_variant_id=str(variant_id),
+                publish_state=item.get("publish_state", "draft"),
+                error=str(result.get("error") or "Shopify pricing sync failed"),
+                payload=payload,
+                response=result,
+            )
+
+    # -- GraphQL Admin API (SHOPIFY_API_MODE=graphql) --------------------------
+
+    async def _graphql(self, query: str, variables: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """POST one GraphQL document, waiting out THROTTLED responses.
+
+        Returns ``{"ok": True, "data": ...}`` or ``{"ok": False, "error": ...}``.
+        """
+        body = {"query": query, "variables": variables or {}}
+        for _ in range(self.max_retries):
+            result = await self._request("POST", self.graphql_url, headers=self._headers(), json=body)
+            if not result.get("ok"):
+                return result
+            payload = result.get("data") or {}
+            errors = payload.get("errors") or []
+            if isinstance(errors, str):
+                errors = [{"message": errors}]
+            cost = (payload.get("extensions") or {}).get("cost") or {}
+            if any((e.get("extensions") or {}).get("code") == "THROTTLED" for e in errors):
+                wait = _throttle_wait(cost, cost.get("requestedQueryCost") or 0)
+                self.limiter.pause(wait)
+                self.stats.throttled += 1
+                self.stats.retries += 1
+                await self._park(wait)
                 continue
+            if errors:
+                return {"ok": False, "error": "; ".join(str(e.get("message")) for e in errors), "data": payload}
+            # Back off before the query-cost bucket runs dry rather than after a THROTTLED reply.
+            status = cost.get("throttleStatus") or {}
+            floor = float(status.get("maximumAvailable") or 0) * HEADROOM
+            if status and float(status.get("currentlyAvailable") or 0) < floor:
+                self.limiter.pause(_throttle_wait(cost, floor))
+            return {"ok": True, "data": payload.get("data") or {}}
+        return {"ok": False, "error": "Shopify GraphQL request throttled"}
 
-            if not variant_id:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        error="Missing Shopify external_variant_id for pricing update",
-                        payload=payload,
-                    )
+    async def _location(self) -> Optional[str]:
+        """Stock location gid: SHOPIFY_LOCATION_ID, the cached one, or the shop's first location."""
+        if not self._location_gid:
+            result = await self._graphql(LOCATIONS_QUERY)
+            nodes = ((result.get("data") or {}).get("locations") or {}).get("nodes") or []
+            if result.get("ok") and nodes:
+                self._location_gid = nodes[0]["id"]
+        return _gid("Location", self._location_gid) if self._location_gid else None
+
+    def _product_set_input(self, item: Dict[str, Any], location: Optional[str]) -> Dict[str, Any]:
+        variant: Dict[str, Any] = {
+            "optionValues": [{"optionName": "Title", "name": "Default Title"}],
+            "price": str(item.get("price_sar", 0)),
+            "inventoryItem": {
+                "sku": item.get("sku"),
+                "tracked": True,
+                "measurement": {"weight": {"value": float(item.get("weight", 0)), "unit": "KILOGRAMS"}},
+            },
+        }
+        if item.get("barcode"):
+            variant["barcode"] = item["barcode"]
+        product: Dict[str, Any] = {
+            "title": item.get("name_en") or item.get("name_ar") or item.get("sku"),
+            "descriptionHtml": item.get("desc_en") or item.get("desc_ar") or "",
+            "vendor": item.get("brand") or "NGS",
+            "status": "ACTIVE" if item.get("status") == "publish" else "DRAFT",
+            "productType": item.get("category_key") or "Smart Home",
+            "tags": [t for t in (item.get("category_key"), item.get("brand")) if t],
+            "productOptions": [{"name": "Title", "values": [{"name": "Default Title"}]}],
+            "variants": [variant],
+            "files": [{"originalSource": url, "contentType": "IMAGE"} for url in (item.get("images") or [])[:8]],
+        }
+        if item.get("external_product_id"):
+            product["id"] = _gid("Product", item["external_product_id"])
+            if item.get("external_variant_id"):
+                variant["id"] = _gid("ProductVariant", item["external_variant_id"])
+        elif location:
+            # Opening stock on create only; later changes go through sync_inventory.
+            variant["inventoryQuantities"] = [
+                {"locationId": location, "name": "available", "quantity": int(item.get("sellable_qty", 0))}
+            ]
+        return product
+
+    async def _graphql_catalog(self, items: List[Dict[str, Any]]) -> List[ConnectorItemResult]:
+        location = await self._location() if any(not item.get("external_product_id") for item in items) else None
+        entries = [(item, self._product_set_input(item, location)) for item in items]
+        if len(entries) >= self.bulk_min_items:
+            return await self._bulk_catalog(entries)
+        return await self._map_batches(self._catalog_batch, entries, self.graphql_catalog_batch)
+
+    async def _catalog_batch(self, entries: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[ConnectorItemResult]:
+        decls = ", ".join(f"$i{k}: ProductSetInput!" for k in range(len(entries)))
+        fields = " ".join(
+            f"m{k}: productSet(input: $i{k}, synchronous: true) {{ {PRODUCT_SET_SELECTION} }}"
+            for k in range(len(entries))
+        )
+        result = await self._graphql(
+            f"mutation CatalogBatch({decls}) {{ {fields} }}",
+            {f"i{k}": product_input for k, (_, product_input) in enumerate(entries)},
+        )
+        if not result.get("ok"):
+            return [self._catalog_failure(item, inp, result.get("error"), result) for item, inp in entries]
+        data = result.get("data") or {}
+        return [self._catalog_result(item, inp, data.get(f"m{k}")) for k, (item, inp) in enumerate(entries)]
+
+    def _catalog_result(
+        self,
+        item: Dict[str, Any],
+        product_input: Dict[str, Any],
+        node: Optional[Dict[str, Any]],
+    ) -> ConnectorItemResult:
+        node = node or {}
+        errors = node.get("userErrors") or []
+        product = node.get("product") or {}
+        if errors or not product.get("id"):
+            error = _user_error_text(errors) or "Shopify productSet returned no product"
+            return self._catalog_failure(item, product_input, error, node)
+        variants = (product.get("variants") or {}).get("nodes") or []
+        vid = _legacy_id(variants[0].get("id")) if variants else item.get("external_variant_id")
+        inventory_item = ((variants[0].get("inventoryItem") or {}).get("id")) if variants else None
+        if vid and inventory_item and self._location_gid:
+            self.resolved_inventory_refs[str(item.get("sku"))] = (
+                str(vid),
+                _legacy_id(inventory_item),
+                _legacy_id(self._location_gid),
+            )
+        return ConnectorItemResult(
+            sku=str(item.get("sku") or ""),
+            success=True,
+            external_product_id=_legacy_id(product["id"]),
+            external_variant_id=str(vid) if vid else None,
+            publish_state="publish" if item.get("status") == "publish" else "draft",
+            payload={"input": product_input},
+            response=node,
+        )
+
+    def _catalog_failure(
+        self,
+        item: Dict[str, Any],
+        product_input: Dict[str, Any],
+        error: Any,
+        response: Optional[Dict[str, Any]] = None,
+    ) -> ConnectorItemResult:
+        return ConnectorItemResult(
+            sku=str(item.get("sku") or ""),
+            success=False,
+            error=str(error or "Shopify catalog sync failed"),
+            payload={"input": product_input},
+            response=response,
+        )
+
+    async def _bulk_catalog(self, entries: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[ConnectorItemResult]:
+        """Push a large catalog as one ``productSet`` bulk operation.
+
+        The inputs are written as JSONL to a staged upload, the bulk mutation runs
+        against it, and the result JSONL is matched back to entries by ``__lineNumber``.
+        """
+
+        def fail_all(error: str, response: Optional[Dict[str, Any]] = None) -> List[ConnectorItemResult]:
+            return [self._catalog_failure(item, inp, error, response) for item, inp in entries]
+
+        staged = await self._graphql(
+            STAGED_UPLOAD_MUTATION,
+            {
+                "input": [
+                    {
+                        "resource": "BULK_MUTATION_VARIABLES",
+                        "filename": "catalog.jsonl",
+                        "mimeType": "text/jsonl",
+                        "httpMethod": "POST",
+                    }
+                ]
+            },
+        )
+        created = (staged.get("data") or {}).get("stagedUploadsCreate") or {}
+        targets = created.get("stagedTargets") or []
+        if not staged.get("ok") or created.get("userErrors") or not targets:
+            error = staged.get("error") or _user_error_text(created.get("userErrors") or []) or "no staged target"
+            return fail_all(f"Shopify staged upload failed: {error}", created or staged)
+
+        target = targets[0]
+        params = {p["name"]: p["value"] for p in target.get("parameters") or []}
+        jsonl = "".join(json.dumps({"input": inp}, ensure_ascii=False) + "\n" for _, inp in entries)
+        upload = await self._request(
+            "POST",
+            target["url"],
+            data=params,
+            files={"file": ("catalog.jsonl", jsonl.encode("utf-8"), "text/jsonl")},
+        )
+        if not upload.get("ok"):
+            return fail_all(f"Shopify staged upload failed: {upload.get('error')}", upload)
+
+        run = await self._graphql(
+            BULK_RUN_MUTATION,
+            {"mutation": PRODUCT_SET_BULK_MUTATION, "path": params.get("key") or target.get("resourceUrl")},
+        )
+        started = (run.get("data") or {}).get("bulkOperationRunMutation") or {}
+        operation = started.get("bulkOperation") or {}
+        if not run.get("ok") or started.get("userErrors") or not operation.get("id"):
+            error = run.get("error") or _user_error_text(started.get("userErrors") or []) or "no bulk operation"
+            return fail_all(f"Shopify bulk mutation failed to start: {error}", started or run)
+
+        status = await self._await_bulk(operation["id"])
+        results_url = status.get("url") or status.get("partialDataUrl")
+        if not results_url:
+            return fail_all(f"Shopify bulk operation {status.get('status')}: {status.get('errorCode') or ''}".strip(), status)
+        lines = await self._bulk_result_lines(results_url)
+        if lines is None:
+            return fail_all("Could not download Shopify bulk operation results", status)
+
+        results: List[ConnectorItemResult] = []
+        for k, (item, inp) in enumerate(entries):
+            line = lines.get(k)
+            if line is None:
+                results.append(self._catalog_failure(item, inp, f"No bulk result (operation {status.get('status')})", status))
+            elif line.get("errors"):
+                error = "; ".join(str(e.get("message")) for e in line["errors"])
+                results.append(self._catalog_failure(item, inp, error, line))
+            else:
+                results.append(self._catalog_result(item, inp, (line.get("data") or {}).get("productSet")))
+        return results
+
+    async def _await_bulk(self, operation_id: str) -> Dict[str, Any]:
+        deadline = time.monotonic() + self.bulk_timeout_seconds
+        while True:
+            result = await self._graphql(BULK_STATUS_QUERY, {"id": operation_id})
+            if not result.get("ok"):
+                return {"id": operation_id, "status": "UNKNOWN", "errorCode": result.get("error")}
+            node = (result.get("data") or {}).get("node") or {}
+            if node.get("status") in BULK_TERMINAL_STATES:
+                return node
+            if time.monotonic() >= deadline:
+                return {**node, "status": "TIMEOUT"}
+            await asyncio.sleep(self.bulk_poll_seconds)
+
+    async def _bulk_result_lines(self, url: str) -> Optional[Dict[int, Dict[str, Any]]]:
+        # Signed storage URL: no Admin token, and the JSONL body is not JSON.
+        client = self.client
+        try:
+            response = await client.get(url)
+            response.raise_for_status()
+        except httpx.HTTPError:
+            return None
+        lines: Dict[int, Dict[str, Any]] = {}
+        rows = [raw for raw in response.text.splitlines() if raw.strip()]
+        for position, raw in enumerate(rows):
+            try:
+                line = json.loads(raw)
+            except ValueError as exc:
+                # A truncated line fails only the entry it belongs to, not the whole chunk.
+                match = re.search(r'"__lineNumber"\s*:\s*(\d+)', raw)
+                number = int(match.group(1)) if match else position
+                lines[number] = {"errors": [{"message": f"Malformed bulk result line: {exc}"}]}
+                continue
+            lines[int(line.get("__lineNumber", position))] = line
+        return lines
+
+    def _variant_result(
+        self,
+        item: Dict[str, Any],
+        payload: Dict[str, Any],
+        error: str = "",
+        response: Optional[Dict[str, Any]] = None,
+    ) -> ConnectorItemResult:
+        variant_id = item.get("external_variant_id")
+        return ConnectorItemResult(
+            sku=str(item.get("sku") or ""),
+            success=not error,
+            external_product_id=str(item.get("external_product_id") or ""),
+            external_variant_id=str(variant_id) if variant_id else None,
+            publish_state=item.get("publish_state", "draft"),
+            error=error,
+            payload=payload,
+            response=response,
+        )
+
+    async def _graphql_pricing(self, items: List[Dict[str, Any]]) -> List[ConnectorItemResult]:
+        return await self._map_batches(self._pricing_batch, items, self.graphql_pricing_batch)
+
+    async def _pricing_batch(self, items: List[Dict[str, Any]]) -> List[ConnectorItemResult]:
+        """One request per batch: a ``productVariantsBulkUpdate`` alias per product."""
+        results: List[Optional[ConnectorItemResult]] = [None] * len(items)
+        groups: Dict[str, List[Tuple[int, Dict[str, Any]]]] = {}
+        for idx, item in enumerate(items):
+            variant = {"id": item.get("external_variant_id"), "price": str(item.get("price_sar", 0))}
+            if not item.get("external_variant_id") or not item.get("external_product_id"):
+                results[idx] = self._variant_result(
+                    item, {"variant": variant}, "Missing Shopify external_variant_id for pricing update"
                 )
                 continue
+            variant["id"] = _gid("ProductVariant", variant["id"])
+            groups.setdefault(_gid("Product", item["external_product_id"]), []).append((idx, variant))
 
-            result = self._request(
-                "PUT",
-                f"{self.base_url}/variants/{variant_id}.json",
-                headers=self._headers(),
-                json=payload,
+        if groups:
+            products = list(groups.items())
+            decls = ", ".join(f"$p{k}: ID!, $v{k}: [ProductVariantsBulkInput!]!" for k in range(len(products)))
+            fields = " ".join(
+                f"m{k}: productVariantsBulkUpdate(productId: $p{k}, variants: $v{k}) {{ {VARIANTS_BULK_UPDATE_SELECTION} }}"
+                for k in range(len(products))
             )
-            if result.get("ok"):
-                data = (result.get("data") or {}).get("variant") or {}
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=str(item.get("external_product_id") or ""),
-                        external_variant_id=str(data.get("id") or variant_id),
-                        publish_state=item.get("publish_state", "draft"),
-                        payload=payload,
-                        response=data,
+            variables: Dict[str, Any] = {}
+            for k, (product_gid, members) in enumerate(products):
+                variables[f"p{k}"] = product_gid
+                variables[f"v{k}"] = [variant for _, variant in members]
+            result = await self._graphql(f"mutation PriceBatch({decls}) {{ {fields} }}", variables)
+            data = result.get("data") or {}
+            for k, (product_gid, members) in enumerate(products):
+                node = data.get(f"m{k}") or {}
+                by_index, general = _errors_by_index(node.get("userErrors") or [], "variants")
+                for position, (idx, variant) in enumerate(members):
+                    if not result.get("ok"):
+                        error = str(result.get("error") or "Shopify pricing sync failed")
+                    else:
+                        error = _user_error_text(by_index.get(position, []) + general)
+                    payload = {"productId": product_gid, "variant": variant}
+                    results[idx] = self._variant_result(items[idx], payload, error, node or result)
+        return [r for r in results if r is not None]
+
+    async def _inventory_item_ids(self, variant_gids: List[str]) -> Dict[str, str]:
+        """Map variant gid -> inventory item gid, 250 nodes per query."""
+        found: Dict[str, str] = {}
+        unique = list(dict.fromkeys(variant_gids))
+        for i in range(0, len(unique), self.graphql_inventory_batch):
+            result = await self._graphql(INVENTORY_ITEMS_QUERY, {"ids": unique[i : i + self.graphql_inventory_batch]})
+            for node in (result.get("data") or {}).get("nodes") or []:
+                if node and (node.get("inventoryItem") or {}).get("id"):
+                    found[node["id"]] = node["inventoryItem"]["id"]
+        return found
+
+    async def _graphql_inventory(self, items: List[Dict[str, Any]]) -> List[ConnectorItemResult]:
+        results: List[Optional[ConnectorItemResult]] = [None] * len(items)
+        cached_location = next((i["location_id"] for i in items if i.get("location_id")), None)
+        if cached_location and not self._location_gid:
+            self._location_gid = cached_location
+        location = await self._location()
+        unresolved = [
+            _gid("ProductVariant", i["external_variant_id"])
+            for i in items
+            if i.get("external_variant_id") and not i.get("inventory_item_id")
+        ]
+        looked_up = await self._inventory_item_ids(unresolved) if location and unresolved else {}
+
+        pending: List[Tuple[int, Dict[str, Any]]] = []
+        for idx, item in enumerate(items):
+            variant_id = item.get("external_variant_id")
+            quantity = int(item.get("sellable_qty", 0))
+            inventory_item = item.get("inventory_item_id")
+            if not inventory_item and variant_id:
+                inventory_item = looked_up.get(_gid("ProductVariant", variant_id))
+                if inventory_item and location:
+                    self.resolved_inventory_refs[str(item.get("sku"))] = (
+                        str(variant_id),
+                        _legacy_id(inventory_item),
+                        _legacy_id(location),
                     )
-                )
+            if not location:
+                error = "Could not resolve a Shopify location for inventory update"
+            elif not variant_id:
+                error = "Missing Shopify external_variant_id for inventory update"
+            elif not inventory_item:
+                error = "Could not resolve Shopify inventory item for variant"
             else:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        external_product_id=str(item.get("external_product_id") or ""),
-                        external_variant_id=str(variant_id),
-                        publish_state=item.get("publish_state", "draft"),
-                        error=str(result.get("error") or "Shopify pricing sync failed"),
-                        payload=payload,
-                        response=result,
+                pending.append(
+                    (
+                        idx,
+                        {
+                            "inventoryItemId": _gid("InventoryItem", inventory_item),
+                            "locationId": location,
+                            "quantity": quantity,
+                        },
                     )
                 )
-        return self._summarize(results)
+                continue
+            results[idx] = self._variant_result(item, {"quantity": {"quantity": quantity}}, error)
+
+        outputs = await self._map_batches(
+            lambda batch: self._inventory_batch([(items[idx], q) for idx, q in batch]),
+            pending,
+            self.graphql_inventory_batch,
+        )
+        for (idx, _), output in zip(pending, outputs):
+            results[idx] = output
+        return [r for r in results if r is not None]
+
+    async def _inventory_batch(self, entries: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[ConnectorItemResult]:
+        result = await self._graphql(
+            INVENTORY_SET_MUTATION,
+            {
+                "input": {
+                    "name": "available",
+                    "reason": "correction",
+                    "ignoreCompareQuantity": True,
+                    "quantities": [quantity for _, quantity in entries],
+                }
+            },
+        )
+        node = (result.get("data") or {}).get("inventorySetQuantities") or {}
+        by_index, general = _errors_by_index(node.get("userErrors") or [], "quantities")
+        outputs = []
+        for position, (item, quantity) in enumerate(entries):
+            if not result.get("ok"):
+                error = str(result.get("error") or "Shopify inventory sync failed")
+            else:
+                error = _user_error_text(by_index.get(position, []) + general)
+            outputs.append(self._variant_result(item, {"quantity": quantity}, error, node or result))
+        return outputs
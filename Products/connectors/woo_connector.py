@@ -4,15 +4,26 @@
 from __future__ import annotations
 
 import os
-from typing import Any, Dict, List, Optional
-
-from requests.auth import HTTPBasicAuth
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 from .base_connector import BaseConnector, ConnectorItemResult
 
 
+@dataclass
+class _BatchOp:
+    item: Dict[str, Any]
+    sku: str
+    product_id: Optional[str]
+    payload: Dict[str, Any]
+
+
 class WooConnector(BaseConnector):
     name = "woo"
+    rate_per_sec = 10.0
+    rate_burst = 10
+    # /products/batch accepts at most 100 create+update operations per request.
+    batch_size = 100
 
     def __init__(self, dry_run: bool = False):
         super().__init__(dry_run=dry_run)
@@ -24,24 +35,52 @@ class WooConnector(BaseConnector):
         if not dry_run and (not self.ck or not self.cs):
             raise RuntimeError("Missing WC_CONSUMER_KEY/WC_CONSUMER_SECRET for Woo connector")
 
-    def _auth(self) -> Optional[HTTPBasicAuth]:
+    def _auth(self) -> Optional[Tuple[str, str]]:
         if self.dry_run:
             return None
-        return HTTPBasicAuth(self.ck, self.cs)
+        return (self.ck, self.cs)
+
+    def _products_url(self) -> str:
+        return f"{self.store_url}/wp-json/wc/v3/products"
+
+    async def _resolve_product_ids(self, skus: List[str]) -> Dict[str, str]:
+        """Look up Woo product ids for many SKUs with comma-separated ``sku`` queries."""
+        found: Dict[str, str] = {}
+        unique = list(dict.fromkeys(s for s in skus if s))
+        for i in range(0, len(unique), self.batch_size):
+            chunk = unique[i : i + self.batch_size]
+            result = await self._request(
+                "GET",
+                self._products_url(),
+                auth=self._auth(),
+                params={"sku": ",".join(chunk), "per_page": len(chunk)},
+            )
+            if not result.get("ok"):
+                continue
+            for product in result.get("data") or []:
+                if product.get("sku") and product.get("id"):
+                    found[str(product["sku"])] = str(product["id"])
+        return found
 
-    def _find_by_sku(self, sku: str) -> Optional[Dict[str, Any]]:
-        result = self._request(
-            "GET",
-            f"{self.store_url}/wp-json/wc/v3/products",
-            auth=self._auth(),
-            params={"sku": sku, "per_page": 1},
-        )
-        if not result.get("ok"):
-            return None
-        data = result.get("data") or []
-        if data:
-            return data[0]
-        return None
+    async def fetch_id_index_async(self, modified_after: Optional[str] = None) -> Dict[str, Tuple[str, Optional[str]]]:
+        if self.dry_run:
+            return {}
+        index: Dict[str, Tuple[str, Optional[str]]] = {}
+        page = 1
+        while True:
+            params: Dict[str, Any] = {"per_page": 100, "page": page, "orderby": "id", "order": "asc"}
+            if modified_after:
+                params["modified_after"] = modified_after
+            result = await self._request("GET", self._products_url(), auth=self._auth(), params=params)
+            if not result.get("ok"):
+                raise RuntimeError(f"Woo product listing failed on page {page}: {result.get('error')}")
+            products = result.get("data") or []
+            for product in products:
+                if product.get("sku") and product.get("id"):
+                    index[str(product["sku"])] = (str(product["id"]), None)
+            if len(products) < 100:
+                return index
+            page += 1
 
     def _product_payload(self, item: Dict[str, Any]) -> Dict[str, Any]:
         tags = []
@@ -63,206 +102,122 @@ class WooConnector(BaseConnector):
         }
         return payload
 
-    def sync_catalog(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        results: List[ConnectorItemResult] = []
-        for item in items:
-            sku = str(item.get("sku") or "").strip()
-            payload = self._product_payload(item)
-            if not sku:
-                results.append(
-                    ConnectorItemResult(
-                        sku="",
-                        success=False,
-                        error="Missing SKU",
-                        payload=payload,
-                    )
-                )
-                continue
-            if self.dry_run:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=item.get("external_product_id"),
-                        external_variant_id=item.get("external_variant_id"),
-                        publish_state=payload["status"],
-                        payload=payload,
-                        response={"dry_run": True},
-                    )
-                )
-                continue
-
-            existing = self._find_by_sku(sku)
-            if existing and existing.get("id"):
-                result = self._request(
-                    "PUT",
-                    f"{self.store_url}/wp-json/wc/v3/products/{existing['id']}",
-                    auth=self._auth(),
-                    json=payload,
-                )
+    async def _push_batch(self, ops: List[_BatchOp], label: str) -> List[ConnectorItemResult]:
+        """Send one /products/batch request and map each create/update entry back to its SKU."""
+        creates = [op for op in ops if not op.product_id]
+        updates = [op for op in ops if op.product_id]
+        body = {
+            "create": [op.payload for op in creates],
+            "update": [{**op.payload, "id": int(op.product_id) if str(op.product_id).isdigit() else op.product_id} for op in updates],
+        }
+        result = await self._request("POST", f"{self._products_url()}/batch", auth=self._auth(), json=body)
+        if not result.get("ok"):
+            error = str(result.get("error") or f"Woo {label} batch failed")
+            return [self._batch_failure(op, error, result) for op in ops]
+
+        data = result.get("data") or {}
+        entries = {id(op): entry for op, entry in zip(creates, data.get("create") or [])}
+        entries.update({id(op): entry for op, entry in zip(updates, data.get("update") or [])})
+        out: List[ConnectorItemResult] = []
+        for op in ops:
+            entry = entries.get(id(op))
+            if entry is None:
+                out.append(self._batch_failure(op, f"Woo {label} batch returned no result", data))
+            elif entry.get("error"):
+                error = entry["error"]
+                message = error.get("message") if isinstance(error, dict) else str(error)
+                out.append(self._batch_failure(op, str(message or f"Woo {label} sync failed"), entry))
             else:
-                result = self._request(
-                    "POST",
-                    f"{self.store_url}/wp-json/wc/v3/products",
-                    auth=self._auth(),
-                    json=payload,
-                )
-
-            if result.get("ok"):
-                data = result.get("data") or {}
-                results.append(
+                out.append(
                     ConnectorItemResult(
-                        sku=sku,
+                        sku=op.sku,
                         success=True,
-                        external_product_id=str(data.get("id") or ""),
-                        publish_state=data.get("status", payload["status"]),
-                        payload=payload,
-                        response=data,
+                        external_product_id=str(entry.get("id") or op.product_id or ""),
+                        publish_state=entry.get("status") or op.payload.get("status") or op.item.get("publish_state", "draft"),
+                        payload=op.payload,
+                        response=entry,
                     )
                 )
-            else:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        publish_state=payload["status"],
-                        error=str(result.get("error") or "Woo sync failed"),
-                        payload=payload,
-                        response=result,
-                    )
-                )
-
-        return self._summarize(results)
+        return out
+
+    def _batch_failure(self, op: _BatchOp, error: str, response: Dict[str, Any]) -> ConnectorItemResult:
+        return ConnectorItemResult(
+            sku=op.sku,
+            success=False,
+            external_product_id=str(op.product_id) if op.product_id else None,
+            publish_state=op.payload.get("status") or op.item.get("publish_state", "draft"),
+            error=error,
+            payload=op.payload,
+            response=response,
+        )
 
-    def sync_inventory(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        results: List[ConnectorItemResult] = []
-        for item in items:
+    async def _sync_batched(
+        self,
+        items: List[Dict[str, Any]],
+        label: str,
+        allow_create: bool,
+        build_payload: Callable[[Dict[str, Any]], Dict[str, Any]],
+    ) -> Dict[str, Any]:
+        results: List[Optional[ConnectorItemResult]] = [None] * len(items)
+        ops: List[_BatchOp] = []
+        positions: List[int] = []
+        for idx, item in enumerate(items):
             sku = str(item.get("sku") or "").strip()
-            qty = int(item.get("sellable_qty", 0))
-            payload = {"manage_stock": True, "stock_quantity": max(qty, 0)}
-            if self.dry_run:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=item.get("external_product_id"),
-                        publish_state=item.get("publish_state", "draft"),
-                        payload=payload,
-                        response={"dry_run": True},
-                    )
-                )
-                continue
-
-            product_id = item.get("external_product_id")
-            if not product_id:
-                existing = self._find_by_sku(sku)
-                product_id = str(existing.get("id")) if existing else ""
-
-            if not product_id:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        error="Woo product_id not found for inventory update",
-                        payload=payload,
-                    )
-                )
+            payload = build_payload(item)
+            if not sku:
+                results[idx] = ConnectorItemResult(sku="", success=False, error="Missing SKU", payload=payload)
                 continue
-
-            result = self._request(
-                "PUT",
-                f"{self.store_url}/wp-json/wc/v3/products/{product_id}",
-                auth=self._auth(),
-                json=payload,
-            )
-            if result.get("ok"):
-                data = result.get("data") or {}
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=str(data.get("id") or product_id),
-                        publish_state=data.get("status", item.get("publish_state", "draft")),
-                        payload=payload,
-                        response=data,
-                    )
-                )
-            else:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        external_product_id=str(product_id),
-                        error=str(result.get("error") or "Woo inventory sync failed"),
-                        payload=payload,
-                        response=result,
-                    )
-                )
-
-        return self._summarize(results)
-
-    def sync_pricing(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
-        results: List[ConnectorItemResult] = []
-        for item in items:
-            sku = str(item.get("sku") or "").strip()
-            payload = {"regular_price": str(item.get("price_sar", 0))}
             if self.dry_run:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=item.get("external_product_id"),
-                        publish_state=item.get("publish_state", "draft"),
-                        payload=payload,
-                        response={"dry_run": True},
-                    )
+                results[idx] = ConnectorItemResult(
+                    sku=sku,
+                    success=True,
+                    external_product_id=item.get("external_product_id"),
+                    external_variant_id=item.get("external_variant_id") if allow_create else None,
+                    publish_state=payload.get("status") or item.get("publish_state", "draft"),
+                    payload=payload,
+                    response={"dry_run": True},
                 )
                 continue
-
-            product_id = item.get("external_product_id")
-            if not product_id:
-                existing = self._find_by_sku(sku)
-                product_id = str(existing.get("id")) if existing else ""
-
-            if not product_id:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
+            ops.append(_BatchOp(item=item, sku=sku, product_id=item.get("external_product_id") or None, payload=payload))
+            positions.append(idx)
+
+        missing = [op.sku for op in ops if not op.product_id]
+        if missing and not self.ids_resolved:
+            resolved = await self._resolve_product_ids(missing)
+            for op in ops:
+                if not op.product_id:
+                    op.product_id = resolved.get(op.sku)
+
+        if not allow_create:
+            sendable = []
+            for idx, op in zip(positions, ops):
+                if op.product_id:
+                    sendable.append((idx, op))
+                else:
+                    results[idx] = ConnectorItemResult(
+                        sku=op.sku,
                         success=False,
-                        error="Woo product_id not found for price update",
-                        payload=payload,
+                        error=f"Woo product_id not found for {label} update",
+                        payload=op.payload,
                     )
-                )
-                continue
-
-            result = self._request(
-                "PUT",
-                f"{self.store_url}/wp-json/wc/v3/products/{product_id}",
-                auth=self._auth(),
-                json=payload,
-            )
-            if result.get("ok"):
-                data = result.get("data") or {}
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=str(data.get("id") or product_id),
-                        publish_state=data.get("status", item.get("publish_state", "draft")),
-                        payload=payload,
-                        response=data,
-                    )
-                )
-            else:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        external_product_id=str(product_id),
-                        error=str(result.get("error") or "Woo pricing sync failed"),
-                        payload=payload,
-                        response=result,
-                    )
-                )
+        else:
+            sendable = list(zip(positions, ops))
+
+        pushed = await self._map_batches(lambda batch: self._push_batch(batch, label), [op for _, op in sendable], self.batch_size)
+        for (idx, _), result in zip(sendable, pushed):
+            results[idx] = result
+        return self._summarize([r for r in results if r is not None])
+
+    async def sync_catalog_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return await self._sync_batched(items, "catalog", True, self._product_payload)
+
+    async def sync_inventory_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return await self._sync_batched(
+            items,
+            "inventory",
+            False,
+            lambda item: {"manage_stock": True, "stock_quantity": max(int(item.get("sellable_qty", 0)), 0)},
+        )
 
-        return self._summarize(results)
+    async def sync_pricing_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+        return await self._sync_batched(items, "price", False, lambda item: {"regular_price": str(item.get("price_sar", 0))})
@@ -5,15 +5,20 @@ from __future__ import annotations
 
 import csv
 import os
+import sys
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
 from .base_connector import BaseConnector, ConnectorItemResult
 
 
 class ZidConnector(BaseConnector):
     name = "zid"
+    rate_per_sec = 5.0
+    rate_burst = 10
+    # PATCH /products/ bulk updates are capped at 50 products per request.
+    bulk_size = 50
 
     def __init__(self, dry_run: bool = False):
         super().__init__(dry_run=dry_run)
@@ -22,6 +27,10 @@ class ZidConnector(BaseConnector):
         self.output_dir = Path(os.environ.get("ZID_EXPORT_DIR", "") or Path(__file__).resolve().parents[1] / "output")
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
+    def min_chunk_items(self, mode: str) -> int:
+        # Without API access the run produces one CSV import file; keep it whole.
+        return sys.maxsize if self.dry_run or not self.token else 1
+
     def _headers(self) -> Dict[str, str]:
         return {
             "Authorization": f"Bearer {self.token}",
@@ -29,9 +38,33 @@ class ZidConnector(BaseConnector):
             "Accept": "application/json",
         }
 
+    async def fetch_id_index_async(self, modified_after: Optional[str] = None) -> Dict[str, Tuple[str, Optional[str]]]:
+        # CSV fallback mode has no API to list; the listing has no modification-time filter.
+        if self.dry_run or not self.token:
+            return {}
+        index: Dict[str, Tuple[str, Optional[str]]] = {}
+        url: Optional[str] = f"{self.api_base}/products/"
+        params: Optional[Dict[str, Any]] = {"page_size": 100}
+        while url:
+            result = await self._request("GET", url, headers=self._headers(), params=params)
+            if not result.get("ok"):
+                raise RuntimeError(f"Zid product listing failed: {result.get('error')}")
+            body = result.get("data") or {}
+            for product in body.get("results") or []:
+                if product.get("sku") and product.get("id"):
+                    index[str(product["sku"])] = (str(product["id"]), None)
+            url = body.get("next") or None
+            params = None
+        return index
+
     def _export_csv(self, items: List[Dict[str, Any]], suffix: str) -> str:
         ts = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
         path = self.output_dir / f"zid_{suffix}_{ts}.csv"
+        # Chunked syncs can export twice within a second; never overwrite an earlier file.
+        n = 1
+        while path.exists():
+            n += 1
+            path = self.output_dir / f"zid_{suffix}_{ts}_{n}.csv"
         fields = [
             "sku",
             "name_ar",
@@ -80,7 +113,7 @@ class ZidConnector(BaseConnector):
             "weight": item.get("weight", 0),
         }
 
-    def sync_catalog(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def sync_catalog_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
         if self.dry_run or not self.token:
             export_file = self._export_csv(items, "catalog")
             out = []
@@ -97,54 +130,50 @@ class ZidConnector(BaseConnector):
                 )
             return self._summarize(out)
 
-        results: List[ConnectorItemResult] = []
-        for item in items:
-            sku = str(item.get("sku") or "")
-            payload = self._catalog_payload(item)
-            ext_id = item.get("external_product_id")
-            if ext_id:
-                result = self._request(
-                    "PUT",
-                    f"{self.api_base}/products/{ext_id}",
-                    headers=self._headers(),
-                    json=payload,
-                )
-            else:
-                result = self._request(
-                    "POST",
-                    f"{self.api_base}/products",
-                    headers=self._headers(),
-                    json=payload,
-                )
+        return self._summarize(await self._map_items(self._catalog_item, items))
 
-            if result.get("ok"):
-                data = result.get("data") or {}
-                pid = str(data.get("id") or ext_id or sku)
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=pid,
-                        publish_state="publish" if item.get("status") == "publish" else "draft",
-                        payload=payload,
-                        response=data,
-                    )
-                )
-            else:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        external_product_id=str(ext_id or ""),
-                        publish_state="draft",
-                        error=str(result.get("error") or "Zid catalog sync failed"),
-                        payload=payload,
-                        response=result,
-                    )
-                )
-        return self._summarize(results)
+    async def _catalog_item(self, item: Dict[str, Any]) -> ConnectorItemResult:
+        sku = str(item.get("sku") or "")
+        payload = self._catalog_payload(item)
+        ext_id = item.get("external_product_id")
+        if ext_id:
+            result = await self._request(
+                "PUT",
+                f"{self.api_base}/products/{ext_id}",
+                headers=self._headers(),
+                json=payload,
+            )
+        else:
+            result = await self._request(
+                "POST",
+                f"{self.api_base}/products",
+                headers=self._headers(),
+                json=payload,
+            )
+
+        if result.get("ok"):
+            data = result.get("data") or {}
+            pid = str(data.get("id") or ext_id or sku)
+            return ConnectorItemResult(
+                sku=sku,
+                success=True,
+                external_product_id=pid,
+                publish_state="publish" if item.get("status") == "publish" else "draft",
+                payload=payload,
+                response=data,
+            )
+        else:
+            return ConnectorItemResult(
+                sku=sku,
+                success=False,
+                external_product_id=str(ext_id or ""),
+                publish_state="draft",
+                error=str(result.get("error") or "Zid catalog sync failed"),
+                payload=payload,
+                response=result,
+            )
 
-    def sync_inventory(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def sync_inventory_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
         if self.dry_run or not self.token:
             export_file = self._export_csv(items, "inventory")
             out = []
@@ -161,53 +190,11 @@ class ZidConnector(BaseConnector):
                 )
             return self._summarize(out)
 
-        results: List[ConnectorItemResult] = []
-        for item in items:
-            sku = str(item.get("sku") or "")
-            ext_id = item.get("external_product_id")
-            payload = {"quantity": int(item.get("sellable_qty", 0))}
-            if not ext_id:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        error="Missing Zid external_product_id for inventory update",
-                        payload=payload,
-                    )
-                )
-                continue
-            result = self._request(
-                "PUT",
-                f"{self.api_base}/products/{ext_id}/quantity",
-                headers=self._headers(),
-                json=payload,
-            )
-            if result.get("ok"):
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=str(ext_id),
-                        publish_state=item.get("publish_state", "draft"),
-                        payload=payload,
-                        response=result.get("data") or {},
-                    )
-                )
-            else:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        external_product_id=str(ext_id),
-                        publish_state=item.get("publish_state", "draft"),
-                        error=str(result.get("error") or "Zid inventory sync failed"),
-                        payload=payload,
-                        response=result,
-                    )
-                )
-        return self._summarize(results)
+        return self._summarize(
+            await self._sync_bulk(items, "inventory", lambda item: {"quantity": int(item.get("sellable_qty", 0))}, self._send_bulk)
+        )
 
-    def sync_pricing(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    async def sync_pricing_async(self, items: List[Dict[str, Any]]) -> Dict[str, Any]:
         if self.dry_run or not self.token:
             export_file = self._export_csv(items, "pricing")
             out = []
@@ -224,48 +211,10 @@ class ZidConnector(BaseConnector):
                 )
             return self._summarize(out)
 
-        results: List[ConnectorItemResult] = []
-        for item in items:
-            sku = str(item.get("sku") or "")
-            ext_id = item.get("external_product_id")
-            payload = {"price": float(item.get("price_sar", 0))}
-            if not ext_id:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        error="Missing Zid external_product_id for pricing update",
-                        payload=payload,
-                    )
-                )
-                continue
-            result = self._request(
-                "PUT",
-                f"{self.api_base}/products/{ext_id}/price",
-                headers=self._headers(),
-                json=payload,
-            )
-            if result.get("ok"):
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=True,
-                        external_product_id=str(ext_id),
-                        publish_state=item.get("publish_state", "draft"),
-                        payload=payload,
-                        response=result.get("data") or {},
-                    )
-                )
-            else:
-                results.append(
-                    ConnectorItemResult(
-                        sku=sku,
-                        success=False,
-                        external_product_id=str(ext_id),
-                        publish_state=item.get("publish_state", "draft"),
-                        error=str(result.get("error") or "Zid pricing sync failed"),
-                        payload=payload,
-                        response=result,
-                    )
-                )
-        return self._summarize(results)
+        return self._summarize(
+            await self._sync_bulk(items, "pricing", lambda item: {"price": float(item.get("price_sar", 0))}, self._send_bulk)
+        )
+
+    async def _send_bulk(self, chunk: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """PATCH a list of ``{id, field}`` updates to the products collection."""
+        return await self._request("PATCH", f"{self.api_base}/products/", headers=self._headers(), json=chunk)
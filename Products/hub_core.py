@@ -9,11 +9,16 @@ import hashlib
 import json
 import math
 import os
+import queue
 import re
 import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional, Sequence
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 from urllib.parse import urlparse
 
 BASE_DIR = Path(__file__).resolve().parent
@@ -28,6 +33,31 @@ SCOPE_TO_FILE = {
 }
 SCOPE_LIMIT = {"top50": 50, "top100": 100, "top200": 200}
 STAGE_TO_SCOPE = {"wave50": "top50", "wave100": "top100", "wave200": "top200"}
+DEFAULT_PG_POOL_SIZE = 4
+DEFAULT_PG_POOL_TIMEOUT = 30.0
+PG_COPY_MIN_ROWS = 500
+RESULT_WRITE_CHUNK = 500
+# Webhook events that failed to apply this often stay in webhook_inbox for inspection.
+INBOX_MAX_ATTEMPTS = 5
+SQLITE_BUSY_TIMEOUT = 30.0
+CONFIG_CACHE_TTL_SECONDS = 30.0
+
+# Item fields that decide whether a mode has anything new to push.
+# Modes not listed (catalog, reconcile) hash the whole item.
+DELTA_MODE_FIELDS = {
+    "inventory": ("sku", "sellable_qty", "publish_state"),
+    "pricing": ("sku", "price_sar", "publish_state"),
+}
+DELTA_IGNORED_FIELDS = {"external_product_id", "external_variant_id", "inventory_item_id", "location_id"}
+
+# catalog_changes facets each sync mode cares about; unlisted modes read all.
+CATALOG_FACETS = ("product", "inventory", "pricing")
+FACET_TABLES = {"product": "catalog_products", "inventory": "catalog_inventory", "pricing": "catalog_pricing"}
+MODE_FACETS = {"inventory": ("inventory",), "pricing": ("pricing",)}
+
+# channel_sync_cursors mode whose last_version holds the Unix time of the last
+# SKU -> external id index refresh.
+ID_INDEX_CURSOR = "id_index"
 
 DEFAULT_PRICE_RULES = {
     "woo": {"fee_pct": 2.50, "payment_pct": 2.00, "ops_buffer_sar": 2.0, "round_rule": "nearest_9", "active": True},
@@ -63,6 +93,15 @@ class ProductRow:
     vat_included_bool: bool
 
 
+@dataclass
+class ChannelConfig:
+    channel: str
+    rule: Optional[Dict[str, Any]]
+    categories: Dict[str, str]
+    version: tuple
+    checked_at: float
+
+
 def load_local_env(env_path: Optional[Path] = None) -> None:
     """Load .env values into process environment if missing."""
     path = env_path or (BASE_DIR / ".env")
@@ -104,6 +143,23 @@ def _to_int(value: Any, default: int = 0) -> int:
         return default
 
 
+def _order_event_deltas(event_type: str, payload: Dict[str, Any]) -> Dict[str, int]:
+    """Signed reserved-qty change per SKU for one webhook event (orders reserve, cancellations/returns release)."""
+    if event_type == "orders":
+        sign = 1
+    elif event_type in {"cancellations", "returns"}:
+        sign = -1
+    else:
+        return {}
+    deltas: Dict[str, int] = {}
+    for item in payload.get("items") or payload.get("line_items") or []:
+        sku = (item.get("sku") or "").strip()
+        qty = max(_to_int(item.get("qty") or item.get("quantity"), 0), 0)
+        if sku and qty > 0:
+            deltas[sku] = deltas.get(sku, 0) + sign * qty
+    return deltas
+
+
 def _to_bool(value: Any, default: bool = True) -> bool:
     if isinstance(value, bool):
         return value
@@ -122,6 +178,20 @@ def hash_payload(payload: Dict[str, Any]) -> str:
     return hashlib.sha256(encoded).hexdigest()
 
 
+def delta_hash(item: Dict[str, Any], mode: str) -> str:
+    """Hash the part of a built item that a given sync mode pushes.
+
+    Hashes are stored per (channel, sku, mode) in channel_payload_hashes, so
+    alternating inventory and pricing runs do not overwrite each other's.
+    """
+    fields = DELTA_MODE_FIELDS.get(mode)
+    if fields is None:
+        body = {k: v for k, v in item.items() if k not in DELTA_IGNORED_FIELDS}
+    else:
+        body = {k: item.get(k) for k in fields}
+    return hash_payload(body)
+
+
 def round_nearest_9(value: float) -> float:
     if value <= 0:
         return 9.0
@@ -151,10 +221,143 @@ def compute_channel_price(
     return round(channel_price, 2)
 
 
+def parse_products_csv(path: Path, scope: str) -> List[ProductRow]:
+    """Parse a Woo-format scope CSV into product rows, skipping rows without a SKU."""
+    products: List[ProductRow] = []
+    with open(path, "r", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            sku = (row.get("SKU") or "").strip()
+            if not sku:
+                continue
+            name_en = (row.get("Name") or "").strip() or sku
+            description = (row.get("Description") or "").strip()
+            price = _to_float(row.get("Regular price"), 0.0)
+            margin = _to_float(row.get("Meta: _margin"), 25.0)
+            base_cost = _to_float(row.get("Meta: _cost"), 0.0)
+            if base_cost <= 0 and price > 0:
+                base_cost = price / (1 + max(margin, 0.0) / 100.0)
+            stock = _to_int(row.get("Stock"), 0)
+            images_field = (row.get("Images") or "").strip()
+            images = [x.strip() for x in images_field.split(",") if x.strip()]
+            status = "publish" if str(row.get("Published", "0")).strip() == "1" else "draft"
+            products.append(
+                ProductRow(
+                    sku=sku,
+                    name_ar=name_en,
+                    name_en=name_en,
+                    desc_ar=description,
+                    desc_en=description,
+                    brand=(row.get("Brands") or "").strip(),
+                    status=status,
+                    category_key=(row.get("Categories") or "uncategorized").strip() or "uncategorized",
+                    weight=_to_float(row.get("Weight (kg)"), 0.0),
+                    barcode=(row.get("barcode") or row.get("Barcode") or "").strip(),
+                    images=images,
+                    source_scope=scope,
+                    stock_on_hand=max(stock, 0),
+                    reserved_qty=0,
+                    safety_stock=1,
+                    base_cost_sar=max(base_cost, 0.0),
+                    target_margin_pct=max(margin, 0.0),
+                    vat_included_bool=True,
+                )
+            )
+    return products
+
+
+def _product_params(row: ProductRow) -> tuple:
+    return (
+        row.sku,
+        row.name_ar,
+        row.name_en,
+        row.desc_ar,
+        row.desc_en,
+        row.brand,
+        row.status,
+        row.category_key,
+        row.weight,
+        row.barcode,
+        json.dumps(row.images, ensure_ascii=False),
+        row.source_scope,
+    )
+
+
+class ConnectionPool:
+    """Bounded pool of reusable DB connections.
+
+    At most ``max_size`` connections exist at once; callers block up to
+    ``timeout`` seconds for one to be released before giving up.
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_size: int, timeout: float = DEFAULT_PG_POOL_TIMEOUT):
+        if max_size < 1:
+            raise HubConfigError("Connection pool size must be at least 1")
+        self._factory = factory
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(max_size)
+        self.max_size = max_size
+        self.timeout = timeout
+
+    def acquire(self) -> Any:
+        if not self._slots.acquire(timeout=self.timeout):
+            raise HubConfigError(f"Timed out waiting {self.timeout}s for a DB connection (pool size {self.max_size})")
+        try:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    return self._factory()
+                if not _conn_unusable(conn):
+                    return conn
+                _close_quietly(conn)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def release(self, conn: Any, discard: bool = False) -> None:
+        try:
+            if discard or _conn_unusable(conn):
+                _close_quietly(conn)
+            else:
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        while True:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            _close_quietly(conn)
+
+
+def _conn_unusable(conn: Any) -> bool:
+    return bool(getattr(conn, "closed", False) or getattr(conn, "broken", False))
+
+
+def _close_quietly(conn: Any) -> None:
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
 class HubDB:
-    """DB abstraction for Postgres (preferred) and SQLite (local fallback)."""
+    """DB abstraction for Postgres (preferred) and SQLite (local fallback).
+
+    Postgres connections come from a bounded ``ConnectionPool``; SQLite keeps
+    one persistent connection per thread. All statements run inside
+    ``transaction()``, which nests: only the outermost block commits.
+    """
 
-    def __init__(self, db_url: Optional[str], schema_path: Path = SCHEMA_PATH):
+    def __init__(
+        self,
+        db_url: Optional[str],
+        schema_path: Path = SCHEMA_PATH,
+        pool_size: Optional[int] = None,
+    ):
         self.db_url = (db_url or "").strip()
         if not self.db_url:
             self.db_url = f"sqlite:///{DEFAULT_SQLITE_PATH}"
@@ -172,6 +375,14 @@ class HubDB:
                 "Unsupported HUB_DB_URL. Use postgresql://... or sqlite:///..."
             )
         self.schema_path = schema_path
+        self.pool_size = pool_size or _to_int(os.environ.get("HUB_DB_POOL_SIZE"), DEFAULT_PG_POOL_SIZE)
+        self._pool: Optional[ConnectionPool] = None
+        self._pool_lock = threading.Lock()
+        self._local = threading.local()
+        self._sqlite_conns: List[sqlite3.Connection] = []
+        self.last_load_stats: Dict[str, Any] = {}
+        self._config_cache: Dict[str, ChannelConfig] = {}
+        self._config_lock = threading.Lock()
 
     def _pg_connect(self):
         try:
@@ -192,7 +403,7 @@ class HubDB:
 
     def _sqlite_connect(self):
         path = self._sqlite_path()
-        conn = sqlite3.connect(path)
+        conn = sqlite3.connect(path, timeout=SQLITE_BUSY_TIMEOUT)
         conn.row_factory = sqlite3.Row
         return conn
 
@@ -201,6 +412,70 @@ class HubDB:
             return self._pg_connect()
         return self._sqlite_connect()
 
+    def _get_pool(self) -> ConnectionPool:
+        if self._pool is None:
+            with self._pool_lock:
+                if self._pool is None:
+                    self._pool = ConnectionPool(self._pg_connect, self.pool_size)
+        return self._pool
+
+    def _thread_sqlite_conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "sqlite_conn", None)
+        if conn is None:
+            conn = self._sqlite_connect()
+            self._local.sqlite_conn = conn
+            with self._pool_lock:
+                self._sqlite_conns.append(conn)
+        return conn
+
+    @contextmanager
+    def transaction(self) -> Iterator[Any]:
+        """Yield a connection bound to the current thread's transaction.
+
+        Nested calls reuse the outer connection; the outermost block commits
+        on success and rolls back on error.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.depth += 1
+            try:
+                yield conn
+            finally:
+                self._local.depth -= 1
+            return
+
+        if self.backend == "postgres":
+            pool = self._get_pool()
+            conn = pool.acquire()
+        else:
+            conn = self._thread_sqlite_conn()
+        self._local.conn = conn
+        self._local.depth = 1
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            raise
+        finally:
+            self._local.conn = None
+            self._local.depth = 0
+            if self.backend == "postgres":
+                pool.release(conn)
+
+    def close(self) -> None:
+        """Close pooled Postgres connections and all per-thread SQLite connections."""
+        if self._pool is not None:
+            self._pool.close()
+        with self._pool_lock:
+            conns, self._sqlite_conns = self._sqlite_conns, []
+        for conn in conns:
+            _close_quietly(conn)
+        self._local = threading.local()
+
     def ensure_schema(self) -> None:
         if self.backend == "postgres":
             self._ensure_schema_postgres()
@@ -209,10 +484,9 @@ class HubDB:
 
     def _ensure_schema_postgres(self) -> None:
         sql = self.schema_path.read_text(encoding="utf-8")
-        with self._connect() as conn:
+        with self.transaction() as conn:
             with conn.cursor() as cur:
                 cur.execute(sql)
-            conn.commit()
 
     def _ensure_schema_sqlite(self) -> None:
         statements = [
@@ -302,6 +576,31 @@ class HubDB:
             )
             """,
             """
+            CREATE TABLE IF NOT EXISTS webhook_inbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                channel TEXT NOT NULL,
+                external_order_id TEXT NOT NULL,
+                event_type TEXT NOT NULL,
+                event_ts TEXT NOT NULL,
+                payload_json TEXT NOT NULL,
+                idempotency_key TEXT NOT NULL UNIQUE,
+                received_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS inventory_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                sku TEXT NOT NULL,
+                sellable_qty INTEGER NOT NULL,
+                source_channel TEXT,
+                enqueued_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now')),
+                leased_by TEXT,
+                leased_until TEXT
+            )
+            """,
+            """
             CREATE TABLE IF NOT EXISTS sync_jobs (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 channel TEXT NOT NULL,
@@ -314,7 +613,17 @@ class HubDB:
                 processed_count INTEGER NOT NULL DEFAULT 0,
                 success_count INTEGER NOT NULL DEFAULT 0,
                 failed_count INTEGER NOT NULL DEFAULT 0,
-                error_summary TEXT
+                error_summary TEXT,
+                heartbeat_at TEXT
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS sync_job_items (
+                job_id INTEGER NOT NULL,
+                sku TEXT NOT NULL,
+                success INTEGER NOT NULL,
+                done_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (job_id, sku)
             )
             """,
             """
@@ -327,77 +636,182 @@ class HubDB:
                 error TEXT NOT NULL,
                 retries INTEGER NOT NULL DEFAULT 0,
                 created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
-                resolved_at TEXT
+                resolved_at TEXT,
+                leased_by TEXT,
+                leased_until TEXT
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS catalog_changes (
+                version INTEGER PRIMARY KEY AUTOINCREMENT,
+                sku TEXT NOT NULL,
+                facet TEXT NOT NULL,
+                changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS channel_sync_cursors (
+                channel TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                last_version INTEGER NOT NULL DEFAULT 0,
+                updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (channel, mode)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS channel_payload_hashes (
+                channel TEXT NOT NULL,
+                sku TEXT NOT NULL REFERENCES catalog_products(sku) ON DELETE CASCADE,
+                mode TEXT NOT NULL,
+                payload_hash TEXT,
+                updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (channel, sku, mode)
+            )
+            """,
+            """
+            CREATE TABLE IF NOT EXISTS channel_inventory_refs (
+                channel TEXT NOT NULL,
+                sku TEXT NOT NULL,
+                external_variant_id TEXT NOT NULL,
+                inventory_item_id TEXT NOT NULL,
+                location_id TEXT NOT NULL,
+                updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (channel, sku)
             )
             """,
         ]
-        with self._connect() as conn:
+        with self.transaction() as conn:
             cur = conn.cursor()
             for stmt in statements:
                 cur.execute(stmt)
-            conn.commit()
+            # Columns added after a table shipped; CREATE TABLE IF NOT EXISTS leaves old files as they were.
+            for table, columns in (("dead_letter_queue", ("leased_by", "leased_until")), ("sync_jobs", ("heartbeat_at",))):
+                existing = {row["name"] for row in cur.execute(f"PRAGMA table_info({table})").fetchall()}
+                for column in columns:
+                    if column not in existing:
+                        cur.execute(f"ALTER TABLE {table} ADD COLUMN {column} TEXT")
 
     def fetch_all(self, query_pg: str, query_sqlite: str, params: Sequence[Any] = ()) -> List[Dict[str, Any]]:
-        with self._connect() as conn:
+        with self.transaction() as conn:
             if self.backend == "postgres":
                 cur = conn.cursor()
                 cur.execute(query_pg, params)
                 rows = cur.fetchall()
-                conn.commit()
                 return list(rows)
             cur = conn.cursor()
             cur.execute(query_sqlite, params)
-            rows = [dict(r) for r in cur.fetchall()]
-            conn.commit()
-            return rows
+            return [dict(r) for r in cur.fetchall()]
 
     def execute(self, query_pg: str, query_sqlite: str, params: Sequence[Any] = ()) -> None:
-        with self._connect() as conn:
+        with self.transaction() as conn:
             cur = conn.cursor()
             if self.backend == "postgres":
                 cur.execute(query_pg, params)
             else:
                 cur.execute(query_sqlite, params)
-            conn.commit()
+
+    def executemany(self, query_pg: str, query_sqlite: str, params_seq: Sequence[Sequence[Any]]) -> None:
+        if not params_seq:
+            return
+        with self.transaction() as conn:
+            cur = conn.cursor()
+            if self.backend == "postgres":
+                cur.executemany(query_pg, params_seq)
+            else:
+                cur.executemany(query_sqlite, params_seq)
 
     def seed_default_price_rules(self) -> None:
-        for channel, rule in DEFAULT_PRICE_RULES.items():
-            self.execute(
-                """
-                INSERT INTO channel_price_rules
-                (channel, fee_pct, payment_pct, ops_buffer_sar, round_rule, active)
-                VALUES (%s, %s, %s, %s, %s, %s)
-                ON CONFLICT (channel) DO UPDATE SET
-                    fee_pct = EXCLUDED.fee_pct,
-                    payment_pct = EXCLUDED.payment_pct,
-                    ops_buffer_sar = EXCLUDED.ops_buffer_sar,
-                    round_rule = EXCLUDED.round_rule,
-                    active = EXCLUDED.active
-                """,
-                """
-                INSERT INTO channel_price_rules
-                (channel, fee_pct, payment_pct, ops_buffer_sar, round_rule, active)
-                VALUES (?, ?, ?, ?, ?, ?)
-                ON CONFLICT(channel) DO UPDATE SET
-                    fee_pct = excluded.fee_pct,
-                    payment_pct = excluded.payment_pct,
-                    ops_buffer_sar = excluded.ops_buffer_sar,
-                    round_rule = excluded.round_rule,
-                    active = excluded.active
-                """,
-                (
-                    channel,
-                    rule["fee_pct"],
-                    rule["payment_pct"],
-                    rule["ops_buffer_sar"],
-                    rule["round_rule"],
-                    bool(rule["active"]),
-                ),
-            )
+        self.invalidate_channel_config()
+        with self.transaction():
+            for channel, rule in DEFAULT_PRICE_RULES.items():
+                self.execute(
+                    """
+                    INSERT INTO channel_price_rules
+                    (channel, fee_pct, payment_pct, ops_buffer_sar, round_rule, active)
+                    VALUES (%s, %s, %s, %s, %s, %s)
+                    ON CONFLICT (channel) DO UPDATE SET
+                        fee_pct = EXCLUDED.fee_pct,
+                        payment_pct = EXCLUDED.payment_pct,
+                        ops_buffer_sar = EXCLUDED.ops_buffer_sar,
+                        round_rule = EXCLUDED.round_rule,
+                        active = EXCLUDED.active
+                    """,
+                    """
+                    INSERT INTO channel_price_rules
+                    (channel, fee_pct, payment_pct, ops_buffer_sar, round_rule, active)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(channel) DO UPDATE SET
+                        fee_pct = excluded.fee_pct,
+                        payment_pct = excluded.payment_pct,
+                        ops_buffer_sar = excluded.ops_buffer_sar,
+                        round_rule = excluded.round_rule,
+                        active = excluded.active
+                    """,
+                    (
+                        channel,
+                        rule["fee_pct"],
+                        rule["payment_pct"],
+                        rule["ops_buffer_sar"],
+                        rule["round_rule"],
+                        bool(rule["active"]),
+                    ),
+                )
 
     def upsert_product_row(self, row: ProductRow) -> None:
-        images_json = json.dumps(row.images, ensure_ascii=False)
-        self.execute(
+        self.upsert_product_rows([row])
+
+    def upsert_product_rows(self, rows: Sequence[ProductRow]) -> int:
+        """Upsert products with their inventory and pricing in one transaction.
+
+        Large Postgres batches are COPYed into a staging table and merged with
+        ``INSERT ... ON CONFLICT``; everything else goes through ``executemany``.
+        Later rows win when a SKU appears more than once.
+        """
+        unique = list({row.sku: row for row in rows}.values())
+        if not unique:
+            return 0
+        with self.transaction():
+            if self.backend == "postgres" and len(unique) >= PG_COPY_MIN_ROWS:
+                self._copy_merge_products_pg(unique)
+            else:
+                self._executemany_products(unique)
+        return len(unique)
+
+    def _facet_rows(self, facet: str, skus: Sequence[str]) -> Dict[str, Tuple[Any, ...]]:
+        """Current rows of one catalog facet by SKU, without updated_at (SQLite only)."""
+        if self.backend == "postgres":
+            return {}
+        found: Dict[str, Tuple[Any, ...]] = {}
+        table = FACET_TABLES[facet]
+        with self.transaction() as conn:
+            cur = conn.cursor()
+            for start in range(0, len(skus), RESULT_WRITE_CHUNK):
+                chunk = list(skus[start : start + RESULT_WRITE_CHUNK])
+                cur.execute(f"SELECT * FROM {table} WHERE sku IN ({', '.join(['?'] * len(chunk))})", chunk)
+                for row in cur.fetchall():
+                    values = {k: row[k] for k in row.keys() if k != "updated_at"}
+                    found[values["sku"]] = tuple(values.values())
+        return found
+
+    def _journal_changes(self, skus: Sequence[str], facet: str, before: Dict[str, Tuple[Any, ...]]) -> None:
+        """Append catalog_changes entries; Postgres does this with triggers.
+
+        ``before`` is the facet's ``_facet_rows`` snapshot from ahead of the
+        write. Like the trigger, SKUs whose row came out the same are skipped.
+        """
+        if self.backend == "postgres":
+            return
+        after = self._facet_rows(facet, skus)
+        self.executemany(
+            "INSERT INTO catalog_changes(sku, facet) VALUES (%s, %s)",
+            "INSERT INTO catalog_changes(sku, facet) VALUES (?, ?)",
+            [(sku, facet) for sku in skus if after.get(sku) != before.get(sku)],
+        )
+
+    def _executemany_products(self, rows: Sequence[ProductRow]) -> None:
+        skus = [row.sku for row in rows]
+        before = {facet: self._facet_rows(facet, skus) for facet in CATALOG_FACETS}
+        self.executemany(
             """
             INSERT INTO catalog_products
             (sku, name_ar, name_en, desc_ar, desc_en, brand, status, category_key, weight, barcode, images_json, source_scope)
@@ -433,24 +847,11 @@ class HubDB:
                 source_scope = excluded.source_scope,
                 updated_at = CURRENT_TIMESTAMP
             """,
-            (
-                row.sku,
-                row.name_ar,
-                row.name_en,
-                row.desc_ar,
-                row.desc_en,
-                row.brand,
-                row.status,
-                row.category_key,
-                row.weight,
-                row.barcode,
-                images_json,
-                row.source_scope,
-            ),
+            [_product_params(row) for row in rows],
         )
 
         if self.backend == "postgres":
-            self.execute(
+            self.executemany(
                 """
                 INSERT INTO catalog_inventory
                 (sku, stock_on_hand, reserved_qty, safety_stock)
@@ -469,10 +870,10 @@ class HubDB:
                     reserved_qty = excluded.reserved_qty,
                     safety_stock = excluded.safety_stock
                 """,
-                (row.sku, row.stock_on_hand, row.reserved_qty, row.safety_stock),
+                [(row.sku, row.stock_on_hand, row.reserved_qty, row.safety_stock) for row in rows],
             )
         else:
-            self.execute(
+            self.executemany(
                 """
                 INSERT INTO catalog_inventory
                 (sku, stock_on_hand, reserved_qty, safety_stock, sellable_qty)
@@ -494,16 +895,19 @@ class HubDB:
                     sellable_qty = excluded.sellable_qty,
                     updated_at = CURRENT_TIMESTAMP
                 """,
-                (
-                    row.sku,
-                    row.stock_on_hand,
-                    row.reserved_qty,
-                    row.safety_stock,
-                    max(row.stock_on_hand - row.reserved_qty - row.safety_stock, 0),
-                ),
+                [
+                    (
+                        row.sku,
+                        row.stock_on_hand,
+                        row.reserved_qty,
+                        row.safety_stock,
+                        max(row.stock_on_hand - row.reserved_qty - row.safety_stock, 0),
+                    )
+                    for row in rows
+                ],
             )
 
-        self.execute(
+        self.executemany(
             """
             INSERT INTO catalog_pricing
             (sku, base_cost_sar, target_margin_pct, vat_included_bool)
@@ -523,13 +927,106 @@ class HubDB:
                 vat_included_bool = excluded.vat_included_bool,
                 updated_at = CURRENT_TIMESTAMP
             """,
-            (
-                row.sku,
-                row.base_cost_sar,
-                row.target_margin_pct,
-                int(row.vat_included_bool),
-            ),
+            [
+                (
+                    row.sku,
+                    row.base_cost_sar,
+                    row.target_margin_pct,
+                    row.vat_included_bool if self.backend == "postgres" else int(row.vat_included_bool),
+                )
+                for row in rows
+            ],
         )
+        for facet in CATALOG_FACETS:
+            self._journal_changes(skus, facet, before[facet])
+
+    def _copy_merge_products_pg(self, rows: Sequence[ProductRow]) -> None:
+        with self.transaction() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                CREATE TEMP TABLE IF NOT EXISTS hub_stage_products (
+                    sku TEXT NOT NULL,
+                    name_ar TEXT,
+                    name_en TEXT,
+                    desc_ar TEXT,
+                    desc_en TEXT,
+                    brand TEXT,
+                    status TEXT,
+                    category_key TEXT,
+                    weight NUMERIC(12,3),
+                    barcode TEXT,
+                    images_json JSONB,
+                    source_scope TEXT,
+                    stock_on_hand INTEGER,
+                    reserved_qty INTEGER,
+                    safety_stock INTEGER,
+                    base_cost_sar NUMERIC(12,2),
+                    target_margin_pct NUMERIC(8,2),
+                    vat_included_bool BOOLEAN
+                ) ON COMMIT DROP
+                """
+            )
+            with cur.copy(
+                """
+                COPY hub_stage_products
+                (sku, name_ar, name_en, desc_ar, desc_en, brand, status, category_key, weight, barcode, images_json,
+                 source_scope, stock_on_hand, reserved_qty, safety_stock, base_cost_sar, target_margin_pct, vat_included_bool)
+                FROM STDIN
+                """
+            ) as copy:
+                for row in rows:
+                    copy.write_row(
+                        _product_params(row)
+                        + (
+                            row.stock_on_hand,
+                            row.reserved_qty,
+                            row.safety_stock,
+                            row.base_cost_sar,
+                            row.target_margin_pct,
+                            row.vat_included_bool,
+                        )
+                    )
+            cur.execute(
+                """
+                INSERT INTO catalog_products
+                (sku, name_ar, name_en, desc_ar, desc_en, brand, status, category_key, weight, barcode, images_json, source_scope)
+                SELECT sku, name_ar, name_en, desc_ar, desc_en, brand, status, category_key, weight, barcode, images_json, source_scope
+                FROM hub_stage_products
+                ON CONFLICT (sku) DO UPDATE SET
+                    name_ar = EXCLUDED.name_ar,
+                    name_en = EXCLUDED.name_en,
+                    desc_ar = EXCLUDED.desc_ar,
+                    desc_en = EXCLUDED.desc_en,
+                    brand = EXCLUDED.brand,
+                    status = EXCLUDED.status,
+                    category_key = EXCLUDED.category_key,
+                    weight = EXCLUDED.weight,
+                    barcode = EXCLUDED.barcode,
+                    images_json = EXCLUDED.images_json,
+                    source_scope = EXCLUDED.source_scope
+                """
+            )
+            cur.execute(
+                """
+                INSERT INTO catalog_inventory (sku, stock_on_hand, reserved_qty, safety_stock)
+                SELECT sku, stock_on_hand, reserved_qty, safety_stock FROM hub_stage_products
+                ON CONFLICT (sku) DO UPDATE SET
+                    stock_on_hand = EXCLUDED.stock_on_hand,
+                    reserved_qty = EXCLUDED.reserved_qty,
+                    safety_stock = EXCLUDED.safety_stock
+                """
+            )
+            cur.execute(
+                """
+                INSERT INTO catalog_pricing (sku, base_cost_sar, target_margin_pct, vat_included_bool)
+                SELECT sku, base_cost_sar, target_margin_pct, vat_included_bool FROM hub_stage_products
+                ON CONFLICT (sku) DO UPDATE SET
+                    base_cost_sar = EXCLUDED.base_cost_sar,
+                    target_margin_pct = EXCLUDED.target_margin_pct,
+                    vat_included_bool = EXCLUDED.vat_included_bool
+                """
+            )
 
     def seed_category_map_from_scope(self, scope: str) -> None:
         rows = self.fetch_all(
@@ -538,21 +1035,20 @@ class HubDB:
             (scope,),
         )
         categories = [r["category_key"] for r in rows if r.get("category_key")]
-        for channel in CHANNELS:
-            for category in categories:
-                self.execute(
-                    """
-                    INSERT INTO channel_category_map(channel, category_key, external_category_id, active)
-                    VALUES (%s, %s, %s, %s)
-                    ON CONFLICT (channel, category_key) DO NOTHING
-                    """,
-                    """
-                    INSERT INTO channel_category_map(channel, category_key, external_category_id, active)
-                    VALUES (?, ?, ?, ?)
-                    ON CONFLICT(channel, category_key) DO NOTHING
-                    """,
-                    (channel, category, slugify(category), True),
-                )
+        self.invalidate_channel_config()
+        self.executemany(
+            """
+            INSERT INTO channel_category_map(channel, category_key, external_category_id, active)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (channel, category_key) DO NOTHING
+            """,
+            """
+            INSERT INTO channel_category_map(channel, category_key, external_category_id, active)
+            VALUES (?, ?, ?, ?)
+            ON CONFLICT(channel, category_key) DO NOTHING
+            """,
+            [(channel, category, slugify(category), True) for channel in CHANNELS for category in categories],
+        )
 
     def load_products_from_csv(self, scope: str, csv_path: Optional[Path] = None) -> int:
         if scope not in SCOPE_TO_FILE and scope != "active":
@@ -563,48 +1059,18 @@ class HubDB:
         if not Path(path).exists():
             raise FileNotFoundError(f"Scope CSV not found: {path}")
 
-        count = 0
-        with open(path, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                sku = (row.get("SKU") or "").strip()
-                if not sku:
-                    continue
-                name_en = (row.get("Name") or "").strip() or sku
-                description = (row.get("Description") or "").strip()
-                price = _to_float(row.get("Regular price"), 0.0)
-                margin = _to_float(row.get("Meta: _margin"), 25.0)
-                base_cost = _to_float(row.get("Meta: _cost"), 0.0)
-                if base_cost <= 0 and price > 0:
-                    base_cost = price / (1 + max(margin, 0.0) / 100.0)
-                stock = _to_int(row.get("Stock"), 0)
-                images_field = (row.get("Images") or "").strip()
-                images = [x.strip() for x in images_field.split(",") if x.strip()]
-                status = "publish" if str(row.get("Published", "0")).strip() == "1" else "draft"
-                product = ProductRow(
-                    sku=sku,
-                    name_ar=name_en,
-                    name_en=name_en,
-                    desc_ar=description,
-                    desc_en=description,
-                    brand=(row.get("Brands") or "").strip(),
-                    status=status,
-                    category_key=(row.get("Categories") or "uncategorized").strip() or "uncategorized",
-                    weight=_to_float(row.get("Weight (kg)"), 0.0),
-                    barcode=(row.get("barcode") or row.get("Barcode") or "").strip(),
-                    images=images,
-                    source_scope=scope,
-                    stock_on_hand=max(stock, 0),
-                    reserved_qty=0,
-                    safety_stock=1,
-                    base_cost_sar=max(base_cost, 0.0),
-                    target_margin_pct=max(margin, 0.0),
-                    vat_included_bool=True,
-                )
-                self.upsert_product_row(product)
-                count += 1
-
-        self.seed_category_map_from_scope(scope)
+        started = time.perf_counter()
+        products = parse_products_csv(Path(path), scope)
+        with self.transaction():
+            count = self.upsert_product_rows(products)
+            self.seed_category_map_from_scope(scope)
+        elapsed = time.perf_counter() - started
+        self.last_load_stats = {
+            "scope": scope,
+            "rows": count,
+            "seconds": round(elapsed, 3),
+            "rows_per_sec": round(count / elapsed, 1) if elapsed > 0 else float(count),
+        }
         return count
 
     def ensure_scope_loaded(self, scope: str, csv_path: Optional[Path] = None) -> int:
@@ -621,16 +1087,101 @@ class HubDB:
         return self.load_products_from_csv(scope, csv_path)
 
     def get_price_rule(self, channel: str) -> Dict[str, Any]:
+        rule = self.get_channel_config(channel).rule
+        if rule is None:
+            raise HubConfigError(f"Missing channel_price_rules entry for channel={channel}")
+        return dict(rule)
+
+    def get_channel_config(self, channel: str) -> ChannelConfig:
+        """Return the cached price rule and category map for a channel.
+
+        The cache is dropped on writes through HubDB and revalidated against
+        the tables' row count and max ``updated_at`` at most once per
+        ``CONFIG_CACHE_TTL_SECONDS``, so other writers are picked up too.
+        """
+        cached = self._config_cache.get(channel)
+        now = time.monotonic()
+        if cached is not None and now - cached.checked_at < CONFIG_CACHE_TTL_SECONDS:
+            return cached
+        if cached is not None and self._channel_config_version(channel) == cached.version:
+            cached.checked_at = now
+            return cached
+
         rows = self.fetch_all(
-            "SELECT channel, fee_pct, payment_pct, ops_buffer_sar, round_rule, active FROM channel_price_rules WHERE channel = %s",
-            "SELECT channel, fee_pct, payment_pct, ops_buffer_sar, round_rule, active FROM channel_price_rules WHERE channel = ?",
-            (channel,),
+            """
+            SELECT 'rule' AS kind, channel, NULL AS category_key, NULL AS external_category_id,
+                   fee_pct, payment_pct, ops_buffer_sar, round_rule, active, updated_at
+            FROM channel_price_rules WHERE channel = %s
+            UNION ALL
+            SELECT 'category' AS kind, channel, category_key, external_category_id,
+                   NULL, NULL, NULL, NULL, active, updated_at
+            FROM channel_category_map WHERE channel = %s
+            """,
+            """
+            SELECT 'rule' AS kind, channel, NULL AS category_key, NULL AS external_category_id,
+                   fee_pct, payment_pct, ops_buffer_sar, round_rule, active, updated_at
+            FROM channel_price_rules WHERE channel = ?
+            UNION ALL
+            SELECT 'category' AS kind, channel, category_key, external_category_id,
+                   NULL, NULL, NULL, NULL, active, updated_at
+            FROM channel_category_map WHERE channel = ?
+            """,
+            (channel, channel),
         )
-        if not rows:
-            raise HubConfigError(f"Missing channel_price_rules entry for channel={channel}")
-        row = rows[0]
-        row["active"] = _to_bool(row.get("active"), True)
-        return row
+        rule: Optional[Dict[str, Any]] = None
+        categories: Dict[str, str] = {}
+        for row in rows:
+            if row["kind"] == "rule":
+                rule = {
+                    "channel": row["channel"],
+                    "fee_pct": row["fee_pct"],
+                    "payment_pct": row["payment_pct"],
+                    "ops_buffer_sar": row["ops_buffer_sar"],
+                    "round_rule": row["round_rule"],
+                    "active": _to_bool(row.get("active"), True),
+                }
+            elif _to_bool(row.get("active"), True):
+                categories[row["category_key"]] = row["external_category_id"]
+        updated = [str(r["updated_at"]) for r in rows if r.get("updated_at") is not None]
+        config = ChannelConfig(
+            channel=channel,
+            rule=rule,
+            categories=categories,
+            version=(len(rows), max(updated) if updated else None),
+            checked_at=now,
+        )
+        with self._config_lock:
+            self._config_cache[channel] = config
+        return config
+
+    def _channel_config_version(self, channel: str) -> tuple:
+        rows = self.fetch_all(
+            """
+            SELECT COUNT(*) AS c, MAX(updated_at) AS updated_at FROM (
+                SELECT updated_at FROM channel_price_rules WHERE channel = %s
+                UNION ALL
+                SELECT updated_at FROM channel_category_map WHERE channel = %s
+            ) v
+            """,
+            """
+            SELECT COUNT(*) AS c, MAX(updated_at) AS updated_at FROM (
+                SELECT updated_at FROM channel_price_rules WHERE channel = ?
+                UNION ALL
+                SELECT updated_at FROM channel_category_map WHERE channel = ?
+            ) v
+            """,
+            (channel, channel),
+        )
+        row = rows[0] if rows else {}
+        updated = row.get("updated_at")
+        return (int(row.get("c") or 0), str(updated) if updated is not None else None)
+
+    def invalidate_channel_config(self, channel: Optional[str] = None) -> None:
+        with self._config_lock:
+            if channel is None:
+                self._config_cache.clear()
+            else:
+                self._config_cache.pop(channel, None)
 
     def get_products_for_scope(self, scope: str, channel: str) -> List[Dict[str, Any]]:
         if scope == "active":
@@ -690,6 +1241,70 @@ class HubDB:
         )
         return [self._hydrate_row(r) for r in rows]
 
+    def get_scope_products(self, scope: str) -> List[Dict[str, Any]]:
+        """Channel-independent product rows for a CSV scope, shared across channel fan-out."""
+        rows = self.fetch_all(
+            """
+            SELECT p.*, i.stock_on_hand, i.reserved_qty, i.safety_stock, i.sellable_qty,
+                   r.base_cost_sar, r.target_margin_pct, r.vat_included_bool
+            FROM catalog_products p
+            LEFT JOIN catalog_inventory i ON i.sku = p.sku
+            LEFT JOIN catalog_pricing r ON r.sku = p.sku
+            WHERE p.source_scope = %s
+            ORDER BY p.sku ASC
+            LIMIT %s
+            """,
+            """
+            SELECT p.*, i.stock_on_hand, i.reserved_qty, i.safety_stock, i.sellable_qty,
+                   r.base_cost_sar, r.target_margin_pct, r.vat_included_bool
+            FROM catalog_products p
+            LEFT JOIN catalog_inventory i ON i.sku = p.sku
+            LEFT JOIN catalog_pricing r ON r.sku = p.sku
+            WHERE p.source_scope = ?
+            ORDER BY p.sku ASC
+            LIMIT ?
+            """,
+            (scope, SCOPE_LIMIT.get(scope, 200)),
+        )
+        return [self._hydrate_row(r) for r in rows]
+
+    def get_products_by_skus(self, skus: Sequence[str]) -> List[Dict[str, Any]]:
+        """Channel-independent product rows for explicit SKUs, in any scope."""
+        if not skus:
+            return []
+        marks_pg = ", ".join(["%s"] * len(skus))
+        marks_sqlite = ", ".join(["?"] * len(skus))
+        rows = self.fetch_all(
+            f"""
+            SELECT p.*, i.stock_on_hand, i.reserved_qty, i.safety_stock, i.sellable_qty,
+                   r.base_cost_sar, r.target_margin_pct, r.vat_included_bool
+            FROM catalog_products p
+            LEFT JOIN catalog_inventory i ON i.sku = p.sku
+            LEFT JOIN catalog_pricing r ON r.sku = p.sku
+            WHERE p.sku IN ({marks_pg})
+            ORDER BY p.sku ASC
+            """,
+            f"""
+            SELECT p.*, i.stock_on_hand, i.reserved_qty, i.safety_stock, i.sellable_qty,
+                   r.base_cost_sar, r.target_margin_pct, r.vat_included_bool
+            FROM catalog_products p
+            LEFT JOIN catalog_inventory i ON i.sku = p.sku
+            LEFT JOIN catalog_pricing r ON r.sku = p.sku
+            WHERE p.sku IN ({marks_sqlite})
+            ORDER BY p.sku ASC
+            """,
+            tuple(skus),
+        )
+        return [self._hydrate_row(r) for r in rows]
+
+    def get_channel_listings(self, channel: str) -> Dict[str, Dict[str, Any]]:
+        rows = self.fetch_all(
+            "SELECT sku, external_product_id, external_variant_id, publish_state FROM channel_listing WHERE channel = %s",
+            "SELECT sku, external_product_id, external_variant_id, publish_state FROM channel_listing WHERE channel = ?",
+            (channel,),
+        )
+        return {r["sku"]: r for r in rows}
+
     def _hydrate_row(self, row: Dict[str, Any]) -> Dict[str, Any]:
         out = dict(row)
         images_raw = out.get("images_json") or "[]"
@@ -712,14 +1327,7 @@ class HubDB:
         return out
 
     def get_category_map(self, channel: str, category_key: str) -> Optional[str]:
-        rows = self.fetch_all(
-            "SELECT external_category_id FROM channel_category_map WHERE channel = %s AND category_key = %s AND active = TRUE",
-            "SELECT external_category_id FROM channel_category_map WHERE channel = ? AND category_key = ? AND active = 1",
-            (channel, category_key),
-        )
-        if not rows:
-            return None
-        return rows[0]["external_category_id"]
+        return self.get_channel_config(channel).categories.get(category_key)
 
     def upsert_channel_listing(
         self,
@@ -732,10 +1340,43 @@ class HubDB:
         response: Dict[str, Any],
         error: Optional[str],
     ) -> None:
-        payload_hash = hash_payload(payload)
-        payload_json = json.dumps(payload, ensure_ascii=False)
-        response_json = json.dumps(response, ensure_ascii=False)
-        self.execute(
+        self.upsert_channel_listings(
+            channel,
+            [
+                {
+                    "sku": sku,
+                    "external_product_id": external_product_id,
+                    "external_variant_id": external_variant_id,
+                    "publish_state": publish_state,
+                    "payload": payload,
+                    "response": response,
+                    "error": error,
+                }
+            ],
+        )
+
+    def upsert_channel_listings(self, channel: str, listings: Sequence[Dict[str, Any]]) -> None:
+        """Upsert many listing results in one statement batch.
+
+        Each entry has the keyword arguments of ``upsert_channel_listing``.
+        """
+        params = []
+        for listing in listings:
+            payload = listing.get("payload") or {}
+            params.append(
+                (
+                    channel,
+                    listing["sku"],
+                    listing.get("external_product_id"),
+                    listing.get("external_variant_id"),
+                    listing.get("publish_state") or "draft",
+                    hash_payload(payload),
+                    json.dumps(payload, ensure_ascii=False),
+                    json.dumps(listing.get("response") or {}, ensure_ascii=False),
+                    listing.get("error"),
+                )
+            )
+        self.executemany(
             """
             INSERT INTO channel_listing
             (channel, sku, external_product_id, external_variant_id, publish_state, last_payload_hash, last_payload, last_response, last_sync_at, last_error)
@@ -765,22 +1406,107 @@ class HubDB:
                 last_error = excluded.last_error,
                 updated_at = CURRENT_TIMESTAMP
             """,
-            (
-                channel,
-                sku,
-                external_product_id,
-                external_variant_id,
-                publish_state,
-                payload_hash,
-                payload_json,
-                response_json,
-                error,
-            ),
+            params,
+        )
+
+    def upsert_listing_ids(self, channel: str, index: Dict[str, Tuple[str, Optional[str]]]) -> None:
+        """Store platform ids from a SKU index; SKUs not in catalog_products are ignored."""
+        self.executemany(
+            """
+            INSERT INTO channel_listing (channel, sku, external_product_id, external_variant_id)
+            SELECT %s, %s, %s, %s
+            WHERE EXISTS (SELECT 1 FROM catalog_products WHERE sku = %s)
+            ON CONFLICT (channel, sku) DO UPDATE SET
+                external_product_id = EXCLUDED.external_product_id,
+                external_variant_id = COALESCE(EXCLUDED.external_variant_id, channel_listing.external_variant_id)
+            """,
+            """
+            INSERT INTO channel_listing (channel, sku, external_product_id, external_variant_id)
+            SELECT ?, ?, ?, ?
+            WHERE EXISTS (SELECT 1 FROM catalog_products WHERE sku = ?)
+            ON CONFLICT(channel, sku) DO UPDATE SET
+                external_product_id = excluded.external_product_id,
+                external_variant_id = COALESCE(excluded.external_variant_id, channel_listing.external_variant_id),
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            [(channel, sku, pid, vid, sku) for sku, (pid, vid) in index.items()],
+        )
+
+    def get_inventory_refs(self, channel: str) -> Dict[str, Dict[str, Any]]:
+        rows = self.fetch_all(
+            """
+            SELECT sku, external_variant_id, inventory_item_id, location_id
+            FROM channel_inventory_refs WHERE channel = %s
+            """,
+            """
+            SELECT sku, external_variant_id, inventory_item_id, location_id
+            FROM channel_inventory_refs WHERE channel = ?
+            """,
+            (channel,),
+        )
+        return {r["sku"]: r for r in rows}
+
+    def upsert_inventory_refs(self, channel: str, refs: Dict[str, Tuple[str, Optional[str], Optional[str]]]) -> None:
+        """Store SKU -> (variant_id, inventory_item_id, location_id) for inventory pushes."""
+        self.executemany(
+            """
+            INSERT INTO channel_inventory_refs (channel, sku, external_variant_id, inventory_item_id, location_id)
+            VALUES (%s, %s, %s, %s, %s)
+            ON CONFLICT (channel, sku) DO UPDATE SET
+                external_variant_id = EXCLUDED.external_variant_id,
+                inventory_item_id = EXCLUDED.inventory_item_id,
+                location_id = EXCLUDED.location_id
+            """,
+            """
+            INSERT INTO channel_inventory_refs (channel, sku, external_variant_id, inventory_item_id, location_id)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(channel, sku) DO UPDATE SET
+                external_variant_id = excluded.external_variant_id,
+                inventory_item_id = excluded.inventory_item_id,
+                location_id = excluded.location_id,
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            [
+                (channel, sku, variant_id, inventory_item_id, location_id)
+                for sku, (variant_id, inventory_item_id, location_id) in refs.items()
+                if variant_id and inventory_item_id and location_id
+            ],
+        )
+
+    def get_payload_hashes(self, channel: str, mode: str) -> Dict[str, Optional[str]]:
+        """delta_hash of each SKU's last successful push in ``mode`` to ``channel``."""
+        rows = self.fetch_all(
+            "SELECT sku, payload_hash FROM channel_payload_hashes WHERE channel = %s AND mode = %s",
+            "SELECT sku, payload_hash FROM channel_payload_hashes WHERE channel = ? AND mode = ?",
+            (channel, mode),
+        )
+        return {r["sku"]: r.get("payload_hash") for r in rows}
+
+    def upsert_payload_hashes(self, channel: str, mode: str, hashes: Sequence[Tuple[str, Optional[str]]]) -> None:
+        """Store (sku, delta_hash) per mode; a None hash makes the next --delta run push the SKU again."""
+        self.executemany(
+            """
+            INSERT INTO channel_payload_hashes (channel, sku, mode, payload_hash)
+            SELECT %s, %s, %s, %s
+            WHERE EXISTS (SELECT 1 FROM catalog_products WHERE sku = %s)
+            ON CONFLICT (channel, sku, mode) DO UPDATE SET
+                payload_hash = EXCLUDED.payload_hash,
+                updated_at = NOW()
+            """,
+            """
+            INSERT INTO channel_payload_hashes (channel, sku, mode, payload_hash)
+            SELECT ?, ?, ?, ?
+            WHERE EXISTS (SELECT 1 FROM catalog_products WHERE sku = ?)
+            ON CONFLICT(channel, sku, mode) DO UPDATE SET
+                payload_hash = excluded.payload_hash,
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            [(channel, sku, mode, payload_hash, sku) for sku, payload_hash in hashes],
         )
 
     def start_sync_job(self, channel: str, mode: str, scope: str, dry_run: bool) -> int:
         if self.backend == "postgres":
-            with self._connect() as conn:
+            with self.transaction() as conn:
                 cur = conn.cursor()
                 cur.execute(
                     """
@@ -791,16 +1517,14 @@ class HubDB:
                     (channel, mode, scope, dry_run),
                 )
                 row = cur.fetchone()
-                conn.commit()
                 return int(row["id"])
 
-        with self._connect() as conn:
+        with self.transaction() as conn:
             cur = conn.cursor()
             cur.execute(
                 "INSERT INTO sync_jobs(channel, mode, scope, dry_run) VALUES (?, ?, ?, ?)",
                 (channel, mode, scope, int(dry_run)),
             )
-            conn.commit()
             return int(cur.lastrowid)
 
     def finish_sync_job(
@@ -836,6 +1560,106 @@ class HubDB:
             (status, processed_count, success_count, failed_count, error_summary, job_id),
         )
 
+    def get_sync_job(self, job_id: int) -> Optional[Dict[str, Any]]:
+        rows = self.fetch_all(
+            "SELECT * FROM sync_jobs WHERE id = %s",
+            "SELECT * FROM sync_jobs WHERE id = ?",
+            (int(job_id),),
+        )
+        return rows[0] if rows else None
+
+    def reopen_sync_job(self, job_id: int) -> bool:
+        """Set a stopped job back to running for ``--resume``. Returns False if it is still running."""
+        with self.transaction() as conn:
+            cur = conn.cursor()
+            if self.backend == "postgres":
+                cur.execute(
+                    """
+                    UPDATE sync_jobs SET status = 'running', ended_at = NULL, heartbeat_at = NOW()
+                    WHERE id = %s AND status <> 'running'
+                    """,
+                    (int(job_id),),
+                )
+            else:
+                cur.execute(
+                    """
+                    UPDATE sync_jobs SET status = 'running', ended_at = NULL, heartbeat_at = CURRENT_TIMESTAMP
+                    WHERE id = ? AND status <> 'running'
+                    """,
+                    (int(job_id),),
+                )
+            return cur.rowcount == 1
+
+    def get_job_done_skus(self, job_id: int) -> Set[str]:
+        rows = self.fetch_all(
+            "SELECT sku FROM sync_job_items WHERE job_id = %s",
+            "SELECT sku FROM sync_job_items WHERE job_id = ?",
+            (int(job_id),),
+        )
+        return {r["sku"] for r in rows}
+
+    def checkpoint_sync_job(
+        self, job_id: int, outcomes: Dict[str, bool], processed: int, succeeded: int, failed: int
+    ) -> None:
+        """Record finished SKUs, add to the job's counters and refresh its heartbeat."""
+        with self.transaction():
+            self.executemany(
+                """
+                INSERT INTO sync_job_items(job_id, sku, success) VALUES (%s, %s, %s)
+                ON CONFLICT (job_id, sku) DO UPDATE SET success = EXCLUDED.success, done_at = NOW()
+                """,
+                """
+                INSERT INTO sync_job_items(job_id, sku, success) VALUES (?, ?, ?)
+                ON CONFLICT(job_id, sku) DO UPDATE SET success = excluded.success, done_at = CURRENT_TIMESTAMP
+                """,
+                [(int(job_id), sku, bool(ok)) for sku, ok in outcomes.items()],
+            )
+            self.execute(
+                """
+                UPDATE sync_jobs
+                SET heartbeat_at = NOW(),
+                    processed_count = processed_count + %s,
+                    success_count = success_count + %s,
+                    failed_count = failed_count + %s
+                WHERE id = %s
+                """,
+                """
+                UPDATE sync_jobs
+                SET heartbeat_at = CURRENT_TIMESTAMP,
+                    processed_count = processed_count + ?,
+                    success_count = success_count + ?,
+                    failed_count = failed_count + ?
+                WHERE id = ?
+                """,
+                (int(processed), int(succeeded), int(failed), int(job_id)),
+            )
+
+    def sweep_stale_sync_jobs(self, stale_minutes: float) -> int:
+        """Mark running jobs without a heartbeat for ``stale_minutes`` as abandoned. Returns how many."""
+        with self.transaction() as conn:
+            cur = conn.cursor()
+            if self.backend == "postgres":
+                cur.execute(
+                    """
+                    UPDATE sync_jobs
+                    SET status = 'abandoned', ended_at = NOW(), error_summary = 'no heartbeat; resume with --resume'
+                    WHERE status = 'running'
+                      AND COALESCE(heartbeat_at, started_at) < NOW() - make_interval(secs => %s)
+                    """,
+                    (float(stale_minutes) * 60,),
+                )
+            else:
+                cur.execute(
+                    """
+                    UPDATE sync_jobs
+                    SET status = 'abandoned', ended_at = CURRENT_TIMESTAMP, error_summary = 'no heartbeat; resume with --resume'
+                    WHERE status = 'running'
+                      AND COALESCE(heartbeat_at, started_at) < datetime('now', '-' || ? || ' seconds')
+                    """,
+                    (int(float(stale_minutes) * 60),),
+                )
+            return cur.rowcount
+
     def queue_dead_letter(
         self,
         channel: str,
@@ -844,8 +1668,11 @@ class HubDB:
         payload: Dict[str, Any],
         error: str,
     ) -> None:
-        payload_json = json.dumps(payload, ensure_ascii=False)
-        self.execute(
+        self.queue_dead_letters(channel, mode, [(sku, payload, error)])
+
+    def queue_dead_letters(self, channel: str, mode: str, entries: Sequence[Tuple[str, Dict[str, Any], str]]) -> None:
+        """Insert many (sku, payload, error) DLQ rows in one statement batch."""
+        self.executemany(
             """
             INSERT INTO dead_letter_queue(channel, mode, sku, payload_json, error)
             VALUES (%s, %s, %s, %s::jsonb, %s)
@@ -854,7 +1681,115 @@ class HubDB:
             INSERT INTO dead_letter_queue(channel, mode, sku, payload_json, error)
             VALUES (?, ?, ?, ?, ?)
             """,
-            (channel, mode, sku, payload_json, error),
+            [(channel, mode, sku, json.dumps(payload, ensure_ascii=False), error) for sku, payload, error in entries],
+        )
+
+    def claim_dead_letters(
+        self, worker: str, limit: int, lease_seconds: int, max_retries: int, channel: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Lease up to ``limit`` open DLQ rows to one claim and return them.
+
+        Each row carries a ``lease`` token. A leased row stays invisible to
+        other workers until it is resolved, failed or its lease expires. On
+        Postgres, SKIP LOCKED keeps concurrent claims from waiting on each other.
+        """
+        lease = f"{worker}:{uuid.uuid4().hex[:12]}"
+        params = (lease, int(lease_seconds), int(max_retries), channel, channel, int(limit))
+        if self.backend == "postgres":
+            with self.transaction() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    """
+                    UPDATE dead_letter_queue
+                    SET leased_by = %s, leased_until = NOW() + make_interval(secs => %s)
+                    WHERE id IN (
+                        SELECT id FROM dead_letter_queue
+                        WHERE resolved_at IS NULL
+                          AND retries < %s
+                          AND (leased_until IS NULL OR leased_until < NOW())
+                          AND (%s::text IS NULL OR channel = %s)
+                        ORDER BY id
+                        LIMIT %s
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, channel, mode, sku, retries, leased_by AS lease
+                    """,
+                    params,
+                )
+                return sorted(cur.fetchall(), key=lambda r: r["id"])
+
+        # A single UPDATE holds SQLite's write lock, so two claims never pick the same row.
+        with self.transaction() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                UPDATE dead_letter_queue
+                SET leased_by = ?, leased_until = datetime('now', '+' || ? || ' seconds')
+                WHERE id IN (
+                    SELECT id FROM dead_letter_queue
+                    WHERE resolved_at IS NULL
+                      AND retries < ?
+                      AND (leased_until IS NULL OR leased_until < datetime('now'))
+                      AND (? IS NULL OR channel = ?)
+                    ORDER BY id
+                    LIMIT ?
+                )
+                """,
+                params,
+            )
+            cur.execute(
+                """
+                SELECT id, channel, mode, sku, retries, leased_by AS lease
+                FROM dead_letter_queue WHERE leased_by = ? AND resolved_at IS NULL
+                ORDER BY id
+                """,
+                (lease,),
+            )
+            return [dict(r) for r in cur.fetchall()]
+
+    def resolve_dead_letters(self, rows: Sequence[Dict[str, Any]]) -> None:
+        """Mark claimed rows as replayed. Rows whose lease was taken over are left alone."""
+        self.executemany(
+            """
+            UPDATE dead_letter_queue
+            SET resolved_at = NOW(), leased_by = NULL, leased_until = NULL
+            WHERE id = %s AND leased_by = %s
+            """,
+            """
+            UPDATE dead_letter_queue
+            SET resolved_at = CURRENT_TIMESTAMP, leased_by = NULL, leased_until = NULL
+            WHERE id = ? AND leased_by = ?
+            """,
+            [(row["id"], row["lease"]) for row in rows],
+        )
+
+    def fail_dead_letters(self, failures: Sequence[Tuple[Dict[str, Any], str, int]]) -> None:
+        """Record a failed replay for (row, error, retry_in_seconds) entries.
+
+        ``retries`` goes up and the row stays unclaimable until the delay passes.
+        """
+        self.executemany(
+            """
+            UPDATE dead_letter_queue
+            SET retries = retries + 1, error = %s, leased_by = NULL,
+                leased_until = NOW() + make_interval(secs => %s)
+            WHERE id = %s AND leased_by = %s
+            """,
+            """
+            UPDATE dead_letter_queue
+            SET retries = retries + 1, error = ?, leased_by = NULL,
+                leased_until = datetime('now', '+' || ? || ' seconds')
+            WHERE id = ? AND leased_by = ?
+            """,
+            [(error, int(delay), row["id"], row["lease"]) for row, error, delay in failures],
+        )
+
+    def release_dead_letters(self, rows: Sequence[Dict[str, Any]]) -> None:
+        """Drop the lease on claimed rows without recording an attempt."""
+        self.executemany(
+            "UPDATE dead_letter_queue SET leased_by = NULL, leased_until = NULL WHERE id = %s AND leased_by = %s",
+            "UPDATE dead_letter_queue SET leased_by = NULL, leased_until = NULL WHERE id = ? AND leased_by = ?",
+            [(row["id"], row["lease"]) for row in rows],
         )
 
     def insert_order_event(
@@ -866,81 +1801,431 @@ class HubDB:
         payload: Dict[str, Any],
         idempotency_key: str,
     ) -> bool:
-        payload_json = json.dumps(payload, ensure_ascii=False)
-        try:
-            self.execute(
+        """Insert one order event. Returns False if its idempotency key is already stored."""
+        with self.transaction() as conn:
+            return self._insert_order_event_row(
+                conn.cursor(),
+                (channel, external_order_id, event_type, event_ts.isoformat(), json.dumps(payload, ensure_ascii=False), idempotency_key),
+            )
+
+    def _insert_order_event_row(self, cur: Any, params: Sequence[Any]) -> bool:
+        if self.backend == "postgres":
+            cur.execute(
                 """
                 INSERT INTO order_events
                 (channel, external_order_id, event_type, event_ts, payload_json, idempotency_key)
                 VALUES (%s, %s, %s, %s, %s::jsonb, %s)
+                ON CONFLICT (idempotency_key) DO NOTHING
                 """,
+                params,
+            )
+        else:
+            cur.execute(
                 """
                 INSERT INTO order_events
                 (channel, external_order_id, event_type, event_ts, payload_json, idempotency_key)
                 VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(idempotency_key) DO NOTHING
                 """,
-                (
-                    channel,
-                    external_order_id,
-                    event_type,
-                    event_ts.isoformat(),
-                    payload_json,
-                    idempotency_key,
-                ),
-            )
-            return True
-        except Exception:
-            return False
-
-    def apply_order_event(self, event_type: str, payload: Dict[str, Any]) -> None:
-        items = payload.get("items") or payload.get("line_items") or []
-        delta = 0
-        if event_type == "orders":
-            delta = 1
-        elif event_type in {"cancellations", "returns"}:
-            delta = -1
-        if delta == 0:
+                params,
+            )
+        return cur.rowcount == 1
+
+    def recent_idempotency_keys(self, hours: float, limit: int) -> List[str]:
+        """Idempotency keys of order events from the last ``hours`` plus queued inbox events, oldest first."""
+        rows = self.fetch_all(
+            """
+            SELECT idempotency_key FROM (
+                SELECT id, idempotency_key FROM order_events
+                WHERE created_at >= NOW() - make_interval(secs => %s)
+                ORDER BY id DESC
+                LIMIT %s
+            ) recent
+            ORDER BY id
+            """,
+            """
+            SELECT idempotency_key FROM (
+                SELECT id, idempotency_key FROM order_events
+                WHERE created_at >= datetime('now', '-' || ? || ' seconds')
+                ORDER BY id DESC
+                LIMIT ?
+            ) recent
+            ORDER BY id
+            """,
+            (float(hours) * 3600, int(limit)),
+        )
+        keys = [r["idempotency_key"] for r in rows]
+        keys.extend(
+            r["idempotency_key"]
+            for r in self.fetch_all(
+                "SELECT idempotency_key FROM webhook_inbox ORDER BY id",
+                "SELECT idempotency_key FROM webhook_inbox ORDER BY id",
+            )
+        )
+        return keys
+
+    def apply_order_event(self, event_type: str, payload: Dict[str, Any], channel: Optional[str] = None) -> None:
+        self.apply_order_events([(channel, event_type, payload)])
+
+    def apply_order_events(self, events: Sequence[Tuple[Optional[str], str, Dict[str, Any]]]) -> None:
+        """Apply (channel, event_type, payload) events to reserved stock with one UPDATE per chunk of SKUs.
+
+        Events are folded per SKU in order. Each step is ``max(reserved + qty, 0)``,
+        and a run of such steps composes to ``max(reserved + shift, floor)``, so
+        the single statement matches applying the events one by one. Every
+        changed SKU's new sellable_qty is queued in inventory_outbox in the same
+        transaction, for hub_propagate to push to the other channels.
+        """
+        folded: Dict[str, List[int]] = {}
+        sources: Dict[str, Set[Optional[str]]] = {}
+        for channel, event_type, payload in events:
+            for sku, qty in _order_event_deltas(event_type, payload).items():
+                shift_floor = folded.setdefault(sku, [0, 0])
+                shift_floor[0] += qty
+                shift_floor[1] = max(shift_floor[1] + qty, 0)
+                sources.setdefault(sku, set()).add(channel)
+        if not folded:
             return
 
-        for item in items:
-            sku = (item.get("sku") or "").strip()
-            qty = max(_to_int(item.get("qty") or item.get("quantity"), 0), 0)
-            if not sku or qty <= 0:
-                continue
-            if delta > 0:
+        rows = [(sku, shift, floor) for sku, (shift, floor) in folded.items()]
+        with self.transaction():
+            before = self._facet_rows("inventory", list(folded))
+            for start in range(0, len(rows), RESULT_WRITE_CHUNK):
+                chunk = rows[start : start + RESULT_WRITE_CHUNK]
+                params = tuple(v for row in chunk for v in row)
                 self.execute(
-                    """
-                    UPDATE catalog_inventory
-                    SET reserved_qty = GREATEST(reserved_qty + %s, 0)
-                    WHERE sku = %s
+                    f"""
+                    UPDATE catalog_inventory AS ci
+                    SET reserved_qty = GREATEST(ci.reserved_qty + d.shift, d.min_qty)
+                    FROM (VALUES {", ".join(["(%s, %s::integer, %s::integer)"] * len(chunk))}) AS d(sku, shift, min_qty)
+                    WHERE ci.sku = d.sku
                     """,
-                    """
+                    f"""
+                    WITH d(sku, shift, min_qty) AS (VALUES {", ".join(["(?, ?, ?)"] * len(chunk))})
                     UPDATE catalog_inventory
-                    SET reserved_qty = MAX(reserved_qty + ?, 0)
-                    WHERE sku = ?
+                    SET reserved_qty = MAX(catalog_inventory.reserved_qty + d.shift, d.min_qty),
+                        sellable_qty = MAX(
+                            stock_on_hand - MAX(catalog_inventory.reserved_qty + d.shift, d.min_qty) - safety_stock, 0
+                        ),
+                        updated_at = CURRENT_TIMESTAMP
+                    FROM d
+                    WHERE catalog_inventory.sku = d.sku
                     """,
-                    (qty, sku),
+                    params,
                 )
-            else:
+                # A SKU changed by one channel's events is not pushed back to that channel.
+                outbox = [(sku, next(iter(sources[sku])) if len(sources[sku]) == 1 else None) for sku, _, _ in chunk]
                 self.execute(
-                    """
-                    UPDATE catalog_inventory
-                    SET reserved_qty = GREATEST(reserved_qty - %s, 0)
-                    WHERE sku = %s
+                    f"""
+                    INSERT INTO inventory_outbox (sku, sellable_qty, source_channel)
+                    SELECT ci.sku, ci.sellable_qty, d.source_channel
+                    FROM catalog_inventory ci
+                    JOIN (VALUES {", ".join(["(%s, %s::text)"] * len(outbox))}) AS d(sku, source_channel) ON d.sku = ci.sku
                     """,
-                    """
-                    UPDATE catalog_inventory
-                    SET reserved_qty = MAX(reserved_qty - ?, 0)
-                    WHERE sku = ?
+                    f"""
+                    WITH d(sku, source_channel) AS (VALUES {", ".join(["(?, ?)"] * len(outbox))})
+                    INSERT INTO inventory_outbox (sku, sellable_qty, source_channel)
+                    SELECT ci.sku, ci.sellable_qty, d.source_channel
+                    FROM catalog_inventory ci
+                    JOIN d ON d.sku = ci.sku
                     """,
-                    (qty, sku),
+                    tuple(v for row in outbox for v in row),
                 )
-            if self.backend == "sqlite":
+            self._journal_changes(list(folded), "inventory", before)
+
+    def append_webhook_inbox(
+        self, events: Sequence[Dict[str, Any]], maybe_seen: Optional[Set[str]] = None
+    ) -> List[bool]:
+        """Queue webhook events durably in one commit. Returns, per event, whether it is new.
+
+        An event is a duplicate when its idempotency key is already queued,
+        already in order_events, or earlier in the same batch. Only keys in
+        ``maybe_seen`` are looked up (all keys when it is None); the others are
+        reported new, and the order_events constraint still keeps them from
+        being applied twice.
+        """
+        if not events:
+            return []
+        keys = list({e["idempotency_key"] for e in events if maybe_seen is None or e["idempotency_key"] in maybe_seen})
+        marks_pg = ", ".join(["%s"] * len(keys))
+        marks_sqlite = ", ".join(["?"] * len(keys))
+        with self.transaction():
+            rows = [] if not keys else self.fetch_all(
+                f"""
+                SELECT idempotency_key FROM order_events WHERE idempotency_key IN ({marks_pg})
+                UNION SELECT idempotency_key FROM webhook_inbox WHERE idempotency_key IN ({marks_pg})
+                """,
+                f"""
+                SELECT idempotency_key FROM order_events WHERE idempotency_key IN ({marks_sqlite})
+                UNION SELECT idempotency_key FROM webhook_inbox WHERE idempotency_key IN ({marks_sqlite})
+                """,
+                (*keys, *keys),
+            )
+            seen = {r["idempotency_key"] for r in rows}
+            flags: List[bool] = []
+            fresh: List[Dict[str, Any]] = []
+            for event in events:
+                new = event["idempotency_key"] not in seen
+                seen.add(event["idempotency_key"])
+                flags.append(new)
+                if new:
+                    fresh.append(event)
+            self.executemany(
+                """
+                INSERT INTO webhook_inbox (channel, external_order_id, event_type, event_ts, payload_json, idempotency_key)
+                VALUES (%s, %s, %s, %s, %s::jsonb, %s)
+                ON CONFLICT (idempotency_key) DO NOTHING
+                """,
+                """
+                INSERT INTO webhook_inbox (channel, external_order_id, event_type, event_ts, payload_json, idempotency_key)
+                VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT(idempotency_key) DO NOTHING
+                """,
+                [
+                    (
+                        e["channel"],
+                        e["external_order_id"],
+                        e["event_type"],
+                        e["event_ts"].isoformat(),
+                        json.dumps(e["payload"], ensure_ascii=False),
+                        e["idempotency_key"],
+                    )
+                    for e in fresh
+                ],
+            )
+        return flags
+
+    def drain_webhook_inbox(self, limit: int, max_attempts: int = INBOX_MAX_ATTEMPTS) -> Dict[str, int]:
+        """Move up to ``limit`` queued webhook events into order_events and apply them.
+
+        Insert, inventory change and inbox delete share one transaction, and an
+        event is applied only when its order_events insert is new, so a crash at
+        any point neither loses nor double-applies an event. If the batch fails,
+        its events are retried one per transaction. An event that keeps failing
+        stays in the inbox with ``attempts`` and ``last_error`` once it has
+        failed ``max_attempts`` times.
+        """
+        rows: List[Dict[str, Any]] = []
+        try:
+            with self.transaction():
+                rows = self._claim_inbox(limit, max_attempts)
+                applied = self._apply_inbox_rows(rows)
+            return {"drained": len(rows), "applied": applied, "failed": 0}
+        except Exception:
+            if not rows:
+                raise
+
+        applied = failed = 0
+        for row in rows:
+            try:
+                with self.transaction():
+                    applied += self._apply_inbox_rows(self._claim_inbox(1, max_attempts, row_id=row["id"]))
+            except Exception as exc:
+                failed += 1
                 self.execute(
-                    "UPDATE catalog_inventory SET sellable_qty = MAX(stock_on_hand - reserved_qty - safety_stock, 0) WHERE sku = ?",
-                    "UPDATE catalog_inventory SET sellable_qty = MAX(stock_on_hand - reserved_qty - safety_stock, 0) WHERE sku = ?",
-                    (sku,),
+                    "UPDATE webhook_inbox SET attempts = attempts + 1, last_error = %s WHERE id = %s",
+                    "UPDATE webhook_inbox SET attempts = attempts + 1, last_error = ? WHERE id = ?",
+                    (f"{type(exc).__name__}: {exc}", row["id"]),
                 )
+        return {"drained": len(rows) - failed, "applied": applied, "failed": failed}
+
+    def _claim_inbox(self, limit: int, max_attempts: int, row_id: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Select queued events for the current transaction; Postgres locks them and skips rows other drainers hold."""
+        return self.fetch_all(
+            """
+            SELECT * FROM webhook_inbox
+            WHERE attempts < %s AND (%s::bigint IS NULL OR id = %s)
+            ORDER BY id
+            LIMIT %s
+            FOR UPDATE SKIP LOCKED
+            """,
+            """
+            SELECT * FROM webhook_inbox
+            WHERE attempts < ? AND (? IS NULL OR id = ?)
+            ORDER BY id
+            LIMIT ?
+            """,
+            (int(max_attempts), row_id, row_id, int(limit)),
+        )
+
+    def _apply_inbox_rows(self, rows: Sequence[Dict[str, Any]]) -> int:
+        inserted: List[Tuple[Optional[str], str, Dict[str, Any]]] = []
+        with self.transaction() as conn:
+            cur = conn.cursor()
+            for row in rows:
+                payload = row["payload_json"]
+                if isinstance(payload, str):
+                    payload = json.loads(payload)
+                params = (
+                    row["channel"],
+                    row["external_order_id"],
+                    row["event_type"],
+                    row["event_ts"],
+                    json.dumps(payload, ensure_ascii=False),
+                    row["idempotency_key"],
+                )
+                if self._insert_order_event_row(cur, params):
+                    inserted.append((row["channel"], row["event_type"], payload))
+            self.apply_order_events(inserted)
+            self.executemany(
+                "DELETE FROM webhook_inbox WHERE id = %s",
+                "DELETE FROM webhook_inbox WHERE id = ?",
+                [(row["id"],) for row in rows],
+            )
+        return len(inserted)
+
+    def claim_inventory_outbox(
+        self, worker: str, limit: int, lease_seconds: float, debounce_seconds: float, max_wait_seconds: float
+    ) -> List[Dict[str, Any]]:
+        """Lease the queued changes of up to ``limit`` settled SKUs and return them.
+
+        A SKU is settled once it has had no new change for ``debounce_seconds``,
+        or its oldest change has waited ``max_wait_seconds``. A burst of changes
+        to one SKU is therefore pushed once. Leases work as in
+        claim_dead_letters.
+        """
+        lease = f"{worker}:{uuid.uuid4().hex[:12]}"
+        params = (lease, float(lease_seconds), float(debounce_seconds), float(max_wait_seconds), int(limit))
+        if self.backend == "postgres":
+            with self.transaction() as conn:
+                cur = conn.cursor()
+                cur.execute(
+                    """
+                    UPDATE inventory_outbox
+                    SET leased_by = %s, leased_until = clock_timestamp() + make_interval(secs => %s)
+                    WHERE id IN (
+                        SELECT id FROM inventory_outbox
+                        WHERE (leased_until IS NULL OR leased_until < clock_timestamp())
+                          AND sku IN (
+                            SELECT sku FROM inventory_outbox
+                            WHERE leased_until IS NULL OR leased_until < clock_timestamp()
+                            GROUP BY sku
+                            HAVING MAX(enqueued_at) <= clock_timestamp() - make_interval(secs => %s)
+                                OR MIN(enqueued_at) <= clock_timestamp() - make_interval(secs => %s)
+                            ORDER BY MIN(id)
+                            LIMIT %s
+                          )
+                        FOR UPDATE SKIP LOCKED
+                    )
+                    RETURNING id, sku, sellable_qty, source_channel, leased_by AS lease
+                    """,
+                    params,
+                )
+                return sorted(cur.fetchall(), key=lambda r: r["id"])
+
+        with self.transaction() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """
+                UPDATE inventory_outbox
+                SET leased_by = ?, leased_until = strftime('%Y-%m-%d %H:%M:%f', 'now', '+' || ? || ' seconds')
+                WHERE (leased_until IS NULL OR leased_until < strftime('%Y-%m-%d %H:%M:%f', 'now'))
+                  AND sku IN (
+                    SELECT sku FROM inventory_outbox
+                    WHERE leased_until IS NULL OR leased_until < strftime('%Y-%m-%d %H:%M:%f', 'now')
+                    GROUP BY sku
+                    HAVING MAX(enqueued_at) <= strftime('%Y-%m-%d %H:%M:%f', 'now', '-' || ? || ' seconds')
+                        OR MIN(enqueued_at) <= strftime('%Y-%m-%d %H:%M:%f', 'now', '-' || ? || ' seconds')
+                    ORDER BY MIN(id)
+                    LIMIT ?
+                  )
+                """,
+                params,
+            )
+            cur.execute(
+                """
+                SELECT id, sku, sellable_qty, source_channel, leased_by AS lease
+                FROM inventory_outbox WHERE leased_by = ?
+                ORDER BY id
+                """,
+                (lease,),
+            )
+            return [dict(r) for r in cur.fetchall()]
+
+    def settle_inventory_outbox(self, rows: Sequence[Dict[str, Any]]) -> None:
+        """Delete claimed outbox rows. Rows whose lease was taken over are left alone."""
+        self.executemany(
+            "DELETE FROM inventory_outbox WHERE id = %s AND leased_by = %s",
+            "DELETE FROM inventory_outbox WHERE id = ? AND leased_by = ?",
+            [(row["id"], row["lease"]) for row in rows],
+        )
+
+    def release_inventory_outbox(self, rows: Sequence[Dict[str, Any]]) -> None:
+        """Hand claimed outbox rows back unchanged."""
+        self.executemany(
+            "UPDATE inventory_outbox SET leased_by = NULL, leased_until = NULL WHERE id = %s AND leased_by = %s",
+            "UPDATE inventory_outbox SET leased_by = NULL, leased_until = NULL WHERE id = ? AND leased_by = ?",
+            [(row["id"], row["lease"]) for row in rows],
+        )
+
+    def get_active_channels(self) -> List[str]:
+        rows = self.fetch_all(
+            "SELECT channel FROM channel_price_rules WHERE active ORDER BY channel",
+            "SELECT channel FROM channel_price_rules WHERE active ORDER BY channel",
+        )
+        return [r["channel"] for r in rows if r["channel"] in CHANNELS]
+
+    def get_sync_cursor(self, channel: str, mode: str) -> int:
+        rows = self.fetch_all(
+            "SELECT last_version FROM channel_sync_cursors WHERE channel = %s AND mode = %s",
+            "SELECT last_version FROM channel_sync_cursors WHERE channel = ? AND mode = ?",
+            (channel, mode),
+        )
+        return int(rows[0]["last_version"]) if rows else 0
+
+    def set_sync_cursor(self, channel: str, mode: str, version: int) -> None:
+        self.execute(
+            """
+            INSERT INTO channel_sync_cursors(channel, mode, last_version)
+            VALUES (%s, %s, %s)
+            ON CONFLICT (channel, mode) DO UPDATE SET
+                last_version = GREATEST(channel_sync_cursors.last_version, EXCLUDED.last_version)
+            """,
+            """
+            INSERT INTO channel_sync_cursors(channel, mode, last_version)
+            VALUES (?, ?, ?)
+            ON CONFLICT(channel, mode) DO UPDATE SET
+                last_version = MAX(channel_sync_cursors.last_version, excluded.last_version),
+                updated_at = CURRENT_TIMESTAMP
+            """,
+            (channel, mode, int(version)),
+        )
+
+    def get_changed_skus(self, after_version: int, mode: str) -> Tuple[List[str], int]:
+        """Return SKUs journaled after cursor ``after_version`` for a mode, and the cursor to save.
+
+        On SQLite the cursor is the journal version: writers are serialized, so
+        versions commit in order. Postgres versions can commit out of order, so
+        there the cursor is a transaction id. Only rows from transactions older
+        than every one still running are read, and the cursor moves to that
+        bound, so a change committed later is never behind it.
+        """
+        facets = MODE_FACETS.get(mode, CATALOG_FACETS)
+        with self.transaction() as conn:
+            cur = conn.cursor()
+            if self.backend == "postgres":
+                cur.execute("SELECT pg_snapshot_xmin(pg_current_snapshot())::text AS xmin")
+                bound = int(cur.fetchone()["xmin"])
+                cur.execute(
+                    f"""
+                    SELECT DISTINCT sku FROM catalog_changes
+                    WHERE txid >= %s::text::xid8 AND txid < %s::text::xid8 AND facet IN ({", ".join(["%s"] * len(facets))})
+                    """,
+                    (str(int(after_version)), str(bound), *facets),
+                )
+                return sorted(r["sku"] for r in cur.fetchall()), max(bound, int(after_version))
+
+            cur.execute(
+                f"""
+                SELECT sku, MAX(version) AS version FROM catalog_changes
+                WHERE version > ? AND facet IN ({", ".join(["?"] * len(facets))})
+                GROUP BY sku
+                """,
+                (int(after_version), *facets),
+            )
+            rows = cur.fetchall()
+        latest = max((int(r["version"]) for r in rows), default=int(after_version))
+        return sorted(r["sku"] for r in rows), latest
 
     def get_sync_lag_minutes(self, channel: str) -> Optional[float]:
         rows = self.fetch_all(
@@ -960,6 +2245,56 @@ class HubDB:
         return (now_utc() - last_sync).total_seconds() / 60.0
 
 
+class SyncResultWriter:
+    """Buffers a sync's listing results and dead letters and writes them in chunks.
+
+    Run it inside ``db.transaction()`` so that every chunk commits together.
+    Within a chunk only the last result per SKU is written. That is the row
+    one upsert per result would have left behind, e.g. the pricing segment
+    of a reconcile.
+    """
+
+    def __init__(self, db: HubDB, channel: str, mode: str, queue_failures: bool = True, chunk_size: int = RESULT_WRITE_CHUNK):
+        self.db = db
+        self.channel = channel
+        self.mode = mode
+        self.queue_failures = queue_failures
+        self.chunk_size = max(int(chunk_size), 1)
+        self.written = 0
+        self._listings: Dict[str, Dict[str, Any]] = {}
+        self._hashes: Dict[str, Optional[str]] = {}
+        self._dead_letters: List[Tuple[str, Dict[str, Any], str]] = []
+
+    def add(self, item_result: Dict[str, Any], payload_hash: Optional[str]) -> None:
+        sku = item_result.get("sku", "")
+        payload = item_result.get("payload") or {}
+        error = item_result.get("error") or None
+        self._listings[sku] = {
+            "sku": sku,
+            "external_product_id": item_result.get("external_product_id"),
+            "external_variant_id": item_result.get("external_variant_id"),
+            "publish_state": item_result.get("publish_state") or "draft",
+            "payload": payload,
+            "response": item_result.get("response") or {},
+            "error": error,
+        }
+        self._hashes[sku] = payload_hash
+        if self.queue_failures and not item_result.get("success"):
+            self._dead_letters.append((sku, payload, str(error or "unknown error")))
+        if len(self._listings) + len(self._dead_letters) >= self.chunk_size:
+            self.flush()
+
+    def flush(self) -> None:
+        listings = list(self._listings.values())
+        self.db.upsert_channel_listings(self.channel, listings)
+        self.db.upsert_payload_hashes(self.channel, self.mode, list(self._hashes.items()))
+        self.db.queue_dead_letters(self.channel, self.mode, self._dead_letters)
+        self.written += len(listings) + len(self._dead_letters)
+        self._listings = {}
+        self._hashes = {}
+        self._dead_letters = []
+
+
 def stage_channels(stage: str) -> List[str]:
     if stage == "wave50":
         return ["woo", "zid"]
@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""Replay worker for the sync dead-letter queue.
+
+Claims open ``dead_letter_queue`` rows in leased batches and rebuilds each SKU
+from current hub data. Rows are grouped by (channel, mode) and pushed through
+the connectors' batch paths. Every claimed row then ends resolved, or with
+``retries`` bumped and a backoff before it may be claimed again. Any number of
+workers can run side by side: a claim never hands the same row to two leases.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+from connectors import set_max_inflight
+from hub_core import HubConfigError, HubDB, SyncResultWriter, delta_hash, load_local_env
+from hub_engine import apply_id_index, apply_inventory_refs, build_items, make_connector, sync_mode
+
+# Failed replays wait RETRY_BASE_SECONDS * 2**retries, capped, before the next claim.
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 3600
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Replay dead-lettered sync items")
+    parser.add_argument("--channel", default="", help="Only replay rows for this channel")
+    parser.add_argument("--batch-size", type=int, default=200, help="Rows claimed per batch")
+    parser.add_argument("--max-batches", type=int, default=0, help="Stop after this many batches (default: until drained)")
+    parser.add_argument("--max-retries", type=int, default=5, help="Rows that failed this often are left for manual review")
+    parser.add_argument(
+        "--lease-seconds",
+        type=int,
+        default=600,
+        help="How long a claim hides its rows from other workers; must outlast one batch replay",
+    )
+    parser.add_argument("--max-inflight", type=int, default=0, help="Cap on concurrent platform requests")
+    parser.add_argument("--dry-run", action="store_true", help="Replay against dry-run connectors and release the claim")
+    parser.add_argument("--report-json", default="", help="Optional output path for the replay report")
+    return parser.parse_args()
+
+
+def _retry_delay(retries: int) -> int:
+    return min(RETRY_BASE_SECONDS * 2 ** max(int(retries), 0), RETRY_MAX_SECONDS)
+
+
+async def _replay_group(
+    db: HubDB, channel: str, mode: str, rows: List[Dict[str, Any]], dry_run: bool
+) -> Dict[str, Any]:
+    """Push one (channel, mode) group and settle its rows. Returns the group report."""
+    skus = sorted({row["sku"] for row in rows if row.get("sku")})
+    items = build_items(db, channel, "", db.get_products_by_skus(skus))
+    item_hashes = {str(item.get("sku")): delta_hash(item, mode) for item in items}
+
+    connector = make_connector(channel, dry_run)
+    try:
+        # A catalog replay without the platform id would create a duplicate product.
+        if not dry_run and any(not item.get("external_product_id") for item in items):
+            await apply_id_index(db, connector, channel, items, full=False)
+        if mode in ("inventory", "reconcile") and not dry_run:
+            apply_inventory_refs(db, channel, items)
+        result = await sync_mode(connector, mode, items) if items else {"items": []}
+        if connector.resolved_inventory_refs and not dry_run:
+            db.upsert_inventory_refs(channel, connector.resolved_inventory_refs)
+        http = {**connector.stats.as_dict(), "circuit": connector.breaker.as_dict()}
+    finally:
+        await connector.aclose()
+
+    # Reconcile yields one result per segment, so a SKU is replayed only if every segment succeeded.
+    errors: Dict[str, str] = {}
+    seen = set()
+    for item_result in result.get("items", []):
+        sku = item_result.get("sku", "")
+        seen.add(sku)
+        if not item_result.get("success"):
+            errors.setdefault(sku, str(item_result.get("error") or "unknown error"))
+    if not dry_run:
+        with db.transaction():
+            writer = SyncResultWriter(db, channel, mode, queue_failures=False)
+            for item_result in result.get("items", []):
+                sku = item_result.get("sku", "")
+                writer.add(item_result, None if sku in errors else item_hashes.get(sku))
+            writer.flush()
+
+    resolved: List[Dict[str, Any]] = []
+    failed: List[Tuple[Dict[str, Any], str, int]] = []
+    for row in rows:
+        sku = row.get("sku")
+        if not sku:
+            error = "dead letter has no SKU"
+        elif sku not in item_hashes:
+            error = "SKU no longer in catalog"
+        elif sku not in seen:
+            error = "connector returned no result"
+        else:
+            error = errors.get(sku, "")
+        if error:
+            failed.append((row, error, _retry_delay(row.get("retries") or 0)))
+        else:
+            resolved.append(row)
+
+    if dry_run:
+        db.release_dead_letters(rows)
+    else:
+        with db.transaction():
+            db.resolve_dead_letters(resolved)
+            db.fail_dead_letters(failed)
+
+    return {
+        "channel": channel,
+        "mode": mode,
+        "claimed": len(rows),
+        "skus": len(skus),
+        "resolved": len(resolved),
+        "failed": len(failed),
+        "errors": {row.get("sku") or f"#{row['id']}": error for row, error, _ in failed[:20]},
+        "http": http,
+    }
+
+
+async def _replay_batch(db: HubDB, rows: List[Dict[str, Any]], dry_run: bool) -> List[Dict[str, Any]]:
+    groups: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+    for row in rows:
+        groups[(row["channel"], row["mode"])].append(row)
+    keys = list(groups)
+    outcomes = await asyncio.gather(
+        *(_replay_group(db, channel, mode, groups[(channel, mode)], dry_run) for channel, mode in keys),
+        return_exceptions=True,
+    )
+    reports: List[Dict[str, Any]] = []
+    for (channel, mode), outcome in zip(keys, outcomes):
+        if isinstance(outcome, Exception):
+            # Not the rows' fault (e.g. missing credentials): hand them back untouched.
+            db.release_dead_letters(groups[(channel, mode)])
+            reports.append(
+                {
+                    "channel": channel,
+                    "mode": mode,
+                    "claimed": len(groups[(channel, mode)]),
+                    "error": f"{type(outcome).__name__}: {outcome}",
+                }
+            )
+        else:
+            reports.append(outcome)
+    return reports
+
+
+def main() -> int:
+    load_local_env()
+    args = parse_args()
+
+    try:
+        db = HubDB(os.environ.get("HUB_DB_URL"))
+        db.ensure_schema()
+        db.seed_default_price_rules()
+        if args.max_inflight:
+            set_max_inflight(args.max_inflight)
+
+        worker = f"{socket.gethostname()}:{os.getpid()}"
+        started = time.perf_counter()
+        batches: List[Dict[str, Any]] = []
+        while not args.max_batches or len(batches) < args.max_batches:
+            rows = db.claim_dead_letters(
+                worker, args.batch_size, args.lease_seconds, args.max_retries, args.channel or None
+            )
+            if not rows:
+                break
+            groups = asyncio.run(_replay_batch(db, rows, args.dry_run))
+            batches.append({"claimed": len(rows), "groups": groups})
+            # A dry run releases its claim, so claiming again would return the same rows.
+            if args.dry_run:
+                break
+
+        groups = [g for batch in batches for g in batch["groups"]]
+        report = {
+            "worker": worker,
+            "dry_run": args.dry_run,
+            "batches": len(batches),
+            "claimed": sum(b["claimed"] for b in batches),
+            "resolved": sum(g.get("resolved", 0) for g in groups),
+            "failed": sum(g.get("failed", 0) for g in groups),
+            "errors": [g for g in groups if g.get("error")],
+            "elapsed_sec": round(time.perf_counter() - started, 3),
+            "groups": groups,
+        }
+        if args.report_json:
+            out_path = Path(args.report_json).resolve()
+            out_path.parent.mkdir(parents=True, exist_ok=True)
+            out_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(json.dumps({k: v for k, v in report.items() if k != "groups"}, ensure_ascii=False, indent=2))
+        return 1 if report["errors"] else 0
+
+    except HubConfigError as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        return 2
+    except Exception as exc:
+        print(f"ERROR: {type(exc).__name__}: {exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
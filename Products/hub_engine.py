@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""Shared sync steps for hub_sync, hub_dlq and hub_propagate.
+
+Builds channel items from hub rows, fills platform ids and cached inventory
+refs, and runs one sync mode through a connector.
+"""
+
+from __future__ import annotations
+
+import datetime as dt
+import time
+from typing import Any, Dict, List, Optional
+
+from connectors import CONNECTOR_MAP
+from hub_core import ID_INDEX_CURSOR, HubDB, build_channel_payload, compute_channel_price
+
+
+def build_items(
+    db: HubDB,
+    channel: str,
+    scope: str,
+    base_products: Optional[List[Dict[str, Any]]] = None,
+) -> List[Dict[str, Any]]:
+    if base_products is None:
+        products = db.get_products_for_scope(scope, channel)
+    else:
+        listings = db.get_channel_listings(channel)
+        products = []
+        for base in base_products:
+            listing = listings.get(base["sku"]) or {}
+            products.append(
+                {
+                    **base,
+                    "external_product_id": listing.get("external_product_id"),
+                    "external_variant_id": listing.get("external_variant_id"),
+                    "publish_state": listing.get("publish_state"),
+                }
+            )
+    rule = db.get_price_rule(channel)
+    category_map = db.get_channel_config(channel).categories
+    items: List[Dict[str, Any]] = []
+    for product in products:
+        category_external_id = category_map.get(product.get("category_key", "uncategorized"))
+        price = compute_channel_price(
+            base_cost_sar=float(product.get("base_cost_sar") or 0.0),
+            target_margin_pct=float(product.get("target_margin_pct") or 0.0),
+            vat_included_bool=bool(product.get("vat_included_bool")),
+            fee_pct=float(rule.get("fee_pct") or 0.0),
+            payment_pct=float(rule.get("payment_pct") or 0.0),
+            ops_buffer_sar=float(rule.get("ops_buffer_sar") or 0.0),
+            round_rule=str(rule.get("round_rule") or "nearest_9"),
+        )
+        item = build_channel_payload(product, category_external_id, price)
+        item["publish_state"] = product.get("publish_state") or ("publish" if product.get("status") == "publish" else "draft")
+        items.append(item)
+    return items
+
+
+async def apply_id_index(
+    db: HubDB, connector, channel: str, items: List[Dict[str, Any]], full: bool
+) -> Dict[str, Any]:
+    """Fill missing external ids from the platform listing instead of per-SKU lookups.
+
+    After the first full pass only products modified since the last refresh
+    are listed; the ids are persisted to channel_listing either way.
+    """
+    watermark = 0 if full else db.get_sync_cursor(channel, ID_INDEX_CURSOR)
+    modified_after = (
+        dt.datetime.fromtimestamp(watermark, dt.timezone.utc).isoformat().replace("+00:00", "Z") if watermark else None
+    )
+    # Overlap by a minute so clock skew against the platform cannot drop edits.
+    started = int(time.time()) - 60
+    try:
+        index = await connector.fetch_id_index_async(modified_after)
+    except (NotImplementedError, RuntimeError) as exc:
+        return {"error": str(exc)}
+    db.upsert_listing_ids(channel, index)
+    db.set_sync_cursor(channel, ID_INDEX_CURSOR, started)
+    connector.ids_resolved = True
+    filled = 0
+    for item in items:
+        ids = index.get(str(item.get("sku")))
+        if ids and not item.get("external_product_id"):
+            item["external_product_id"], variant_id = ids
+            item["external_variant_id"] = item.get("external_variant_id") or variant_id
+            filled += 1
+    return {"incremental": bool(modified_after), "listed": len(index), "filled": filled}
+
+
+def apply_inventory_refs(db: HubDB, channel: str, items: List[Dict[str, Any]]) -> None:
+    """Attach cached inventory item / location ids while the variant they were resolved for is unchanged."""
+    refs = db.get_inventory_refs(channel)
+    for item in items:
+        ref = refs.get(str(item.get("sku")))
+        if ref and item.get("external_variant_id") and str(item["external_variant_id"]) == ref["external_variant_id"]:
+            item["inventory_item_id"] = ref["inventory_item_id"]
+            item["location_id"] = ref["location_id"]
+
+
+def make_connector(channel: str, dry_run: bool):
+    klass = CONNECTOR_MAP[channel]
+    return klass(dry_run=dry_run)
+
+
+async def sync_mode(connector, mode: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
+    if mode == "catalog":
+        return await connector.sync_catalog_async(items)
+    if mode == "inventory":
+        return await connector.sync_inventory_async(items)
+    if mode == "pricing":
+        return await connector.sync_pricing_async(items)
+
+    # reconcile mode
+    out_catalog = await connector.sync_catalog_async(items)
+    out_inventory = await connector.sync_inventory_async(items)
+    out_pricing = await connector.sync_pricing_async(items)
+
+    merged_items = out_catalog["items"] + out_inventory["items"] + out_pricing["items"]
+    succeeded = out_catalog["succeeded"] + out_inventory["succeeded"] + out_pricing["succeeded"]
+    failed = out_catalog["failed"] + out_inventory["failed"] + out_pricing["failed"]
+    return {
+        "processed": len(merged_items),
+        "succeeded": succeeded,
+        "failed": failed,
+        "items": merged_items,
+        "segments": {
+            "catalog": out_catalog,
+            "inventory": out_inventory,
+            "pricing": out_pricing,
+        },
+    }
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""Propagation worker for webhook-driven stock changes.
+
+Applying an order, cancellation or return queues each changed SKU's new
+``sellable_qty`` in ``inventory_outbox``. This worker claims SKUs once their
+burst of changes has settled and rebuilds them from current hub data. It then
+pushes them through each other active channel's inventory path. Failed pushes
+land in ``dead_letter_queue`` like any other sync failure, and the outbox rows
+are deleted. Any number of workers can run side by side: claims are leased
+like the dead-letter replay's.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Set
+
+from connectors import set_max_inflight
+from hub_core import CHANNELS, HubConfigError, HubDB, SyncResultWriter, delta_hash, load_local_env
+from hub_engine import apply_id_index, apply_inventory_refs, build_items, make_connector, sync_mode
+
+DEBOUNCE_MS = 1000
+MAX_WAIT_MS = 5000
+POLL_MS = 250
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Push webhook-driven stock changes to the other channels")
+    parser.add_argument(
+        "--channels",
+        default=os.environ.get("HUB_PROPAGATE_CHANNELS", ""),
+        help="Comma-separated target channels (default: HUB_PROPAGATE_CHANNELS, else channels with an active price rule)",
+    )
+    parser.add_argument("--debounce-ms", type=float, default=DEBOUNCE_MS, help="Quiet time before a SKU's changes are pushed")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS, help="Push a SKU that keeps changing after this long")
+    parser.add_argument("--poll-ms", type=float, default=POLL_MS, help="Outbox poll interval while idle")
+    parser.add_argument("--batch-size", type=int, default=500, help="SKUs claimed per batch")
+    parser.add_argument(
+        "--lease-seconds",
+        type=int,
+        default=120,
+        help="How long a claim hides its rows from other workers; must outlast one push",
+    )
+    parser.add_argument("--once", action="store_true", help="Exit when no settled SKU is left instead of polling")
+    parser.add_argument("--max-inflight", type=int, default=0, help="Cap on concurrent platform requests")
+    parser.add_argument("--dry-run", action="store_true", help="Push to dry-run connectors and release the claim")
+    return parser.parse_args()
+
+
+def _resolve_channels(db: HubDB, text: str) -> List[str]:
+    if not text.strip():
+        return db.get_active_channels()
+    channels = [c.strip().lower() for c in text.split(",") if c.strip()]
+    unknown = [c for c in channels if c not in CHANNELS]
+    if unknown or not channels:
+        raise HubConfigError(f"Unsupported channels: {text}")
+    return list(dict.fromkeys(channels))
+
+
+async def _push_channel(db: HubDB, channel: str, skus: List[str], dry_run: bool) -> Dict[str, Any]:
+    """Push current stock for ``skus`` to one channel and record the results. Returns the channel report."""
+    try:
+        items = build_items(db, channel, "", db.get_products_by_skus(skus))
+        connector = make_connector(channel, dry_run)
+        try:
+            if not dry_run and any(not item.get("external_product_id") for item in items):
+                await apply_id_index(db, connector, channel, items, full=False)
+            if not dry_run:
+                apply_inventory_refs(db, channel, items)
+            result = await sync_mode(connector, "inventory", items) if items else {"items": []}
+            if connector.resolved_inventory_refs and not dry_run:
+                db.upsert_inventory_refs(channel, connector.resolved_inventory_refs)
+        finally:
+            await connector.aclose()
+    except Exception as exc:
+        # Not the SKUs' fault, but the stock change must not be lost: park it for hub_dlq.
+        error = f"{type(exc).__name__}: {exc}"
+        if not dry_run:
+            db.queue_dead_letters(channel, "inventory", [(sku, {}, error) for sku in skus])
+        return {"channel": channel, "skus": len(skus), "error": error}
+
+    if not dry_run:
+        item_hashes = {str(item.get("sku")): delta_hash(item, "inventory") for item in items}
+        with db.transaction():
+            writer = SyncResultWriter(db, channel, "inventory")
+            for item_result in result.get("items", []):
+                sku = item_result.get("sku", "")
+                writer.add(item_result, item_hashes.get(sku) if item_result.get("success") else None)
+            writer.flush()
+    failed = sum(1 for r in result.get("items", []) if not r.get("success"))
+    return {"channel": channel, "skus": len(skus), "pushed": len(result.get("items", [])) - failed, "failed": failed}
+
+
+async def _propagate_batch(db: HubDB, rows: List[Dict[str, Any]], channels: List[str], dry_run: bool) -> List[Dict[str, Any]]:
+    # Every target gets the SKU's latest hub value, so a burst collapses to one push per channel.
+    sources: Dict[str, Set[Any]] = defaultdict(set)
+    for row in rows:
+        sources[row["sku"]].add(row.get("source_channel"))
+    targets: Dict[str, List[str]] = defaultdict(list)
+    for sku in sorted(sources):
+        skip = next(iter(sources[sku])) if len(sources[sku]) == 1 else None
+        for channel in channels:
+            if channel != skip:
+                targets[channel].append(sku)
+    return list(
+        await asyncio.gather(*(_push_channel(db, channel, skus, dry_run) for channel, skus in targets.items()))
+    )
+
+
+async def _run(db: HubDB, args: argparse.Namespace, channels: List[str]) -> Dict[str, Any]:
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    totals = {"worker": worker, "channels": channels, "dry_run": args.dry_run, "batches": 0, "skus": 0, "errors": 0}
+    while True:
+        rows = db.claim_inventory_outbox(
+            worker, args.batch_size, args.lease_seconds, args.debounce_ms / 1000.0, args.max_wait_ms / 1000.0
+        )
+        if not rows:
+            if args.once:
+                return totals
+            await asyncio.sleep(args.poll_ms / 1000.0)
+            continue
+
+        started = time.perf_counter()
+        try:
+            reports = await _propagate_batch(db, rows, channels, args.dry_run)
+        except Exception:
+            db.release_inventory_outbox(rows)
+            raise
+        if args.dry_run:
+            db.release_inventory_outbox(rows)
+        else:
+            db.settle_inventory_outbox(rows)
+
+        skus = len({row["sku"] for row in rows})
+        totals["batches"] += 1
+        totals["skus"] += skus
+        totals["errors"] += sum(1 for r in reports if r.get("error"))
+        print(
+            json.dumps(
+                {"changes": len(rows), "skus": skus, "elapsed_sec": round(time.perf_counter() - started, 3), "channels": reports},
+                ensure_ascii=False,
+            ),
+            flush=True,
+        )
+        # A dry run releases its claim, so claiming again would return the same rows.
+        if args.dry_run:
+            return totals
+
+
+def main() -> int:
+    load_local_env()
+    args = parse_args()
+
+    try:
+        db = HubDB(os.environ.get("HUB_DB_URL"))
+        db.ensure_schema()
+        db.seed_default_price_rules()
+        if args.max_inflight:
+            set_max_inflight(args.max_inflight)
+        channels = _resolve_channels(db, args.channels)
+        # Fail on missing credentials now rather than dead-lettering every change.
+        for channel in channels:
+            asyncio.run(make_connector(channel, args.dry_run).aclose())
+
+        totals = asyncio.run(_run(db, args, channels))
+        print(json.dumps(totals, ensure_ascii=False, indent=2))
+        return 1 if totals["errors"] else 0
+
+    except KeyboardInterrupt:
+        return 0
+    except HubConfigError as exc:
+        print(f"ERROR: {exc}", file=sys.stderr)
+        return 2
+    except Exception as exc:
+        print(f"ERROR: {type(exc).__name__}: {exc}", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
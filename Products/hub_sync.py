@@ -4,165 +4,425 @@
 from __future__ import annotations
 
 import argparse
+import asyncio
 import json
 import os
 import sys
+import time
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Tuple
 
-from connectors import CONNECTOR_MAP
+from connectors import set_max_inflight
 from hub_core import (
     CHANNELS,
+    STAGE_TO_SCOPE,
     HubConfigError,
     HubDB,
-    build_channel_payload,
-    compute_channel_price,
+    SyncResultWriter,
+    delta_hash,
     load_local_env,
     parse_stage_to_scope,
+    stage_channels,
 )
+from hub_engine import apply_id_index, apply_inventory_refs, build_items, make_connector, sync_mode
+
+# Items pushed, persisted and checkpointed per round; also bounds memory when the report is streamed.
+SYNC_CHUNK_ITEMS = 100
+# A running job with no checkpoint for this long is assumed dead and marked abandoned.
+JOB_STALE_MINUTES = 30.0
 
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(description="Omnichannel catalog/inventory/pricing sync")
-    parser.add_argument("--channel", required=True, choices=CHANNELS)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--channel", choices=CHANNELS)
+    target.add_argument("--channels", default="", help="Comma-separated channels to sync concurrently, e.g. woo,zid,salla,shopify")
+    target.add_argument("--stage", default="", help="wave50|wave100|wave200: sync all channels active in the stage concurrently")
     parser.add_argument("--mode", required=True, choices=["catalog", "inventory", "pricing", "reconcile"])
-    parser.add_argument("--scope", default="top50", help="top50|top100|top200|active|wave50|wave100|wave200")
+    parser.add_argument(
+        "--scope",
+        default="",
+        help="top50|top100|top200|active|wave50|wave100|wave200 (default: the --stage scope, else top50)",
+    )
     parser.add_argument("--csv-file", default="", help="Optional override CSV path for scope bootstrap")
     parser.add_argument("--dry-run", action="store_true")
     parser.add_argument("--report-json", default="", help="Optional output path for job report")
+    parser.add_argument(
+        "--report-format",
+        choices=["json", "ndjson"],
+        default="json",
+        help="ndjson streams item records as chunks finish, then a summary trailer",
+    )
     parser.add_argument("--strict", action="store_true", help="Fail if any item fails")
+    parser.add_argument("--delta", action="store_true", help="Only push items whose payload changed since the last sync")
+    parser.add_argument(
+        "--refresh-index",
+        action="store_true",
+        help="Rebuild the channel's SKU -> external id index from a full product listing",
+    )
+    parser.add_argument(
+        "--since-cursor",
+        action="store_true",
+        help="Only push SKUs journaled in catalog_changes since this channel/mode's last cursor",
+    )
+    parser.add_argument(
+        "--chunk-items",
+        type=int,
+        default=SYNC_CHUNK_ITEMS,
+        help="Items pushed, persisted and checkpointed per round (default: %(default)s)",
+    )
+    parser.add_argument("--resume", type=int, default=0, metavar="JOB_ID", help="Continue a stopped sync job, skipping SKUs it finished")
+    parser.add_argument(
+        "--stale-minutes",
+        type=float,
+        default=JOB_STALE_MINUTES,
+        help="Running jobs without a checkpoint for this long are marked abandoned (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--max-inflight",
+        type=int,
+        default=0,
+        help="Cap on concurrent platform requests across all channels (default: HUB_MAX_INFLIGHT or 256)",
+    )
     return parser.parse_args()
 
 
-def _build_items(db: HubDB, channel: str, scope: str) -> List[Dict[str, Any]]:
-    products = db.get_products_for_scope(scope, channel)
-    rule = db.get_price_rule(channel)
-    items: List[Dict[str, Any]] = []
-    for product in products:
-        category_external_id = db.get_category_map(channel, product.get("category_key", "uncategorized"))
-        price = compute_channel_price(
-            base_cost_sar=float(product.get("base_cost_sar") or 0.0),
-            target_margin_pct=float(product.get("target_margin_pct") or 0.0),
-            vat_included_bool=bool(product.get("vat_included_bool")),
-            fee_pct=float(rule.get("fee_pct") or 0.0),
-            payment_pct=float(rule.get("payment_pct") or 0.0),
-            ops_buffer_sar=float(rule.get("ops_buffer_sar") or 0.0),
-            round_rule=str(rule.get("round_rule") or "nearest_9"),
+def _resolve_channels(args: argparse.Namespace) -> List[str]:
+    if args.channel:
+        return [args.channel]
+    if args.stage:
+        if args.stage.strip().lower() not in STAGE_TO_SCOPE:
+            raise HubConfigError(f"Unsupported stage: {args.stage}")
+        return stage_channels(args.stage.strip().lower())
+    channels = [c.strip().lower() for c in args.channels.split(",") if c.strip()]
+    unknown = [c for c in channels if c not in CHANNELS]
+    if unknown or not channels:
+        raise HubConfigError(f"Unsupported channels: {args.channels}")
+    return list(dict.fromkeys(channels))
+
+
+def _split_delta(
+    db: HubDB, channel: str, mode: str, items: List[Dict[str, Any]], item_hashes: Dict[str, str]
+) -> Tuple[List[Dict[str, Any]], int]:
+    stored = db.get_payload_hashes(channel, mode)
+    changed = [item for item in items if stored.get(str(item.get("sku"))) != item_hashes.get(str(item.get("sku")))]
+    return changed, len(items) - len(changed)
+
+
+class NdjsonReport:
+    """Report written as NDJSON while the sync runs.
+
+    The file gets a header line, then one ``item`` line per result as each chunk
+    finishes, then a ``summary`` trailer. Lines are flushed per chunk, so a
+    crashed run leaves a readable partial report without a trailer.
+    """
+
+    def __init__(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._fh = path.open("w", encoding="utf-8")
+
+    def write(self, record: Dict[str, Any]) -> None:
+        self._fh.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+
+    def write_items(self, channel: str, mode: str, result: Dict[str, Any]) -> None:
+        segments = result.get("segments") or {mode: result}
+        for segment, out in segments.items():
+            for item_result in out.get("items", []):
+                self.write({"type": "item", "channel": channel, "mode": mode, "segment": segment, **item_result})
+        self._fh.flush()
+
+    def close(self, summary: Dict[str, Any]) -> None:
+        self.write({"type": "summary", **summary})
+        self._fh.close()
+
+
+def _persist_results(
+    db: HubDB,
+    args: argparse.Namespace,
+    channel: str,
+    job_id: int,
+    result: Dict[str, Any],
+    item_hashes: Dict[str, str],
+) -> None:
+    failed_skus = {r.get("sku", "") for r in result.get("items", []) if not r.get("success")}
+    # One transaction and a few executemany batches, instead of a commit per SKU and segment.
+    # The job checkpoint commits with the results, so a resumed job never skips unrecorded work.
+    with db.transaction():
+        writer = SyncResultWriter(db, channel, args.mode)
+        for item_result in result.get("items", []):
+            sku = item_result.get("sku", "")
+            # Only a real, fully successful push may mark the item as up to date.
+            payload_hash = None
+            if not args.dry_run and sku not in failed_skus:
+                payload_hash = item_hashes.get(sku)
+            writer.add(item_result, payload_hash)
+        writer.flush()
+        db.checkpoint_sync_job(
+            job_id,
+            {r.get("sku", ""): r.get("sku", "") not in failed_skus for r in result.get("items", [])},
+            result.get("processed", 0),
+            result.get("succeeded", 0),
+            result.get("failed", 0),
         )
-        item = build_channel_payload(product, category_external_id, price)
-        item["publish_state"] = product.get("publish_state") or ("publish" if product.get("status") == "publish" else "draft")
-        items.append(item)
-    return items
 
 
-def _connector(channel: str, dry_run: bool):
-    klass = CONNECTOR_MAP[channel]
-    return klass(dry_run=dry_run)
+async def _sync_chunks(
+    db: HubDB,
+    args: argparse.Namespace,
+    connector,
+    channel: str,
+    job_id: int,
+    items: List[Dict[str, Any]],
+    item_hashes: Dict[str, str],
+    stream: Optional[NdjsonReport],
+) -> Dict[str, Any]:
+    """Push ``items`` in ``--chunk-items`` slices, persisting and checkpointing each slice before the next.
+
+    With a stream, item results go to the NDJSON report and are dropped, so
+    memory holds one chunk's platform responses whatever the scope size.
+    """
+    total: Dict[str, Any] = {"processed": 0, "succeeded": 0, "failed": 0, "items": []}
+    segments: Dict[str, Dict[str, Any]] = {}
+    size = max(args.chunk_items, connector.min_chunk_items(args.mode), 1)
+    chunks = [items[i : i + size] for i in range(0, len(items), size)] or [[]]
+    for chunk in chunks:
+        result = await sync_mode(connector, args.mode, chunk)
+        if connector.resolved_inventory_refs and not args.dry_run:
+            db.upsert_inventory_refs(channel, connector.resolved_inventory_refs)
+            connector.resolved_inventory_refs.clear()
+        _persist_results(db, args, channel, job_id, result, item_hashes)
+
+        for key in ("processed", "succeeded", "failed"):
+            total[key] += result.get(key, 0)
+        for name, out in (result.get("segments") or {}).items():
+            seg = segments.setdefault(name, {"processed": 0, "succeeded": 0, "failed": 0, "items": []})
+            for key in ("processed", "succeeded", "failed"):
+                seg[key] += out.get(key, 0)
+            if stream is None:
+                seg["items"].extend(out.get("items", []))
+        if stream is not None:
+            stream.write_items(channel, args.mode, result)
+        else:
+            total["items"].extend(result.get("items", []))
+        # Release this chunk's responses before the next chunk is pushed.
+        del result
+    if segments:
+        total["segments"] = segments
+    return total
+
+
+async def _sync_channel(
+    db: HubDB,
+    args: argparse.Namespace,
+    channel: str,
+    scope: str,
+    base_products: Optional[List[Dict[str, Any]]] = None,
+    stream: Optional["NdjsonReport"] = None,
+) -> Dict[str, Any]:
+    connector = make_connector(channel, args.dry_run)
+    try:
+        return await _run_channel(db, args, connector, channel, scope, base_products, stream)
+    finally:
+        await connector.aclose()
+
+
+async def _run_channel(
+    db: HubDB,
+    args: argparse.Namespace,
+    connector,
+    channel: str,
+    scope: str,
+    base_products: Optional[List[Dict[str, Any]]],
+    stream: Optional["NdjsonReport"] = None,
+) -> Dict[str, Any]:
+    # Hub DB calls are short and run inline; only platform I/O yields to other channels.
+    job_id = args.resume or db.start_sync_job(channel, args.mode, scope, args.dry_run)
+    try:
+        return await _run_job(db, args, connector, channel, scope, base_products, stream, job_id)
+    except Exception as exc:
+        _finish_job(db, job_id, "failed", f"{type(exc).__name__}: {exc}")
+        raise
+
+
+def _finish_job(db: HubDB, job_id: int, status: str, error_summary: str) -> None:
+    """Close a job with the counters its checkpoints accumulated, across resumes."""
+    job = db.get_sync_job(job_id) or {}
+    db.finish_sync_job(
+        job_id=job_id,
+        status=status,
+        processed_count=int(job.get("processed_count") or 0),
+        success_count=int(job.get("success_count") or 0),
+        failed_count=int(job.get("failed_count") or 0),
+        error_summary=error_summary,
+    )
 
 
-def _sync_mode(connector, mode: str, items: List[Dict[str, Any]]) -> Dict[str, Any]:
-    if mode == "catalog":
-        return connector.sync_catalog(items)
-    if mode == "inventory":
-        return connector.sync_inventory(items)
-    if mode == "pricing":
-        return connector.sync_pricing(items)
+async def _run_job(
+    db: HubDB,
+    args: argparse.Namespace,
+    connector,
+    channel: str,
+    scope: str,
+    base_products: Optional[List[Dict[str, Any]]],
+    stream: Optional["NdjsonReport"],
+    job_id: int,
+) -> Dict[str, Any]:
+    items = build_items(db, channel, scope, base_products)
+    id_index = None
+    if not args.dry_run and (args.refresh_index or any(not item.get("external_product_id") for item in items)):
+        id_index = await apply_id_index(db, connector, channel, items, full=args.refresh_index)
+    cursor_from = cursor_to = None
+    if args.since_cursor:
+        cursor_from = db.get_sync_cursor(channel, args.mode)
+        changed_skus, cursor_to = db.get_changed_skus(cursor_from, args.mode)
+        wanted = set(changed_skus)
+        items = [item for item in items if item.get("sku") in wanted]
+    if args.mode in ("inventory", "reconcile") and not args.dry_run:
+        apply_inventory_refs(db, channel, items)
+    item_hashes = {str(item.get("sku")): delta_hash(item, args.mode) for item in items}
+    skipped = 0
+    if args.delta:
+        items, skipped = _split_delta(db, channel, args.mode, items, item_hashes)
+    resumed = 0
+    if args.resume:
+        done = db.get_job_done_skus(job_id)
+        pending = [item for item in items if str(item.get("sku")) not in done]
+        resumed, items = len(items) - len(pending), pending
+    result = await _sync_chunks(db, args, connector, channel, job_id, items, item_hashes, stream)
+
+    # Failed items are already in the dead-letter queue, so the cursor always advances.
+    if cursor_to is not None and not args.dry_run:
+        db.set_sync_cursor(channel, args.mode, cursor_to)
+
+    job = db.get_sync_job(job_id) or {}
+    failed_total = int(job.get("failed_count") or 0)
+    _finish_job(
+        db,
+        job_id,
+        "success" if failed_total == 0 else "partial_failure",
+        "" if failed_total == 0 else f"{failed_total} failed",
+    )
+
+    return {
+        "channel": channel,
+        "mode": args.mode,
+        "scope": scope,
+        "dry_run": args.dry_run,
+        "processed": result.get("processed", 0),
+        "succeeded": result.get("succeeded", 0),
+        "failed": result.get("failed", 0),
+        "skipped": skipped,
+        "resumed_done": resumed if args.resume else None,
+        "cursor": {"from": cursor_from, "to": cursor_to} if args.since_cursor else None,
+        "job_id": job_id,
+        "id_index": id_index,
+        "bootstrap": db.last_load_stats,
+        "http": {**connector.stats.as_dict(), "circuit": connector.breaker.as_dict()},
+        "items": result.get("items", []),
+        "segments": result.get("segments", {}),
+    }
 
-    # reconcile mode
-    out_catalog = connector.sync_catalog(items)
-    out_inventory = connector.sync_inventory(items)
-    out_pricing = connector.sync_pricing(items)
 
-    merged_items = out_catalog["items"] + out_inventory["items"] + out_pricing["items"]
-    succeeded = out_catalog["succeeded"] + out_inventory["succeeded"] + out_pricing["succeeded"]
-    failed = out_catalog["failed"] + out_inventory["failed"] + out_pricing["failed"]
+async def _fan_out(
+    db: HubDB, args: argparse.Namespace, channels: List[str], scope: str, stream: Optional[NdjsonReport] = None
+) -> Dict[str, Any]:
+    """Sync every channel concurrently on one event loop over a product set loaded once."""
+    base_products = db.get_scope_products(scope) if scope != "active" else None
+    started = time.perf_counter()
+    outcomes = await asyncio.gather(
+        *(_sync_channel(db, args, channel, scope, base_products, stream) for channel in channels),
+        return_exceptions=True,
+    )
+    ordered: Dict[str, Dict[str, Any]] = {}
+    for channel, outcome in zip(channels, outcomes):
+        if isinstance(outcome, Exception):
+            ordered[channel] = {"channel": channel, "error": f"{type(outcome).__name__}: {outcome}"}
+        else:
+            ordered[channel] = outcome
     return {
-        "processed": len(merged_items),
-        "succeeded": succeeded,
-        "failed": failed,
-        "items": merged_items,
-        "segments": {
-            "catalog": out_catalog,
-            "inventory": out_inventory,
-            "pricing": out_pricing,
-        },
+        "channels": ordered,
+        "mode": args.mode,
+        "scope": scope,
+        "dry_run": args.dry_run,
+        "processed": sum(r.get("processed", 0) for r in ordered.values()),
+        "succeeded": sum(r.get("succeeded", 0) for r in ordered.values()),
+        "failed": sum(r.get("failed", 0) for r in ordered.values()),
+        "skipped": sum(r.get("skipped", 0) for r in ordered.values()),
+        "errors": {c: r["error"] for c, r in ordered.items() if r.get("error")},
+        "bootstrap": db.last_load_stats,
+        "elapsed_sec": round(time.perf_counter() - started, 3),
     }
 
 
+def _summary(report: Dict[str, Any]) -> Dict[str, Any]:
+    out = {k: v for k, v in report.items() if k != "items"}
+    if out.get("segments"):
+        out["segments"] = {name: _summary(seg) for name, seg in out["segments"].items()}
+    if "channels" in out:
+        out["channels"] = {c: _summary(r) for c, r in out["channels"].items()}
+    return out
+
+
+def _reopen_job(db: HubDB, args: argparse.Namespace, scope: str) -> str:
+    """Check that ``--resume`` matches its job and mark the job running again. Returns the job's scope."""
+    job = db.get_sync_job(args.resume)
+    if job is None:
+        raise HubConfigError(f"Unknown sync job: {args.resume}")
+    if not args.channel or job["channel"] != args.channel or job["mode"] != args.mode:
+        raise HubConfigError(
+            f"Job {args.resume} is a {job['channel']} {job['mode']} sync; resume it with --channel {job['channel']} --mode {job['mode']}"
+        )
+    if bool(job["dry_run"]) != args.dry_run:
+        raise HubConfigError(f"Job {args.resume} was {'a' if job['dry_run'] else 'not a'} dry run")
+    if (args.scope or args.stage) and scope != job["scope"]:
+        raise HubConfigError(f"Job {args.resume} synced scope {job['scope']}, not {scope}")
+    if not db.reopen_sync_job(args.resume):
+        raise HubConfigError(f"Job {args.resume} is still running; wait for it or for the stale-job sweep")
+    return job["scope"]
+
+
 def main() -> int:
     load_local_env()
     args = parse_args()
 
     try:
-        scope = parse_stage_to_scope(args.scope)
+        scope = parse_stage_to_scope(args.scope or args.stage or "top50")
+        channels = _resolve_channels(args)
         db = HubDB(os.environ.get("HUB_DB_URL"))
         db.ensure_schema()
         db.seed_default_price_rules()
+        abandoned = db.sweep_stale_sync_jobs(args.stale_minutes)
+        if args.resume:
+            scope = _reopen_job(db, args, scope)
 
         csv_path = Path(args.csv_file).resolve() if args.csv_file else None
         if scope != "active":
             db.ensure_scope_loaded(scope, csv_path)
 
-        connector = _connector(args.channel, args.dry_run)
-        job_id = db.start_sync_job(args.channel, args.mode, scope, args.dry_run)
-
-        items = _build_items(db, args.channel, scope)
-        result = _sync_mode(connector, args.mode, items)
-
-        for item_result in result.get("items", []):
-            sku = item_result.get("sku", "")
-            payload = item_result.get("payload") or {}
-            response = item_result.get("response") or {}
-            error = item_result.get("error") or None
-            db.upsert_channel_listing(
-                channel=args.channel,
-                sku=sku,
-                external_product_id=item_result.get("external_product_id"),
-                external_variant_id=item_result.get("external_variant_id"),
-                publish_state=item_result.get("publish_state") or "draft",
-                payload=payload,
-                response=response,
-                error=error,
-            )
-            if not item_result.get("success"):
-                db.queue_dead_letter(
-                    channel=args.channel,
-                    mode=args.mode,
-                    sku=sku,
-                    payload=payload,
-                    error=str(error or "unknown error"),
-                )
-
-        status = "success" if result.get("failed", 0) == 0 else "partial_failure"
-        db.finish_sync_job(
-            job_id=job_id,
-            status=status,
-            processed_count=result.get("processed", 0),
-            success_count=result.get("succeeded", 0),
-            failed_count=result.get("failed", 0),
-            error_summary="" if result.get("failed", 0) == 0 else f"{result.get('failed', 0)} failed",
-        )
+        if args.max_inflight:
+            set_max_inflight(args.max_inflight)
+        stream = None
+        if args.report_json and args.report_format == "ndjson":
+            stream = NdjsonReport(Path(args.report_json).resolve())
+            stream.write({"type": "header", "mode": args.mode, "scope": scope, "channels": channels, "dry_run": args.dry_run})
+        if args.channel:
+            report = asyncio.run(_sync_channel(db, args, args.channel, scope, stream=stream))
+        else:
+            report = asyncio.run(_fan_out(db, args, channels, scope, stream))
 
-        report = {
-            "channel": args.channel,
-            "mode": args.mode,
-            "scope": scope,
-            "dry_run": args.dry_run,
-            "processed": result.get("processed", 0),
-            "succeeded": result.get("succeeded", 0),
-            "failed": result.get("failed", 0),
-            "job_id": job_id,
-            "items": result.get("items", []),
-            "segments": result.get("segments", {}),
-        }
-
-        if args.report_json:
+        if stream is not None:
+            stream.close(_summary(report))
+        elif args.report_json:
             out_path = Path(args.report_json).resolve()
             out_path.parent.mkdir(parents=True, exist_ok=True)
             out_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
 
-        print(json.dumps({k: v for k, v in report.items() if k != "items"}, ensure_ascii=False, indent=2))
+        report["abandoned_jobs"] = abandoned
+        print(json.dumps(_summary(report), ensure_ascii=False, indent=2))
 
+        if report.get("errors"):
+            return 1
         if args.strict and report["failed"] > 0:
             return 2
         return 0
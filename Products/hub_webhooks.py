@@ -1,109 +1,468 @@
 #!/usr/bin/env python3
-"""Minimal webhook receiver for order/cancel/return events.
+"""Asyncio webhook receiver for order/cancel/return events.
 
 Endpoints:
 - POST /webhooks/{channel}/orders
 - POST /webhooks/{channel}/cancellations
 - POST /webhooks/{channel}/returns
+
+One event loop parses HTTP/1.1 (keep-alive, size limits, idle timeouts) and
+validates events. A writer task appends them to ``webhook_inbox`` in group
+commits and each request is acknowledged once its commit is durable. A drainer
+task then moves inbox rows into ``order_events`` and applies their inventory
+effects, exactly once per idempotency key. When too many events are waiting
+for a commit the receiver answers 503 with ``Retry-After``.
+
+An in-memory idempotency front (an LRU of recent keys and a rotating Bloom
+filter) answers platform retries as duplicates without touching the database
+and lets the inbox skip the duplicate lookup for keys it has never seen. The
+``order_events`` unique key stays the source of truth.
 """
 
 from __future__ import annotations
 
 import argparse
+import asyncio
 import datetime as dt
 import hashlib
 import json
+import math
 import os
+import signal
+import sys
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from http import HTTPStatus
-from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
-from typing import Dict
-from urllib.parse import urlparse
+from typing import Any, Dict, List, Mapping, Optional, Set, Tuple
 
 from hub_core import CHANNELS, HubDB, load_local_env
 
+EVENT_TYPES = {"orders", "cancellations", "returns"}
+MAX_HEADER_BYTES = 16 * 1024
+MAX_BODY_BYTES = 1024 * 1024
+KEEPALIVE_TIMEOUT = 15.0
+# Time a client gets to send the rest of a request once it has started one.
+REQUEST_TIMEOUT = 10.0
+MAX_PENDING = 1000
+# Group commit: an inbox append waits for at most BATCH_MAX events or BATCH_MS milliseconds.
+BATCH_MAX = 200
+BATCH_MS = 10.0
+# The drainer also wakes on this interval, so rows left by a crash or a failed drain are picked up.
+DRAIN_INTERVAL = 5.0
+# Idempotency front: LRU entries, keys per Bloom generation (two are kept), target false-positive rate,
+# and how far back order_events are loaded at startup.
+IDEM_LRU_SIZE = 100_000
+IDEM_BLOOM_CAPACITY = 1_000_000
+IDEM_BLOOM_ERROR = 0.001
+IDEM_WARM_HOURS = 24.0
+SHUTDOWN_TIMEOUT = 20.0
 
-class WebhookHandler(BaseHTTPRequestHandler):
-    db: HubDB = None  # type: ignore
 
-    def _json_response(self, status: int, payload: Dict) -> None:
-        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
-        self.send_response(status)
-        self.send_header("Content-Type", "application/json")
-        self.send_header("Content-Length", str(len(raw)))
-        self.end_headers()
-        self.wfile.write(raw)
-
-    def do_POST(self):  # noqa: N802
-        parsed = urlparse(self.path)
-        parts = [p for p in parsed.path.split("/") if p]
-        if len(parts) != 3 or parts[0] != "webhooks":
-            self._json_response(HTTPStatus.NOT_FOUND, {"error": "Unsupported path"})
-            return
-
-        channel, event_type = parts[1], parts[2]
-        if channel not in CHANNELS:
-            self._json_response(HTTPStatus.BAD_REQUEST, {"error": f"Unsupported channel={channel}"})
-            return
-        if event_type not in {"orders", "cancellations", "returns"}:
-            self._json_response(HTTPStatus.BAD_REQUEST, {"error": f"Unsupported event_type={event_type}"})
-            return
+class HttpError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class RotatingBloom:
+    """Two Bloom filter generations; when the current one holds ``capacity`` keys it replaces the old one."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        self.capacity = max(int(capacity), 1)
+        self.bits = max(int(-self.capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(int(round(self.bits / self.capacity * math.log(2))), 1)
+        self._current = bytearray((self.bits + 7) // 8)
+        self._previous = bytearray(len(self._current))
+        self._count = 0
+
+    def _positions(self, key: str) -> List[int]:
+        digest = hashlib.blake2b(key.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        if self._count >= self.capacity:
+            self._previous, self._current = self._current, bytearray(len(self._current))
+            self._count = 0
+        for pos in self._positions(key):
+            self._current[pos >> 3] |= 1 << (pos & 7)
+        self._count += 1
+
+    def __contains__(self, key: str) -> bool:
+        positions = self._positions(key)
+        return all(self._current[p >> 3] & (1 << (p & 7)) for p in positions) or all(
+            self._previous[p >> 3] & (1 << (p & 7)) for p in positions
+        )
+
+
+class IdempotencyFront:
+    """Recently committed idempotency keys. Only touched from the event loop.
+
+    ``is_duplicate`` is exact for keys in the LRU. ``maybe_seen`` is False only
+    for keys the Bloom filter has never seen, which may still exist in the
+    database from before the warm-up window.
+    """
+
+    def __init__(
+        self, lru_size: int = IDEM_LRU_SIZE, bloom_capacity: int = IDEM_BLOOM_CAPACITY, bloom_error: float = IDEM_BLOOM_ERROR
+    ):
+        self.lru_size = max(int(lru_size), 1)
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        self._bloom = RotatingBloom(bloom_capacity, bloom_error)
+        self.hits = 0
+
+    def add(self, key: str) -> None:
+        self._lru[key] = None
+        self._lru.move_to_end(key)
+        if len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+        self._bloom.add(key)
+
+    def is_duplicate(self, key: str) -> bool:
+        if key in self._lru:
+            self._lru.move_to_end(key)
+            self.hits += 1
+            return True
+        return False
+
+    def maybe_seen(self, key: str) -> bool:
+        return key in self._bloom
+
+
+def parse_event(channel: str, event_type: str, headers: Mapping[str, str], body: bytes) -> Dict[str, Any]:
+    """Validate one webhook body and derive its idempotency key. Raises HttpError(400) on bad JSON."""
+    try:
+        payload = json.loads(body.decode("utf-8") or "{}") if body else {}
+    except Exception as exc:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"Invalid JSON body: {exc}")
+    if not isinstance(payload, dict):
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid JSON body: expected an object")
+
+    external_order_id = str(payload.get("order_id") or payload.get("id") or "unknown")
+    event_ts = payload.get("event_ts") or payload.get("created_at") or dt.datetime.now(dt.timezone.utc).isoformat()
+    try:
+        parsed_ts = dt.datetime.fromisoformat(str(event_ts).replace("Z", "+00:00"))
+    except ValueError:
+        parsed_ts = dt.datetime.now(dt.timezone.utc)
+
+    idem = headers.get("x-idempotency-key")
+    if not idem:
+        idem_seed = f"{channel}:{event_type}:{external_order_id}:{json.dumps(payload, sort_keys=True)}"
+        idem = hashlib.sha256(idem_seed.encode("utf-8")).hexdigest()
+
+    return {
+        "channel": channel,
+        "external_order_id": external_order_id,
+        "event_type": event_type,
+        "event_ts": parsed_ts,
+        "payload": payload,
+        "idempotency_key": idem,
+    }
 
+
+def _route(method: str, target: str) -> Tuple[str, str]:
+    path = target.split("?", 1)[0]
+    parts = [p for p in path.split("/") if p]
+    if len(parts) != 3 or parts[0] != "webhooks":
+        raise HttpError(HTTPStatus.NOT_FOUND, "Unsupported path")
+    if method != "POST":
+        raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, f"Unsupported method={method}")
+    channel, event_type = parts[1], parts[2]
+    if channel not in CHANNELS:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"Unsupported channel={channel}")
+    if event_type not in EVENT_TYPES:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"Unsupported event_type={event_type}")
+    return channel, event_type
+
+
+class WebhookServer:
+    """HTTP/1.1 receiver on one event loop with a group-commit inbox writer and graceful shutdown."""
+
+    def __init__(
+        self,
+        db: HubDB,
+        host: str,
+        port: int,
+        db_workers: int,
+        max_pending: int = MAX_PENDING,
+        max_body_bytes: int = MAX_BODY_BYTES,
+        keepalive_timeout: float = KEEPALIVE_TIMEOUT,
+        batch_max: int = BATCH_MAX,
+        batch_ms: float = BATCH_MS,
+        front: Optional[IdempotencyFront] = None,
+    ):
+        self.db = db
+        self.host = host
+        self.port = port
+        self.max_pending = max(int(max_pending), 1)
+        self.max_body_bytes = int(max_body_bytes)
+        self.keepalive_timeout = keepalive_timeout
+        self.executor = ThreadPoolExecutor(max_workers=max(int(db_workers), 1), thread_name_prefix="hub-webhook-db")
+        self.batch_max = max(int(batch_max), 1)
+        self.batch_delay = max(float(batch_ms), 0.0) / 1000.0
+        self._queue: "asyncio.Queue[Tuple[Dict[str, Any], asyncio.Future]]" = asyncio.Queue()
+        self._appended = asyncio.Event()
+        self.front = front or IdempotencyFront()
+        self._stopping = False
+        self._idle: Set[asyncio.Task] = set()
+        self._connections: Set[asyncio.Task] = set()
+
+    async def serve(self) -> None:
+        server = await asyncio.start_server(self._connection, self.host, self.port, limit=MAX_HEADER_BYTES, backlog=1024)
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except (NotImplementedError, RuntimeError):
+                pass
+        # Drain rows left over from the previous run straight away.
+        self._appended.set()
+        writer = asyncio.create_task(self._write_inbox())
+        drainer = asyncio.create_task(self._drain_inbox())
+        print(f"Listening on http://{self.host}:{self.port}", flush=True)
+        async with server:
+            await stop.wait()
+            await self.shutdown(server, writer, drainer)
+
+    async def shutdown(self, server: asyncio.AbstractServer, writer: asyncio.Task, drainer: asyncio.Task) -> None:
+        """Stop accepting, drop idle keep-alive connections, let in-flight requests finish, then drain the inbox."""
+        self._stopping = True
+        server.close()
+        for task in list(self._idle):
+            task.cancel()
+        if self._connections:
+            await asyncio.wait(list(self._connections), timeout=SHUTDOWN_TIMEOUT)
+        writer.cancel()
+        drainer.cancel()
+        await asyncio.gather(writer, drainer, return_exceptions=True)
+        # Whatever is still queued stays in webhook_inbox and is drained on the next start.
         try:
-            length = int(self.headers.get("Content-Length", "0"))
-            body = self.rfile.read(length).decode("utf-8") if length > 0 else "{}"
-            payload = json.loads(body or "{}")
+            await asyncio.get_running_loop().run_in_executor(self.executor, self._drain_all)
         except Exception as exc:
-            self._json_response(HTTPStatus.BAD_REQUEST, {"error": f"Invalid JSON body: {exc}"})
-            return
+            print(f"Inbox drain on shutdown failed: {type(exc).__name__}: {exc}", file=sys.stderr, flush=True)
+        self.executor.shutdown(wait=True)
 
-        external_order_id = str(payload.get("order_id") or payload.get("id") or "unknown")
-        event_ts = payload.get("event_ts") or payload.get("created_at") or dt.datetime.now(dt.timezone.utc).isoformat()
+    async def _submit(self, event: Dict[str, Any]) -> bool:
+        """Queue an event for the next group commit. Returns False if it is a duplicate."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((event, future))
+        return await future
+
+    async def _write_inbox(self) -> None:
+        """Append queued events to webhook_inbox, one commit per batch of up to batch_max events or batch_ms."""
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.batch_delay
+            while len(batch) < self.batch_max:
+                if not self._queue.empty():
+                    batch.append(self._queue.get_nowait())
+                    continue
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            events = [e for e, _ in batch]
+            maybe_seen = {e["idempotency_key"] for e in events if self.front.maybe_seen(e["idempotency_key"])}
+            try:
+                flags = await loop.run_in_executor(self.executor, self.db.append_webhook_inbox, events, maybe_seen)
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            for (event, future), new in zip(batch, flags):
+                self.front.add(event["idempotency_key"])
+                if not future.done():
+                    future.set_result(new)
+            if any(flags):
+                self._appended.set()
+
+    async def _drain_inbox(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await asyncio.wait_for(self._appended.wait(), DRAIN_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+            self._appended.clear()
+            try:
+                await loop.run_in_executor(self.executor, self._drain_all)
+            except Exception as exc:
+                print(f"Inbox drain failed: {type(exc).__name__}: {exc}", file=sys.stderr, flush=True)
+
+    def _drain_all(self) -> None:
+        while True:
+            outcome = self.db.drain_webhook_inbox(self.batch_max)
+            if outcome["failed"]:
+                print(f"Inbox drain: {outcome['failed']} event(s) failed to apply", file=sys.stderr, flush=True)
+            if outcome["drained"] + outcome["failed"] < self.batch_max:
+                return
+
+    async def _connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
         try:
-            parsed_ts = dt.datetime.fromisoformat(str(event_ts).replace("Z", "+00:00"))
+            while not self._stopping:
+                self._idle.add(task)
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), self.keepalive_timeout)
+                except (asyncio.TimeoutError, asyncio.CancelledError, ConnectionError, ValueError):
+                    break
+                finally:
+                    self._idle.discard(task)
+                if not request_line.strip():
+                    break
+                try:
+                    keep_alive = await self._request(request_line, reader, writer)
+                except (ConnectionError, asyncio.IncompleteReadError):
+                    break
+                if not keep_alive:
+                    break
+        finally:
+            self._connections.discard(task)
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except Exception:
+                pass
+
+    async def _request(self, request_line: bytes, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bool:
+        """Serve one request. Returns whether the connection may be reused."""
+        keep_alive = False
+        try:
+            try:
+                method, target, version = request_line.decode("latin-1").split()
+            except ValueError:
+                raise HttpError(HTTPStatus.BAD_REQUEST, "Malformed request line")
+            headers = await asyncio.wait_for(self._headers(reader), REQUEST_TIMEOUT)
+            connection = headers.get("connection", "").lower()
+            keep_alive = connection == "keep-alive" if version == "HTTP/1.0" else connection != "close"
+
+            channel, event_type = _route(method, target)
+            body = await asyncio.wait_for(self._body(headers, reader, writer), REQUEST_TIMEOUT)
+            event = parse_event(channel, event_type, headers, body)
+            idem = event["idempotency_key"]
+            if self.front.is_duplicate(idem):
+                keep_alive = keep_alive and not self._stopping
+                await self._respond(
+                    writer,
+                    HTTPStatus.OK,
+                    {"status": "duplicate", "channel": channel, "event_type": event_type, "idempotency_key": idem},
+                    keep_alive,
+                )
+                return keep_alive
+            if self._queue.qsize() >= self.max_pending:
+                await self._respond(writer, HTTPStatus.SERVICE_UNAVAILABLE, {"error": "Receiver busy"}, keep_alive, {"Retry-After": "1"})
+                return keep_alive and not self._stopping
+            try:
+                new = await self._submit(event)
+            except Exception as exc:
+                await self._respond(
+                    writer,
+                    HTTPStatus.SERVICE_UNAVAILABLE,
+                    {"error": f"Inbox write failed: {type(exc).__name__}: {exc}"},
+                    False,
+                    {"Retry-After": "1"},
+                )
+                return False
+            if new:
+                status, payload = HTTPStatus.OK, {
+                    "status": "accepted",
+                    "channel": channel,
+                    "event_type": event_type,
+                    "external_order_id": event["external_order_id"],
+                    "idempotency_key": idem,
+                }
+            else:
+                status, payload = HTTPStatus.OK, {"status": "duplicate", "channel": channel, "event_type": event_type, "idempotency_key": idem}
+        except HttpError as exc:
+            # An unread body may still be on the stream, so the connection is not reused.
+            await self._respond(writer, exc.status, {"error": str(exc)}, False)
+            return False
+        except (asyncio.IncompleteReadError, ConnectionError):
+            raise
+        except asyncio.TimeoutError:
+            await self._respond(writer, HTTPStatus.REQUEST_TIMEOUT, {"error": "Request timed out"}, False)
+            return False
+        except Exception as exc:
+            await self._respond(writer, HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(exc).__name__}: {exc}"}, False)
+            return False
+        keep_alive = keep_alive and not self._stopping
+        await self._respond(writer, status, payload, keep_alive)
+        return keep_alive
+
+    async def _headers(self, reader: asyncio.StreamReader) -> Dict[str, str]:
+        headers: Dict[str, str] = {}
+        size = 0
+        while True:
+            try:
+                line = await reader.readline()
+            except ValueError:
+                raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Header line too long")
+            size += len(line)
+            if size > MAX_HEADER_BYTES:
+                raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Headers too large")
+            if line in (b"\r\n", b"\n", b""):
+                return headers
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+    async def _body(self, headers: Dict[str, str], reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> bytes:
+        if "chunked" in headers.get("transfer-encoding", "").lower():
+            raise HttpError(HTTPStatus.LENGTH_REQUIRED, "Chunked bodies are not supported; send Content-Length")
+        try:
+            length = int(headers.get("content-length") or 0)
         except ValueError:
-            parsed_ts = dt.datetime.now(dt.timezone.utc)
-
-        idem = self.headers.get("X-Idempotency-Key")
-        if not idem:
-            idem_seed = f"{channel}:{event_type}:{external_order_id}:{json.dumps(payload, sort_keys=True)}"
-            idem = hashlib.sha256(idem_seed.encode("utf-8")).hexdigest()
-
-        inserted = self.db.insert_order_event(
-            channel=channel,
-            external_order_id=external_order_id,
-            event_type=event_type,
-            event_ts=parsed_ts,
-            payload=payload,
-            idempotency_key=idem,
-        )
-        if not inserted:
-            self._json_response(
-                HTTPStatus.OK,
-                {"status": "duplicate", "channel": channel, "event_type": event_type, "idempotency_key": idem},
-            )
-            return
-
-        self.db.apply_order_event(event_type, payload)
-        self._json_response(
-            HTTPStatus.OK,
-            {
-                "status": "accepted",
-                "channel": channel,
-                "event_type": event_type,
-                "external_order_id": external_order_id,
-                "idempotency_key": idem,
-            },
-        )
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length < 0:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length")
+        if length > self.max_body_bytes:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Body over {self.max_body_bytes} bytes")
+        if headers.get("expect", "").lower() == "100-continue":
+            writer.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+        return await reader.readexactly(length) if length else b""
 
-    def log_message(self, fmt, *args):
-        # Keep output concise in automation contexts.
-        return
+    async def _respond(
+        self,
+        writer: asyncio.StreamWriter,
+        status: int,
+        payload: Dict[str, Any],
+        keep_alive: bool,
+        extra: Optional[Dict[str, str]] = None,
+    ) -> None:
+        raw = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        status = HTTPStatus(status)
+        lines = [
+            f"HTTP/1.1 {status.value} {status.phrase}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(raw)}",
+            "Connection: keep-alive" if keep_alive else "Connection: close",
+        ]
+        if keep_alive:
+            lines.append(f"Keep-Alive: timeout={int(self.keepalive_timeout)}")
+        lines.extend(f"{k}: {v}" for k, v in (extra or {}).items())
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + raw)
+        await writer.drain()
 
 
 def main() -> int:
     parser = argparse.ArgumentParser(description="Run omnichannel webhook receiver")
     parser.add_argument("--host", default="0.0.0.0")
     parser.add_argument("--port", type=int, default=8788)
+    parser.add_argument("--db-workers", type=int, default=0, help="Threads for DB work (default: HUB_DB_POOL_SIZE)")
+    parser.add_argument("--max-pending", type=int, default=MAX_PENDING, help="Events waiting for an inbox commit before answering 503")
+    parser.add_argument("--batch-max", type=int, default=BATCH_MAX, help="Events per inbox group commit")
+    parser.add_argument("--batch-ms", type=float, default=BATCH_MS, help="Longest wait (ms) to fill an inbox group commit")
+    parser.add_argument("--idem-cache-size", type=int, default=IDEM_LRU_SIZE, help="Recent idempotency keys answered from memory")
+    parser.add_argument("--idem-warm-hours", type=float, default=IDEM_WARM_HOURS, help="Hours of order_events loaded into the idempotency front at startup")
+    parser.add_argument("--max-body-bytes", type=int, default=MAX_BODY_BYTES)
+    parser.add_argument("--keepalive-timeout", type=float, default=KEEPALIVE_TIMEOUT)
     args = parser.parse_args()
 
     load_local_env()
@@ -111,10 +470,26 @@ def main() -> int:
     db.ensure_schema()
     db.seed_default_price_rules()
 
-    WebhookHandler.db = db
-    server = ThreadingHTTPServer((args.host, args.port), WebhookHandler)
-    print(f"Listening on http://{args.host}:{args.port}")
-    server.serve_forever()
+    front = IdempotencyFront(lru_size=args.idem_cache_size)
+    for key in db.recent_idempotency_keys(args.idem_warm_hours, IDEM_BLOOM_CAPACITY):
+        front.add(key)
+
+    server = WebhookServer(
+        db,
+        args.host,
+        args.port,
+        db_workers=args.db_workers or db.pool_size,
+        max_pending=args.max_pending,
+        max_body_bytes=args.max_body_bytes,
+        keepalive_timeout=args.keepalive_timeout,
+        batch_max=args.batch_max,
+        batch_ms=args.batch_ms,
+        front=front,
+    )
+    try:
+        asyncio.run(server.serve())
+    finally:
+        db.close()
     return 0
 
 
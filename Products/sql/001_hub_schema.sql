@@ -78,6 +78,29 @@ CREATE TABLE IF NOT EXISTS order_events (
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
+CREATE TABLE IF NOT EXISTS webhook_inbox (
+    id BIGSERIAL PRIMARY KEY,
+    channel TEXT NOT NULL,
+    external_order_id TEXT NOT NULL,
+    event_type TEXT NOT NULL,
+    event_ts TIMESTAMPTZ NOT NULL,
+    payload_json JSONB NOT NULL,
+    idempotency_key TEXT NOT NULL UNIQUE,
+    received_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    attempts INTEGER NOT NULL DEFAULT 0,
+    last_error TEXT
+);
+
+CREATE TABLE IF NOT EXISTS inventory_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    sku TEXT NOT NULL,
+    sellable_qty INTEGER NOT NULL,
+    source_channel TEXT,
+    enqueued_at TIMESTAMPTZ NOT NULL DEFAULT clock_timestamp(),
+    leased_by TEXT,
+    leased_until TIMESTAMPTZ
+);
+
 CREATE TABLE IF NOT EXISTS sync_jobs (
     id BIGSERIAL PRIMARY KEY,
     channel TEXT NOT NULL,
@@ -90,7 +113,18 @@ CREATE TABLE IF NOT EXISTS sync_jobs (
     processed_count INTEGER NOT NULL DEFAULT 0,
     success_count INTEGER NOT NULL DEFAULT 0,
     failed_count INTEGER NOT NULL DEFAULT 0,
-    error_summary TEXT
+    error_summary TEXT,
+    heartbeat_at TIMESTAMPTZ
+);
+
+ALTER TABLE sync_jobs ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMPTZ;
+
+CREATE TABLE IF NOT EXISTS sync_job_items (
+    job_id BIGINT NOT NULL REFERENCES sync_jobs(id) ON DELETE CASCADE,
+    sku TEXT NOT NULL,
+    success BOOLEAN NOT NULL,
+    done_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (job_id, sku)
 );
 
 CREATE TABLE IF NOT EXISTS dead_letter_queue (
@@ -102,7 +136,60 @@ CREATE TABLE IF NOT EXISTS dead_letter_queue (
     error TEXT NOT NULL,
     retries INTEGER NOT NULL DEFAULT 0,
     created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
-    resolved_at TIMESTAMPTZ
+    resolved_at TIMESTAMPTZ,
+    leased_by TEXT,
+    leased_until TIMESTAMPTZ
+);
+
+ALTER TABLE dead_letter_queue ADD COLUMN IF NOT EXISTS leased_by TEXT;
+ALTER TABLE dead_letter_queue ADD COLUMN IF NOT EXISTS leased_until TIMESTAMPTZ;
+
+-- Versions come from a sequence when the row is written, not when it commits,
+-- so change cursors on Postgres count in writer transaction ids (txid) instead.
+CREATE TABLE IF NOT EXISTS catalog_changes (
+    version BIGSERIAL PRIMARY KEY,
+    sku TEXT NOT NULL,
+    facet TEXT NOT NULL,
+    txid XID8 NOT NULL DEFAULT pg_current_xact_id(),
+    changed_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+CREATE TABLE IF NOT EXISTS channel_sync_cursors (
+    channel TEXT NOT NULL,
+    mode TEXT NOT NULL,
+    last_version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (channel, mode)
+);
+
+DO $$
+BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM information_schema.columns WHERE table_name = 'catalog_changes' AND column_name = 'txid'
+    ) THEN
+        ALTER TABLE catalog_changes ADD COLUMN txid XID8 NOT NULL DEFAULT pg_current_xact_id();
+        -- Existing change cursors hold versions; restart them so the next run re-reads the journal once.
+        UPDATE channel_sync_cursors SET last_version = 0 WHERE mode <> 'id_index';
+    END IF;
+END $$;
+
+CREATE TABLE IF NOT EXISTS channel_payload_hashes (
+    channel TEXT NOT NULL,
+    sku TEXT NOT NULL REFERENCES catalog_products(sku) ON DELETE CASCADE,
+    mode TEXT NOT NULL,
+    payload_hash TEXT,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (channel, sku, mode)
+);
+
+CREATE TABLE IF NOT EXISTS channel_inventory_refs (
+    channel TEXT NOT NULL,
+    sku TEXT NOT NULL,
+    external_variant_id TEXT NOT NULL,
+    inventory_item_id TEXT NOT NULL,
+    location_id TEXT NOT NULL,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (channel, sku)
 );
 
 CREATE INDEX IF NOT EXISTS idx_catalog_products_scope ON catalog_products (source_scope);
@@ -110,8 +197,13 @@ CREATE INDEX IF NOT EXISTS idx_catalog_products_category ON catalog_products (ca
 CREATE INDEX IF NOT EXISTS idx_channel_listing_channel_state ON channel_listing (channel, publish_state);
 CREATE INDEX IF NOT EXISTS idx_channel_listing_last_sync ON channel_listing (last_sync_at);
 CREATE INDEX IF NOT EXISTS idx_order_events_lookup ON order_events (channel, external_order_id, event_type);
+CREATE INDEX IF NOT EXISTS idx_order_events_created_at ON order_events (created_at);
+CREATE INDEX IF NOT EXISTS idx_catalog_changes_txid ON catalog_changes (txid);
 CREATE INDEX IF NOT EXISTS idx_sync_jobs_started_at ON sync_jobs (started_at);
+CREATE INDEX IF NOT EXISTS idx_inventory_outbox_sku ON inventory_outbox (sku, enqueued_at);
+CREATE INDEX IF NOT EXISTS idx_sync_jobs_running ON sync_jobs (status) WHERE status = 'running';
 CREATE INDEX IF NOT EXISTS idx_dead_letter_queue_open ON dead_letter_queue (channel, resolved_at);
+CREATE INDEX IF NOT EXISTS idx_dead_letter_queue_claim ON dead_letter_queue (id) WHERE resolved_at IS NULL;
 
 CREATE OR REPLACE FUNCTION touch_updated_at()
 RETURNS TRIGGER AS $$
@@ -151,4 +243,42 @@ CREATE TRIGGER trg_channel_category_map_updated_at
 BEFORE UPDATE ON channel_category_map
 FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
 
+DROP TRIGGER IF EXISTS trg_channel_sync_cursors_updated_at ON channel_sync_cursors;
+CREATE TRIGGER trg_channel_sync_cursors_updated_at
+BEFORE UPDATE ON channel_sync_cursors
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+DROP TRIGGER IF EXISTS trg_channel_inventory_refs_updated_at ON channel_inventory_refs;
+CREATE TRIGGER trg_channel_inventory_refs_updated_at
+BEFORE UPDATE ON channel_inventory_refs
+FOR EACH ROW EXECUTE FUNCTION touch_updated_at();
+
+-- Append (sku, facet) to catalog_changes on every real catalog change.
+-- Updates that only bump updated_at are ignored.
+CREATE OR REPLACE FUNCTION journal_catalog_change()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND (to_jsonb(OLD) - 'updated_at') = (to_jsonb(NEW) - 'updated_at') THEN
+        RETURN NULL;
+    END IF;
+    INSERT INTO catalog_changes(sku, facet) VALUES (NEW.sku, TG_ARGV[0]);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_catalog_products_journal ON catalog_products;
+CREATE TRIGGER trg_catalog_products_journal
+AFTER INSERT OR UPDATE ON catalog_products
+FOR EACH ROW EXECUTE FUNCTION journal_catalog_change('product');
+
+DROP TRIGGER IF EXISTS trg_catalog_inventory_journal ON catalog_inventory;
+CREATE TRIGGER trg_catalog_inventory_journal
+AFTER INSERT OR UPDATE ON catalog_inventory
+FOR EACH ROW EXECUTE FUNCTION journal_catalog_change('inventory');
+
+DROP TRIGGER IF EXISTS trg_catalog_pricing_journal ON catalog_pricing;
+CREATE TRIGGER trg_catalog_pricing_journal
+AFTER INSERT OR UPDATE ON catalog_pricing
+FOR EACH ROW EXECUTE FUNCTION journal_catalog_change('pricing');
+
 COMMIT;
@@ -0,0 +1,46 @@
+"""Shared fixtures: a fresh SQLite hub and a product row factory."""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hub_core import HubDB, ProductRow  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    hub = HubDB(f"sqlite:///{tmp_path / 'hub.db'}")
+    hub.ensure_schema()
+    return hub
+
+
+@pytest.fixture
+def product_row():
+    def make(sku, **overrides):
+        fields = dict(
+            sku=sku,
+            name_ar="",
+            name_en=sku,
+            desc_ar="",
+            desc_en="",
+            brand="NGS",
+            status="active",
+            category_key="general",
+            weight=1.0,
+            barcode="",
+            images=[],
+            source_scope="active",
+            stock_on_hand=10,
+            reserved_qty=0,
+            safety_stock=0,
+            base_cost_sar=10.0,
+            target_margin_pct=30.0,
+            vat_included_bool=True,
+        )
+        fields.update(overrides)
+        return ProductRow(**fields)
+
+    return make
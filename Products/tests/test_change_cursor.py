@@ -0,0 +1,47 @@
+"""--since-cursor reads: each change is returned once, even when commits land out of order."""
+
+import os
+
+import pytest
+
+from hub_core import HubDB
+
+PG_URL = os.environ.get("HUB_TEST_PG_URL", "")
+
+
+def test_cursor_returns_only_later_changes(db, product_row):
+    db.upsert_product_rows([product_row("A"), product_row("B")])
+    skus, cursor = db.get_changed_skus(0, "inventory")
+    assert skus == ["A", "B"]
+
+    db.upsert_product_rows([product_row("B", stock_on_hand=3), product_row("A")])
+    skus, cursor = db.get_changed_skus(cursor, "inventory")
+    assert skus == ["B"]
+    assert db.get_changed_skus(cursor, "inventory") == ([], cursor)
+
+    db.set_sync_cursor("zid", "inventory", cursor)
+    db.set_sync_cursor("zid", "inventory", cursor - 1)
+    assert db.get_sync_cursor("zid", "inventory") == cursor
+
+
+@pytest.mark.skipif(not PG_URL, reason="set HUB_TEST_PG_URL to run against Postgres")
+def test_postgres_cursor_holds_back_for_open_transaction(product_row):
+    psycopg = pytest.importorskip("psycopg")
+    db = HubDB(PG_URL)
+    db.ensure_schema()
+    db.upsert_product_rows([product_row("CURSOR-OLD"), product_row("CURSOR-NEW")])
+    _, cursor = db.get_changed_skus(0, "inventory")
+    bump = "UPDATE catalog_inventory SET stock_on_hand = stock_on_hand + 1 WHERE sku = %s"
+
+    with psycopg.connect(PG_URL) as older, psycopg.connect(PG_URL) as newer:
+        # The older transaction journals first (lower version) but commits last.
+        older.execute(bump, ("CURSOR-OLD",))
+        newer.execute(bump, ("CURSOR-NEW",))
+        newer.commit()
+
+        seen, cursor = db.get_changed_skus(cursor, "inventory")
+        older.commit()
+        later, cursor = db.get_changed_skus(cursor, "inventory")
+
+    assert {"CURSOR-OLD", "CURSOR-NEW"} <= set(seen) | set(later)
+    assert "CURSOR-NEW" not in seen
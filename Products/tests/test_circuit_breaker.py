@@ -0,0 +1,116 @@
+"""CircuitBreaker state machine, and a cancelled half-open probe in BaseConnector._request."""
+
+import asyncio
+import types
+
+import httpx
+import pytest
+
+from connectors import circuit_breaker
+from connectors.circuit_breaker import CLOSED, HALF_OPEN, OPEN, CircuitBreaker
+from connectors.salla_connector import SallaConnector
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(circuit_breaker, "time", types.SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def _open(breaker, clock):
+    for _ in range(breaker.failure_threshold):
+        breaker.record(False)
+    assert breaker.state == OPEN
+    clock[0] += breaker.open_seconds
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker(failure_threshold=3, min_calls=100)
+    breaker.record(False)
+    breaker.record(False)
+    assert breaker.state == CLOSED and breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_in() == pytest.approx(breaker.open_seconds)
+
+
+def test_opens_on_failure_rate(clock):
+    breaker = CircuitBreaker(failure_threshold=100, error_rate=0.5, window=10, min_calls=4)
+    for success in (True, False, True):
+        breaker.record(success)
+    assert breaker.state == CLOSED
+    breaker.record(False)
+    assert breaker.state == OPEN
+
+
+def test_half_open_lets_one_probe_through(clock):
+    breaker = CircuitBreaker(failure_threshold=1, open_seconds=30.0)
+    breaker.record(False)
+    clock[0] += 29.0
+    assert not breaker.allow()
+    clock[0] += 1.0
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+
+def test_probe_success_closes(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    _open(breaker, clock)
+    assert breaker.allow()
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.allow() and breaker.allow()
+    breaker.record(False)
+    assert breaker.state == CLOSED
+
+
+def test_probe_failure_reopens(clock):
+    breaker = CircuitBreaker(failure_threshold=2)
+    _open(breaker, clock)
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == OPEN
+    assert breaker.opened_count == 2
+    assert not breaker.allow()
+
+
+def test_abandoned_probe_frees_the_slot(clock):
+    breaker = CircuitBreaker(failure_threshold=1)
+    _open(breaker, clock)
+    assert breaker.allow()
+    breaker.abandon_probe()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_cancelled_probe_request_does_not_wedge_the_breaker(monkeypatch):
+    monkeypatch.setenv("SALLA_ACCESS_TOKEN", "token")
+
+    async def run():
+        hang = asyncio.Event()
+
+        async def handler(request):
+            await hang.wait()
+            return httpx.Response(200, json={})
+
+        connector = SallaConnector()
+        connector.max_retries = 1
+        connector.breaker = CircuitBreaker(failure_threshold=1, open_seconds=0.0)
+        connector.breaker.record(False)
+        connector._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        connector._client_loop = asyncio.get_running_loop()
+        try:
+            probe = asyncio.create_task(connector._request("GET", "https://stub.invalid/products"))
+            await asyncio.sleep(0.01)
+            assert connector.breaker.state == HALF_OPEN
+            probe.cancel()
+            await asyncio.gather(probe, return_exceptions=True)
+        finally:
+            await connector.aclose()
+        return connector.breaker
+
+    breaker = asyncio.run(run())
+    assert breaker.allow()
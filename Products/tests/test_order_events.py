@@ -0,0 +1,66 @@
+"""Folded order-event application matches applying each clamped event in turn."""
+
+import random
+
+import pytest
+
+from hub_core import HubDB
+
+SKUS = [f"SKU-{i}" for i in range(6)]
+
+
+def _random_events(rng, count):
+    events = []
+    for _ in range(count):
+        event_type = rng.choice(["orders", "orders", "cancellations", "returns"])
+        lines = [{"sku": sku, "quantity": rng.randint(1, 6)} for sku in rng.sample(SKUS, rng.randint(1, 3))]
+        events.append((rng.choice(["zid", "salla", None]), event_type, {"line_items": lines}))
+    return events
+
+
+def _stock(db):
+    rows = db.fetch_all(
+        "SELECT sku, reserved_qty, sellable_qty FROM catalog_inventory ORDER BY sku",
+        "SELECT sku, reserved_qty, sellable_qty FROM catalog_inventory ORDER BY sku",
+    )
+    return {r["sku"]: (r["reserved_qty"], r["sellable_qty"]) for r in rows}
+
+
+@pytest.mark.parametrize("seed", range(25))
+def test_folded_events_match_one_at_a_time(tmp_path, db, product_row, seed):
+    rng = random.Random(seed)
+    rows = [
+        product_row(sku, stock_on_hand=rng.randint(0, 20), reserved_qty=rng.randint(0, 4), safety_stock=rng.randint(0, 2))
+        for sku in SKUS
+    ]
+    stepwise = HubDB(f"sqlite:///{tmp_path / 'stepwise.db'}")
+    stepwise.ensure_schema()
+    db.upsert_product_rows(rows)
+    stepwise.upsert_product_rows(rows)
+    events = _random_events(rng, rng.randint(1, 40))
+
+    db.apply_order_events(events)
+    for channel, event_type, payload in events:
+        stepwise.apply_order_event(event_type, payload, channel)
+
+    expected = {}
+    for row in rows:
+        reserved = row.reserved_qty
+        for _, event_type, payload in events:
+            sign = 1 if event_type == "orders" else -1
+            for line in payload["line_items"]:
+                if line["sku"] == row.sku:
+                    reserved = max(reserved + sign * line["quantity"], 0)
+        expected[row.sku] = (reserved, max(row.stock_on_hand - reserved - row.safety_stock, 0))
+
+    assert _stock(db) == expected
+    assert _stock(stepwise) == expected
+
+
+def test_folded_update_bumps_updated_at(db, product_row):
+    db.upsert_product_rows([product_row("SKU-0")])
+    stale = "UPDATE catalog_inventory SET updated_at = '2000-01-01 00:00:00'"
+    db.execute(stale, stale)
+    db.apply_order_event("orders", {"line_items": [{"sku": "SKU-0", "quantity": 1}]})
+    rows = db.fetch_all("SELECT updated_at FROM catalog_inventory", "SELECT updated_at FROM catalog_inventory")
+    assert str(rows[0]["updated_at"]) > "2000-01-01 00:00:00"
@@ -0,0 +1,47 @@
+"""Shopify SKU -> id index follows Link pagination across pages."""
+
+import asyncio
+import os
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from connectors.shopify_connector import ShopifyConnector  # noqa: E402
+
+BASE = "https://stub.myshopify.com/admin/api/2024-10"
+
+
+def _handler(requests):
+    def handle(request: httpx.Request) -> httpx.Response:
+        requests.append(str(request.url))
+        if "page_info=p2" in str(request.url):
+            products = [{"id": 2, "variants": [{"id": 20, "sku": "SKU-2"}]}]
+            return httpx.Response(200, json={"products": products})
+        products = [{"id": 1, "variants": [{"id": 10, "sku": "SKU-1"}]}]
+        link = f'<{BASE}/products.json?limit=250&page_info=p2>; rel="next"'
+        return httpx.Response(200, json={"products": products}, headers={"Link": link})
+
+    return handle
+
+
+def test_id_index_follows_link_header(monkeypatch):
+    monkeypatch.setenv("SHOPIFY_STORE", "stub.myshopify.com")
+    monkeypatch.setenv("SHOPIFY_ADMIN_TOKEN", "token")
+    monkeypatch.setenv("SHOPIFY_ADMIN_URL", BASE)
+    requests = []
+
+    async def run():
+        connector = ShopifyConnector()
+        connector._client = httpx.AsyncClient(transport=httpx.MockTransport(_handler(requests)))
+        connector._client_loop = asyncio.get_running_loop()
+        try:
+            return await connector.fetch_id_index_async()
+        finally:
+            await connector.aclose()
+
+    index = asyncio.run(run())
+
+    assert len(requests) == 2
+    assert index == {"SKU-1": ("1", "10"), "SKU-2": ("2", "20")}
@@ -0,0 +1,124 @@
+"""Webhook inbox drain: each event is applied once, and a bad event only holds up itself."""
+
+import datetime as dt
+import os
+import uuid
+
+import pytest
+
+from hub_core import HubDB
+
+PG_URL = os.environ.get("HUB_TEST_PG_URL", "")
+
+
+def _event(key, sku, qty=1, event_type="orders"):
+    return {
+        "channel": "zid",
+        "external_order_id": f"order-{key}",
+        "event_type": event_type,
+        "event_ts": dt.datetime(2026, 1, 1, tzinfo=dt.timezone.utc),
+        "payload": {"line_items": [{"sku": sku, "quantity": qty}]},
+        "idempotency_key": key,
+    }
+
+
+def _queue_poison(db, key):
+    """Queue an event whose payload cannot be parsed (SQLite stores payloads as text)."""
+    with db.transaction() as conn:
+        conn.execute(
+            """
+            INSERT INTO webhook_inbox (channel, external_order_id, event_type, event_ts, payload_json, idempotency_key)
+            VALUES ('zid', 'poison', 'orders', '2026-01-01T00:00:00+00:00', '{not json', ?)
+            """,
+            (key,),
+        )
+
+
+def _reserved(db, sku):
+    rows = db.fetch_all(
+        "SELECT reserved_qty FROM catalog_inventory WHERE sku = %s",
+        "SELECT reserved_qty FROM catalog_inventory WHERE sku = ?",
+        (sku,),
+    )
+    return rows[0]["reserved_qty"]
+
+
+def _inbox(db):
+    return db.fetch_all(
+        "SELECT idempotency_key, attempts, last_error FROM webhook_inbox ORDER BY id",
+        "SELECT idempotency_key, attempts, last_error FROM webhook_inbox ORDER BY id",
+    )
+
+
+def test_duplicate_key_across_drains_applies_once(db, product_row):
+    db.upsert_product_rows([product_row("A")])
+    assert db.append_webhook_inbox([_event("k1", "A", 2)]) == [True]
+    assert db.drain_webhook_inbox(100) == {"drained": 1, "applied": 1, "failed": 0}
+
+    # A redelivery the front door did not look up still lands in the inbox.
+    assert db.append_webhook_inbox([_event("k1", "A", 2)], maybe_seen=set()) == [True]
+    assert db.drain_webhook_inbox(100) == {"drained": 1, "applied": 0, "failed": 0}
+    assert _reserved(db, "A") == 2
+    assert _inbox(db) == []
+
+
+def test_failed_batch_falls_back_to_one_event_per_transaction(db, product_row):
+    db.upsert_product_rows([product_row("A"), product_row("B")])
+    db.append_webhook_inbox([_event("k1", "A", 1)])
+    _queue_poison(db, "bad")
+    db.append_webhook_inbox([_event("k2", "B", 3)])
+
+    assert db.drain_webhook_inbox(100) == {"drained": 2, "applied": 2, "failed": 1}
+    assert (_reserved(db, "A"), _reserved(db, "B")) == (1, 3)
+    [left] = _inbox(db)
+    assert left["idempotency_key"] == "bad"
+    assert left["attempts"] == 1
+    assert left["last_error"].startswith("JSONDecodeError")
+
+
+def test_event_stops_at_max_attempts(db, product_row):
+    db.upsert_product_rows([product_row("A")])
+    _queue_poison(db, "bad")
+
+    assert db.drain_webhook_inbox(100, max_attempts=2)["failed"] == 1
+    assert db.drain_webhook_inbox(100, max_attempts=2)["failed"] == 1
+    assert db.drain_webhook_inbox(100, max_attempts=2) == {"drained": 0, "applied": 0, "failed": 0}
+    assert _inbox(db)[0]["attempts"] == 2
+
+    db.append_webhook_inbox([_event("k1", "A", 1)])
+    assert db.drain_webhook_inbox(100, max_attempts=2) == {"drained": 1, "applied": 1, "failed": 0}
+
+
+def _check_claim(db, prefix):
+    db.append_webhook_inbox([_event(f"{prefix}-{i}", "A") for i in range(3)])
+    with db.transaction():
+        queued = db._claim_inbox(100, 5)
+    ours = [row for row in queued if row["idempotency_key"].startswith(prefix)]
+    assert [row["idempotency_key"] for row in ours] == [f"{prefix}-{i}" for i in range(3)]
+
+    target = ours[1]["id"]
+    with db.transaction():
+        only = db._claim_inbox(100, 5, row_id=target)
+    assert [row["id"] for row in only] == [target]
+    with db.transaction():
+        assert db._claim_inbox(100, 0, row_id=target) == []
+
+
+def test_claim_by_id_or_all(db, product_row):
+    db.upsert_product_rows([product_row("A")])
+    _check_claim(db, "claim")
+
+
+@pytest.mark.skipif(not PG_URL, reason="set HUB_TEST_PG_URL to run against Postgres")
+def test_postgres_claim_by_id_or_all(product_row):
+    pytest.importorskip("psycopg")
+    db = HubDB(PG_URL)
+    db.ensure_schema()
+    db.upsert_product_rows([product_row("A")])
+    prefix = f"claim-{uuid.uuid4().hex}"
+    _check_claim(db, prefix)
+    db.execute(
+        "DELETE FROM webhook_inbox WHERE idempotency_key LIKE %s",
+        "DELETE FROM webhook_inbox WHERE idempotency_key LIKE ?",
+        (f"{prefix}-%",),
+    )